@@ -84,6 +84,33 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Per-user statistics, the ledger and FX versions that invalidate them and
+# the hit/miss counters live here (see Tracker/caching.py). Every process
+# that writes (web workers, imports, cron-driven commands) must see the same
+# versions, so the cache is on disk rather than in process memory.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'tracker',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+
+TRACKER_STATS_CACHE = 'default'
+
+# Upper bound (seconds) on how long time-dependent stats may be served.
+TRACKER_STATS_CACHE_TIMEOUT = 300
+
+# Number of users whose columnar ledger snapshots are kept in memory per process.
+TRACKER_SNAPSHOT_USERS = 64
+
+# Monthly budget for users who have not set one yet.
+TRACKER_DEFAULT_BUDGET = 2000
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
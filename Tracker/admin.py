@@ -14,4 +14,12 @@ admin.site.register(Projects)
 admin.site.register(Goals)
 admin.site.register(Event)
 admin.site.register(DreamCar)
-admin.site.register(Pictures)
\ No newline at end of file
+admin.site.register(Pictures)
+admin.site.register(DailyRollup)
+admin.site.register(CategoryKeyword)
+admin.site.register(IncomeGoalForecast)
+admin.site.register(ExpenseAnomaly)
+admin.site.register(RecurringRule)
+admin.site.register(Budget)
+admin.site.register(FxRate)
+admin.site.register(WalletBalance)
\ No newline at end of file
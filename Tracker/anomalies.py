@@ -0,0 +1,192 @@
+"""Nightly detection of unusually large expenses.
+
+Expenses are read a chunk of users at a time, sorted by (user, category,
+date), converted to each user's base currency, and scored per (user,
+category) group with two NumPy statistics:
+
+* a robust z-score, ``0.6745 * (x - median) / MAD``, against the whole group,
+* a rolling z-score against the ``ROLLING_WINDOW`` previous expenses of the
+  group, so a new level of spending stops being flagged once it is usual.
+
+Expenses above either threshold are written to ``ExpenseAnomaly``, which
+the expenses list joins through its one-to-one relation.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.db import connections, transaction
+from django.db.models import BigIntegerField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .columnar import np
+from .fx import base_currencies, get_rates
+from .models import ExpenseAnomaly, Expenses
+from .rollups import rollup_day
+
+MIN_SAMPLES = 5
+ROBUST_THRESHOLD = 3.5
+ROLLING_WINDOW = 20
+ROLLING_THRESHOLD = 3.0
+CHUNK_USERS = 500
+
+
+def is_available():
+    return np is not None
+
+
+def _group_starts(users, categories):
+    """Start index of each run of equal (user, category) in sorted arrays."""
+    changed = (users[1:] != users[:-1]) | (categories[1:] != categories[:-1])
+    return np.concatenate(([0], np.flatnonzero(changed) + 1))
+
+
+def _group_medians(values, group, starts, counts):
+    """Median of ``values`` within each group (groups are contiguous)."""
+    order = np.lexsort((values, group))
+    ordered = values[order]
+    return (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+
+
+def robust_scores(amounts, starts):
+    """``0.6745 * (x - median) / MAD`` per group; NaN where it is undefined."""
+    counts = np.diff(np.append(starts, len(amounts)))
+    group = np.repeat(np.arange(len(starts)), counts)
+    medians = _group_medians(amounts, group, starts, counts)
+    deviations = np.abs(amounts - medians[group])
+    mad = _group_medians(deviations, group, starts, counts)
+    # With more than half the values equal, MAD is 0; fall back to the
+    # mean absolute deviation scaled to the same consistency constant.
+    mean_dev = np.bincount(group, weights=deviations) / counts * 1.2533 / 1.4826
+    spread = np.where(mad > 0, mad, mean_dev)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = 0.6745 * (amounts - medians[group]) / spread[group]
+    scores[(counts < MIN_SAMPLES)[group] | (spread == 0)[group]] = np.nan
+    return scores
+
+
+def rolling_scores(amounts, starts, window=ROLLING_WINDOW):
+    """z-score of each expense against the ``window`` before it in its group."""
+    counts = np.diff(np.append(starts, len(amounts)))
+    position = np.arange(len(amounts)) - np.repeat(starts, counts)
+    previous = np.minimum(position, window)
+
+    sums = np.concatenate(([0.0], np.cumsum(amounts)))
+    squares = np.concatenate(([0.0], np.cumsum(amounts ** 2)))
+    index = np.arange(len(amounts))
+    total = sums[index] - sums[index - previous]
+    total_sq = squares[index] - squares[index - previous]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / previous
+        std = np.sqrt(np.maximum(total_sq / previous - mean ** 2, 0))
+        scores = (amounts - mean) / std
+    scores[(previous < MIN_SAMPLES) | ~(std > 0)] = np.nan
+    return scores
+
+
+def in_base_currencies(amounts, rows):
+    """Minor-unit ``amounts`` of expense ``rows`` converted to each owner's base currency."""
+    bases = base_currencies({row[1] for row in rows})
+    currencies = np.array([row[4] for row in rows], dtype='U3')
+    owner_bases = np.array([bases[row[1]] for row in rows], dtype='U3')
+    if (currencies == owner_bases).all():
+        return amounts
+    days = np.array([rollup_day(row[5]) for row in rows], dtype='datetime64[D]')
+    rates = get_rates()
+    converted = amounts.copy()
+    for base in np.unique(owner_bases):
+        mask = owner_bases == base
+        converted[mask] = rates.convert_array(np, amounts[mask], currencies[mask], days[mask], str(base))
+    return converted
+
+
+def score_users(user_ids):
+    """Flagged ``(expense id, user id, method, score)`` tuples for ``user_ids``."""
+    rows = list(
+        Expenses.objects
+        .filter(user_id__in=user_ids)
+        .annotate(_minor=Cast('worth', BigIntegerField()))
+        .order_by('user_id', 'category', 'date', 'pk')
+        .values_list('pk', 'user_id', 'category', '_minor', 'currency', 'date')
+    )
+    if not rows:
+        return []
+
+    category_codes = {}
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    users = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+    categories = np.fromiter(
+        (category_codes.setdefault(row[2], len(category_codes)) for row in rows), dtype=np.int64, count=len(rows),
+    )
+    amounts = np.fromiter((row[3] for row in rows), dtype=np.int64, count=len(rows))
+    amounts = in_base_currencies(amounts, rows).astype(np.float64)
+
+    starts = _group_starts(users, categories)
+    robust = robust_scores(amounts, starts)
+    rolling = rolling_scores(amounts, starts)
+
+    flagged_robust = np.nan_to_num(robust, nan=0) > ROBUST_THRESHOLD
+    flagged_rolling = np.nan_to_num(rolling, nan=0) > ROLLING_THRESHOLD
+    flagged = []
+    for index in np.flatnonzero(flagged_robust | flagged_rolling):
+        if flagged_robust[index]:
+            method, score = ExpenseAnomaly.ROBUST, robust[index]
+        else:
+            method, score = ExpenseAnomaly.ROLLING, rolling[index]
+        flagged.append((int(ids[index]), int(users[index]), method, float(score)))
+    return flagged
+
+
+def _score_in_worker(user_ids):
+    # Each worker opens its own database connection on first use.
+    return user_ids, score_users(user_ids)
+
+
+def _store(user_ids, flagged, now):
+    with transaction.atomic():
+        ExpenseAnomaly.objects.filter(user_id__in=user_ids).delete()
+        ExpenseAnomaly.objects.bulk_create([
+            ExpenseAnomaly(expense_id=expense_id, user_id=user_id, method=method, score=score, detected_at=now)
+            for expense_id, user_id, method, score in flagged
+        ], batch_size=1000)
+    return len(flagged)
+
+
+def user_chunks(chunk_users=CHUNK_USERS):
+    """Lists of at most ``chunk_users`` ids of users that have expenses."""
+    user_ids = list(
+        Expenses.objects.filter(user__isnull=False).order_by('user_id').values_list('user_id', flat=True).distinct()
+    )
+    for start in range(0, len(user_ids), chunk_users):
+        yield user_ids[start:start + chunk_users]
+
+
+def detect_anomalies(user_ids=None, chunk_users=CHUNK_USERS, workers=1, progress=None):
+    """Rescore expenses and replace the stored anomalies; returns the number flagged.
+
+    With ``workers`` > 1, chunks are scored in a process pool and written by
+    the calling process.
+    """
+    now = timezone.now()
+    if user_ids is not None:
+        chunks = [list(user_ids)[start:start + chunk_users] for start in range(0, len(user_ids), chunk_users)]
+    else:
+        chunks = list(user_chunks(chunk_users))
+
+    if workers > 1:
+        # Workers are forked so they inherit the configured Django app
+        # registry, and must not share the parent's open connections.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('fork')) as pool:
+            results = pool.map(_score_in_worker, chunks)
+            return _store_all(results, now, progress)
+    return _store_all(((chunk, score_users(chunk)) for chunk in chunks), now, progress)
+
+
+def _store_all(results, now, progress):
+    total = 0
+    for user_ids, flagged in results:
+        total += _store(user_ids, flagged, now)
+        if progress:
+            progress(total)
+    return total
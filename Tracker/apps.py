@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class TrackerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Tracker'
+
+    def ready(self):
+        from django.core import checks
+
+        from . import signals  # noqa: F401
+        from .caching import check_shared_cache
+
+        checks.register(check_shared_cache, checks.Tags.caches)
@@ -0,0 +1,125 @@
+"""Monthly budgets with an incrementally maintained month-to-date spend.
+
+Saving or deleting an Expenses row adds its worth to (or removes it from)
+the ``spent`` counter of the matching Budget rows -- the category's and the
+overall one -- with a single ``UPDATE ... SET spent = spent + delta``.
+Writes that bypass signals (imports, recurring rules) call
+``reconcile_budgets`` for the affected users or months instead.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .caching import bump_ledger_version
+from .fields import MoneyField
+from .models import Budget, DailyRollup
+from .rollups import rollup_day
+
+
+def budget_month(value):
+    """First day of the month a date or datetime is budgeted under."""
+    day = rollup_day(value) if isinstance(value, datetime) else value
+    return day.replace(day=1)
+
+
+def _next_month(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def add_spend(user_id, date, category, delta):
+    """Add ``delta`` to the spend of the budgets covering an expense."""
+    if user_id is None or not delta:
+        return
+    Budget.objects.filter(
+        user_id=user_id, month=budget_month(date), category__in=[category, Budget.ALL],
+    ).update(spent=F('spent') + Value(delta, output_field=MoneyField()))
+
+
+def month_spend(user, month, category=Budget.ALL):
+    """Expenses in ``month`` from the rollups (all categories when ``category`` is blank)."""
+    rollups = DailyRollup.objects.filter(user=user, day__gte=month, day__lt=_next_month(month))
+    if category != Budget.ALL:
+        rollups = rollups.filter(category=category)
+    return rollups.aggregate(total=Sum('expense_total'))['total'] or Decimal(0)
+
+
+def get_budget(user, category=Budget.ALL, month=None):
+    """The user's Budget for ``month`` (the current one by default).
+
+    A month without a budget starts with the amount of the latest earlier
+    budget, or ``settings.TRACKER_DEFAULT_BUDGET``; its spend is computed
+    once from the rollups and maintained incrementally from then on.
+    """
+    month = month or budget_month(timezone.localdate())
+    try:
+        return Budget.objects.get(user=user, category=category, month=month)
+    except Budget.DoesNotExist:
+        pass
+
+    previous = (
+        Budget.objects
+        .filter(user=user, category=category, month__lt=month)
+        .order_by('-month')
+        .values_list('amount', flat=True)
+        .first()
+    )
+    amount = previous if previous is not None else Decimal(str(settings.TRACKER_DEFAULT_BUDGET))
+    try:
+        with transaction.atomic():
+            return Budget.objects.create(
+                user=user, category=category, month=month, amount=amount,
+                spent=month_spend(user, month, category),
+            )
+    except IntegrityError:
+        # Created by a concurrent request.
+        return Budget.objects.get(user=user, category=category, month=month)
+
+
+def reconcile_budgets(user=None, months=None, batch_size=1000):
+    """Recompute ``spent`` from DailyRollup and fix the budgets that drifted.
+
+    Limited to ``user`` and/or the first-of-month dates in ``months`` when
+    given. Returns the number of budgets corrected.
+    """
+    budgets = Budget.objects.all()
+    if user is not None:
+        budgets = budgets.filter(user=user)
+    if months is not None:
+        budgets = budgets.filter(month__in=list(months))
+
+    with transaction.atomic():
+        budgets = list(budgets.select_for_update())
+        if not budgets:
+            return 0
+        first = min(budget.month for budget in budgets)
+        last = max(budget.month for budget in budgets)
+        rollups = DailyRollup.objects.filter(day__gte=first, day__lt=_next_month(last), expense_count__gt=0)
+        if user is not None:
+            rollups = rollups.filter(user=user)
+        spend = defaultdict(Decimal)
+        for row in (
+            rollups
+            .annotate(month=TruncMonth('day'))
+            .values('user_id', 'month', 'category')
+            .annotate(total=Sum('expense_total'))
+            .order_by()
+        ):
+            spend[(row['user_id'], row['month'], row['category'])] += row['total']
+            spend[(row['user_id'], row['month'], Budget.ALL)] += row['total']
+
+        drifted = []
+        for budget in budgets:
+            expected = spend[(budget.user_id, budget.month, budget.category)]
+            if budget.spent != expected:
+                budget.spent = expected
+                drifted.append(budget)
+        Budget.objects.bulk_update(drifted, ['spent'], batch_size=batch_size)
+    if drifted:
+        bump_ledger_version(user.pk if user is not None else None)
+    return len(drifted)
@@ -0,0 +1,204 @@
+"""Multi-row actions and inline edits for the list views.
+
+``apply_action`` changes the selected rows of one kind with a single
+``UPDATE``, and ``apply_edits`` saves a batch of inline edits with one
+``bulk_update``. Neither sends model signals, so the work the signals
+would do per row (rollups, budget spend, wallet balances, the search
+index, calendar feeds and the stats cache) is done here once for the
+whole batch. Deletes go through the ORM's collector instead, so every
+``on_delete`` rule and delete signal applies as it would for one row.
+"""
+from collections import defaultdict
+from copy import copy
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.forms.models import model_to_dict
+
+from .budgets import reconcile_budgets
+from .caching import bump_ledger_version, touch_calendar
+from .calendars import FEEDS as CALENDAR_FEEDS, SCHEDULES, forget_longer_span
+from .forms import (
+    EventForm, ExpensesForm, GoalsForm, IncomeForm, IncomeSourceForm, NowNextForm, ProjectsForm,
+)
+from .fx import to_base_currency
+from .models import Event, Expenses, Goals, Income, IncomeSource, NowNext, Projects
+from .rollups import apply_deltas, expense_key, income_key
+from .search import KIND_BY_MODEL as SEARCH_KINDS, index_objects
+from .wallets import add_moves
+
+BATCH_SIZE = 500
+MAX_ROWS = 1000
+
+# kind -> (model, form used to validate inline edits, {action: field values})
+KINDS = {
+    'income': (Income, IncomeForm, {}),
+    'expenses': (Expenses, ExpensesForm, {}),
+    'incomesources': (IncomeSource, IncomeSourceForm, {
+        'mark-got': {'got': True},
+        'mark-unpaid': {'got': False},
+    }),
+    'events': (Event, EventForm, {
+        'mark-attended': {'attended': True},
+        'mark-unattended': {'attended': False},
+    }),
+    'goals': (Goals, GoalsForm, {
+        'mark-achieved': {'achieved': True},
+        'mark-open': {'achieved': False},
+    }),
+    'nownext': (NowNext, NowNextForm, {
+        'mark-done': {'done': True},
+        'mark-pending': {'done': False},
+    }),
+    'projects': (Projects, ProjectsForm, {
+        f"status-{value.lower().replace(' ', '-')}": {'status': value}
+        for value, label in Projects._meta.get_field('status').choices
+    }),
+}
+
+# Inline edits to these Income/Expenses fields move rollup and wallet totals.
+LEDGER_FIELDS = {'amount', 'worth', 'date', 'wallet', 'category', 'currency'}
+
+CALENDAR_KINDS = {model: kind for kind, (model, *rest) in CALENDAR_FEEDS.items()}
+SCHEDULE_KINDS = {model: kind for kind, (model, *rest) in SCHEDULES.items()}
+
+
+def action_choices(kind):
+    """``[(action, label)]`` for the list view's bulk toolbar."""
+    return [(action, action.replace('-', ' ').capitalize()) for action in [*KINDS[kind][2], 'delete']]
+
+
+def editable_fields(kind):
+    """Form fields the inline editor may change: every non-relation field."""
+    model, form_class, updates = KINDS[kind]
+    return [name for name in form_class._meta.fields if not model._meta.get_field(name).is_relation]
+
+
+def _ledger_changed(objs, sign):
+    """Add (``sign=1``) or remove (``sign=-1``) Income/Expenses rows from the rollups and wallets."""
+    deltas = defaultdict(lambda: [Decimal(0), 0, Decimal(0), 0])
+    for obj in objs:
+        if isinstance(obj, Income):
+            key = income_key(obj.user_id, obj.date, obj.wallet)
+            amount, offset = obj.amount, 0
+        else:
+            key = expense_key(obj.user_id, obj.date, obj.category)
+            amount, offset = obj.worth, 2
+        delta = deltas[tuple(key.values())]
+        delta[offset] += sign * to_base_currency(obj.user_id, amount, obj.currency, key['day'])
+        delta[offset + 1] += sign
+    apply_deltas(deltas, batch_size=BATCH_SIZE)
+    add_moves(objs, sign)
+
+
+def _changed(user, model, objs=None):
+    """The per-batch share of what the model signals do per row."""
+    if model in SEARCH_KINDS and objs:
+        index_objects(objs)
+    if model in CALENDAR_KINDS:
+        touch_calendar(user.pk, CALENDAR_KINDS[model])
+    if model in SCHEDULE_KINDS:
+        kind = SCHEDULE_KINDS[model]
+        start_field, end_field = SCHEDULES[kind][1:3]
+        for obj in objs or ():
+            forget_longer_span(user.pk, kind, getattr(obj, start_field), getattr(obj, end_field))
+    if model is Expenses:
+        reconcile_budgets(user=user)
+
+
+def _delete(user, model, pks):
+    """Delete the user's ``model`` rows in ``pks``; returns deleted rows per model label.
+
+    At ``MAX_ROWS`` the collector's cost is bounded, and it keeps every
+    relation's ``on_delete`` rule and the signals that maintain rollups,
+    wallets, budgets, the search index and calendars.
+    """
+    deleted, counts = model.objects.filter(user=user, pk__in=pks).delete()
+    return counts
+
+
+def apply_action(user, kind, action, pks):
+    """Apply ``action`` to the user's ``kind`` rows in ``pks``; returns a JSON-ready summary."""
+    model, form_class, updates = KINDS[kind]
+    if action != 'delete' and action not in updates:
+        raise ValidationError(f"Unknown action '{action}' for {kind}.")
+    pks = _clean_pks(pks)
+
+    with transaction.atomic():
+        if action == 'delete':
+            counts = _delete(user, model, pks)
+            summary = {'deleted': counts.get(model._meta.label, 0), 'cascaded': counts}
+        else:
+            updated = model.objects.filter(user=user, pk__in=pks).update(**updates[action])
+            _changed(user, model)
+            summary = {'updated': updated}
+    bump_ledger_version(user.pk)
+    return {'kind': kind, 'action': action, 'requested': len(pks), **summary}
+
+
+def apply_edits(user, kind, rows):
+    """Validate and save inline edits ``[{'id': pk, field: value, ...}]`` with one bulk_update.
+
+    Every row is validated with the kind's form before anything is written;
+    if any row is invalid nothing is saved and the errors come back keyed
+    by id.
+    """
+    model, form_class, updates = KINDS[kind]
+    allowed = set(editable_fields(kind))
+    if not isinstance(rows, list):
+        raise ValidationError("rows must be a list.")
+    edits = {}
+    for row in rows:
+        if not isinstance(row, dict):
+            raise ValidationError("Each row must be an object.")
+        values = dict(row)
+        pk = _clean_pks([values.pop('id', None)])[0]
+        unknown = set(values) - allowed
+        if unknown:
+            raise ValidationError(f"Fields cannot be edited inline: {', '.join(sorted(unknown))}.")
+        edits.setdefault(pk, {}).update(values)
+    if len(edits) > MAX_ROWS:
+        raise ValidationError(f"At most {MAX_ROWS} rows can be changed at once.")
+
+    objs = model.objects.filter(user=user, pk__in=list(edits)).in_bulk()
+    errors, changed, previous, fields = {}, [], [], set()
+    for pk, values in edits.items():
+        obj = objs.get(pk)
+        if obj is None:
+            errors[pk] = {'__all__': [{'message': "Not found.", 'code': 'not_found'}]}
+            continue
+        if not values:
+            continue
+        # The whole form is bound, with the row's current values under the
+        # edits, so it validates exactly as the edit page would.
+        data = {**model_to_dict(obj, fields=form_class._meta.fields), **values}
+        before = copy(obj)
+        form = form_class(data=data, instance=obj)
+        if not form.is_valid():
+            errors[pk] = form.errors.get_json_data()
+            continue
+        previous.append(before)
+        changed.append(form.save(commit=False))
+        fields.update(values)
+    if errors:
+        return {'kind': kind, 'updated': 0, 'errors': errors}
+
+    with transaction.atomic():
+        model.objects.bulk_update(changed, sorted(fields), batch_size=BATCH_SIZE)
+        if model in (Income, Expenses) and fields & LEDGER_FIELDS:
+            _ledger_changed(previous, -1)
+            _ledger_changed(changed, 1)
+        _changed(user, model, objs=changed)
+    if changed:
+        bump_ledger_version(user.pk)
+    return {'kind': kind, 'updated': len(changed), 'errors': {}}
+
+
+def _clean_pks(pks):
+    if not isinstance(pks, (list, tuple)) or len(pks) > MAX_ROWS:
+        raise ValidationError(f"ids must be a list of at most {MAX_ROWS} ids.")
+    try:
+        return [int(pk) for pk in pks]
+    except (TypeError, ValueError):
+        raise ValidationError("ids must be integers.")
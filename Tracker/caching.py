@@ -0,0 +1,162 @@
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+
+GLOBAL_VERSION_KEY = 'tracker:ledger-version:global'
+USER_VERSION_KEY = 'tracker:ledger-version:{user_id}'
+STATS_KEY = 'tracker:stats:{user_id}:{global_version}:{version}:{name}'
+FX_VERSION_KEY = 'tracker:fx-version'
+BASE_CURRENCY_KEY = 'tracker:base-currency:{user_id}'
+CALENDAR_CHANGED_KEY = 'tracker:calendar-changed:{user_id}:{kind}'
+SCHEDULE_SPAN_KEY = 'tracker:schedule-span:{user_id}:{kind}'
+CALENDAR_KEY_KEY = 'tracker:calendar-key:{user_id}'
+HITS_KEY = 'tracker:stats-hits'
+MISSES_KEY = 'tracker:stats-misses'
+
+
+# Backends whose keys live in one process: versions bumped by imports, cron
+# commands or another worker would never reach the others.
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def get_cache():
+    return caches[getattr(settings, 'TRACKER_STATS_CACHE', 'default')]
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when TRACKER_STATS_CACHE is not shared between processes."""
+    alias = getattr(settings, 'TRACKER_STATS_CACHE', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_BACKENDS:
+        return []
+    return [checks.Warning(
+        f"TRACKER_STATS_CACHE ({alias!r}) uses {backend}, which is not shared between processes.",
+        hint="Stats, ledger and FX rate versions bumped by other processes will not be seen; "
+             "use a file, database or memcached/redis cache.",
+        id='Tracker.W001',
+    )]
+
+
+def _initial_version():
+    # Start from a timestamp rather than 1 so a version key that was evicted
+    # never comes back with a number an older stats entry was stored under.
+    return time.time_ns()
+
+
+def _get_version(cache, key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(cache, key):
+    # A fresh timestamp rather than incr(): on a shared file or database
+    # cache incr() is a read-modify-write, and two processes bumping at
+    # once could both write the same number.
+    version = _initial_version()
+    previous = cache.get(key)
+    if previous is not None and version <= previous:
+        version = previous + 1
+    cache.set(key, version, None)
+
+
+def get_ledger_version(user_id):
+    return _get_version(get_cache(), USER_VERSION_KEY.format(user_id=user_id))
+
+
+def get_ledger_versions(user_id):
+    """(global version, user version) pair that changes on any write affecting ``user_id``."""
+    cache = get_cache()
+    return (
+        _get_version(cache, GLOBAL_VERSION_KEY),
+        _get_version(cache, USER_VERSION_KEY.format(user_id=user_id)),
+    )
+
+
+def bump_ledger_version(user_id=None):
+    """Invalidate cached stats for ``user_id``, or for every user when None."""
+    cache = get_cache()
+    if user_id is None:
+        _bump(cache, GLOBAL_VERSION_KEY)
+    else:
+        _bump(cache, USER_VERSION_KEY.format(user_id=user_id))
+
+
+def get_fx_version():
+    return _get_version(get_cache(), FX_VERSION_KEY)
+
+
+def bump_fx_version():
+    """Make every process reload its FX rate table."""
+    _bump(get_cache(), FX_VERSION_KEY)
+
+
+def get_calendar_changed(user_id, kind):
+    """Unix time of the user's last change to the ``kind`` calendar feed.
+
+    An evicted entry comes back as the current time, which only makes
+    subscribers download the feed once more.
+    """
+    cache = get_cache()
+    key = CALENDAR_CHANGED_KEY.format(user_id=user_id, kind=kind)
+    changed = cache.get(key)
+    if changed is None:
+        cache.add(key, time.time(), None)
+        changed = cache.get(key)
+    return changed
+
+
+def touch_calendar(user_id, kind):
+    get_cache().set(CALENDAR_CHANGED_KEY.format(user_id=user_id, kind=kind), time.time(), None)
+
+
+def _count(cache, key):
+    # Counters are approximate: concurrent increments from several
+    # processes can be lost on backends without an atomic incr().
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def cached_stats(user, name, compute, timeout=None):
+    """Return ``compute()`` for ``user``, cached until the user's next write.
+
+    ``timeout`` bounds staleness for stats that also depend on the current
+    time (e.g. "upcoming" counts); it defaults to
+    ``settings.TRACKER_STATS_CACHE_TIMEOUT``.
+    """
+    cache = get_cache()
+    if timeout is None:
+        timeout = getattr(settings, 'TRACKER_STATS_CACHE_TIMEOUT', 300)
+    global_version, version = get_ledger_versions(user.pk)
+    key = STATS_KEY.format(user_id=user.pk, global_version=global_version, version=version, name=name)
+    value = cache.get(key)
+    if value is not None:
+        _count(cache, HITS_KEY)
+        return value
+
+    _count(cache, MISSES_KEY)
+    value = compute()
+    cache.set(key, value, timeout)
+    return value
+
+
+def cache_counters():
+    cache = get_cache()
+    return {
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+    }
+
+
+def reset_cache_counters():
+    get_cache().delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,304 @@
+"""Calendar queries over Event intervals, and iCalendar feeds.
+
+An event occupies ``[start_date, end_date]``, or just its start when
+``end_date`` is earlier (neither the form nor the model forbids that).
+``overlapping`` selects the events that intersect a range of days with
+``start_date < range end AND (end_date >= range start OR start_date >=
+range start)``; the (user, start_date, end_date) index serves the first
+bound and checks the rest without reading the table rows.
+
+``stream_ical`` renders a user's events, goal deadlines or project end
+dates as an iCalendar document for subscription from calendar apps. Feed
+URLs carry a signed token instead of requiring a session; it names the
+user and their ``calendar_key``, so resetting the key revokes old URLs.
+
+``conflicts_with`` checks one new or edited entry against the user's
+events and projects, and ``year_conflicts`` lists every overlapping pair
+in a year with a sorted sweep. Both bound the start of the entries they
+read from both sides, using the user's longest entry (see
+``longest_span``), so the index range covers only entries that can
+overlap instead of everything that started earlier.
+"""
+import heapq
+import secrets
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from django.core import signing
+from django.db.models import DurationField, ExpressionWrapper, F, Max, Q
+from django.utils import timezone
+
+from Users.models import UserProfile
+
+from .caching import CALENDAR_KEY_KEY, SCHEDULE_SPAN_KEY, get_cache
+from .models import Event, Goals, Projects
+
+MAX_RANGE_DAYS = 62
+CALENDAR_FIELDS = ('pk', 'title', 'category', 'start_date', 'end_date', 'attended')
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def overlapping(user, start, end):
+    """Events of ``user`` that intersect the days ``start`` to ``end`` inclusive."""
+    range_start = start_of_day(start)
+    return Event.objects.filter(
+        Q(end_date__gte=range_start) | Q(start_date__gte=range_start),
+        user=user,
+        start_date__lt=start_of_day(end + timedelta(days=1)),
+    )
+
+
+def calendar_events(user, start, end):
+    """Rows for the calendar grid, with local ``start`` and ``end`` days."""
+    rows = []
+    for event in overlapping(user, start, end).order_by('start_date', 'pk').values(*CALENDAR_FIELDS):
+        start_date = timezone.localtime(event['start_date'])
+        end_date = max(timezone.localtime(event['end_date']), start_date)
+        rows.append({
+            'id': event['pk'],
+            'title': event['title'],
+            'category': event['category'],
+            'attended': event['attended'],
+            'start': start_date.date().isoformat(),
+            'end': end_date.date().isoformat(),
+            'start_time': start_date.isoformat(),
+        })
+    return rows
+
+
+# iCalendar feeds: kind -> (model, columns, calendar name)
+FEEDS = {
+    'events': (Event, ['pk', 'title', 'host', 'category', 'location', 'start_date', 'end_date'], 'Events'),
+    'goals': (Goals, ['pk', 'goal_title', 'goal_description', 'end_date', 'achieved'], 'Goal deadlines'),
+    'projects': (Projects, ['pk', 'name', 'description', 'status', 'end_date'], 'Project end dates'),
+}
+FEED_SALT = 'tracker.calendar-feed'
+CHUNK_SIZE = 2000
+ENTRIES_PER_CHUNK = 200
+
+
+def feed_key(user, reset=False):
+    """The user's calendar feed secret, made on first use; ``reset`` replaces it."""
+    profile, created = UserProfile.objects.get_or_create(user=user)
+    if reset or not profile.calendar_key:
+        profile.calendar_key = secrets.token_urlsafe(16)
+        UserProfile.objects.filter(pk=profile.pk).update(calendar_key=profile.calendar_key)
+        forget_feed_key(user.pk)
+    return profile.calendar_key
+
+
+def _current_feed_key(user_id):
+    # Cached so polls answered with a 304 stay free of queries; '' stands
+    # for an inactive or deleted user.
+    cache = get_cache()
+    cache_key = CALENDAR_KEY_KEY.format(user_id=user_id)
+    key = cache.get(cache_key)
+    if key is None:
+        key = UserProfile.objects.filter(
+            user_id=user_id, user__is_active=True,
+        ).values_list('calendar_key', flat=True).first() or ''
+        cache.set(cache_key, key, None)
+    return key
+
+
+def forget_feed_key(user_id):
+    get_cache().delete(CALENDAR_KEY_KEY.format(user_id=user_id))
+
+
+def feed_token(user):
+    return signing.dumps([user.pk, feed_key(user)], salt=FEED_SALT)
+
+
+def feed_user_id(token):
+    """The id of the active user ``token`` was issued to, unless their key was reset since."""
+    try:
+        user_id, key = signing.loads(token, salt=FEED_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    current = _current_feed_key(user_id)
+    return user_id if current and secrets.compare_digest(current, str(key)) else None
+
+
+def _escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def _fold(line):
+    # Content lines are limited to 75 octets; longer ones continue on lines
+    # starting with a space, without splitting a UTF-8 sequence.
+    if len(line.encode('utf-8')) <= 75:
+        return line + '\r\n'
+    parts, current, size, limit = [], [], 0, 75
+    for character in line:
+        width = len(character.encode('utf-8'))
+        if size + width > limit:
+            parts.append(''.join(current))
+            current, size, limit = [], 0, 74
+        current.append(character)
+        size += width
+    parts.append(''.join(current))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _properties(kind, row):
+    if kind == 'events':
+        pk, title, host, category, location, start, end = row
+        return [
+            ('DTSTART', _utc(start)),
+            ('DTEND', _utc(max(start, end))),
+            ('SUMMARY', _escape(title)),
+            ('LOCATION', _escape(location)),
+            ('CATEGORIES', _escape(category)),
+            ('DESCRIPTION', _escape(f"Host: {host}")),
+        ]
+    if kind == 'goals':
+        pk, title, description, end, achieved = row
+        summary, category = f"Goal: {title}", 'Achieved' if achieved else 'Goal'
+    else:
+        pk, title, description, status, end = row
+        summary, category = f"Project: {title}", status
+    # Deadlines are all-day entries on their local date.
+    day = timezone.localtime(end).date()
+    return [
+        ('DTSTART;VALUE=DATE', day.strftime('%Y%m%d')),
+        ('DTEND;VALUE=DATE', (day + timedelta(days=1)).strftime('%Y%m%d')),
+        ('SUMMARY', _escape(summary)),
+        ('CATEGORIES', _escape(category)),
+        ('DESCRIPTION', _escape(description)),
+    ]
+
+
+def stream_ical(kind, user_id, stamp):
+    """Yield an iCalendar document for ``kind`` a few hundred entries at a time.
+
+    ``stamp`` (the time of the user's last change to the feed) is used as
+    every entry's DTSTAMP, so unchanged feeds render byte for byte the same.
+    """
+    model, columns, name = FEEDS[kind]
+    dtstamp = _utc(stamp)
+    yield ''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Finance Tracker//Calendar//EN',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_escape(name)}',
+    ])
+    rows = model.objects.filter(user_id=user_id).order_by('pk').values_list(*columns).iterator(chunk_size=CHUNK_SIZE)
+    chunk = []
+    for count, row in enumerate(rows, 1):
+        chunk.append(_fold('BEGIN:VEVENT'))
+        chunk.append(_fold(f'UID:{kind}-{row[0]}@tracker'))
+        chunk.append(_fold(f'DTSTAMP:{dtstamp}'))
+        chunk.extend(_fold(f'{key}:{value}') for key, value in _properties(kind, row))
+        chunk.append(_fold('END:VEVENT'))
+        if count % ENTRIES_PER_CHUNK == 0:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append(_fold('END:VCALENDAR'))
+    yield ''.join(chunk)
+
+
+# Conflicts: kind -> (model, start field, end field, title field)
+SCHEDULES = {
+    'event': (Event, 'start_date', 'end_date', 'title'),
+    'project': (Projects, 'date_set', 'end_date', 'name'),
+}
+
+
+def longest_span(user, kind):
+    """The longest ``end - start`` among the user's ``kind`` entries (never negative).
+
+    Cached until ``forget_longer_span`` sees a longer entry written. Deletes
+    and shrinking edits leave it as it is: a span that is too long only
+    widens the range ``overlapping_entries`` reads.
+    """
+    cache = get_cache()
+    key = SCHEDULE_SPAN_KEY.format(user_id=user.pk, kind=kind)
+    span = cache.get(key)
+    if span is None:
+        model, start_field, end_field, title_field = SCHEDULES[kind]
+        span = model.objects.filter(user=user).aggregate(span=Max(ExpressionWrapper(
+            F(end_field) - F(start_field), output_field=DurationField(),
+        )))['span']
+        span = max(span or timedelta(0), timedelta(0))
+        cache.set(key, span, None)
+    return span
+
+
+def forget_longer_span(user_id, kind, start, end):
+    """Drop the cached ``longest_span`` if an entry from ``start`` to ``end`` exceeds it."""
+    cache = get_cache()
+    key = SCHEDULE_SPAN_KEY.format(user_id=user_id, kind=kind)
+    span = cache.get(key)
+    if span is not None and start is not None and end is not None and end - start > span:
+        cache.delete(key)
+
+
+def overlapping_entries(user, kind, start, end):
+    """The user's ``kind`` entries overlapping ``[start, end)``.
+
+    An entry can only overlap if it starts within its length before
+    ``start``, so the start column is bounded on both sides.
+    """
+    model, start_field, end_field, title_field = SCHEDULES[kind]
+    return model.objects.filter(user=user, **{
+        f'{start_field}__gte': start - longest_span(user, kind),
+        f'{start_field}__lt': end,
+        f'{end_field}__gt': start,
+    })
+
+
+def _entries(user, start, end, exclude=None):
+    """(start, end, kind, pk, title) of every schedule entry overlapping [start, end)."""
+    entries = []
+    for kind, (model, start_field, end_field, title_field) in SCHEDULES.items():
+        queryset = overlapping_entries(user, kind, start, end)
+        if exclude is not None and isinstance(exclude, model):
+            queryset = queryset.exclude(pk=exclude.pk)
+        for pk, entry_start, entry_end, title in queryset.values_list('pk', start_field, end_field, title_field):
+            entries.append((entry_start, entry_end, kind, pk, title))
+    return entries
+
+
+def conflicts_with(user, start, end, exclude=None):
+    """Events and projects of ``user`` that overlap ``[start, end)``, by start.
+
+    ``exclude`` is the instance being edited. Each model is read with one
+    range query on its (user, date) indexes, bounded by ``longest_span``,
+    not by loading the schedule.
+    """
+    return sorted(_entries(user, start, end, exclude=exclude))
+
+
+def find_conflicts(entries):
+    """Overlapping pairs among ``(start, end, ...)`` tuples, with a sorted sweep.
+
+    Entries are visited by start while a heap holds the ends of those still
+    open, so the cost is O(n log n + k) for k conflicting pairs rather than
+    a comparison per pair. Entries that only touch do not conflict.
+    """
+    entries = sorted(entry for entry in entries if entry[1] >= entry[0])
+    open_entries = []  # heap of (end, index)
+    pairs = []
+    for index, entry in enumerate(entries):
+        while open_entries and open_entries[0][0] <= entry[0]:
+            heapq.heappop(open_entries)
+        pairs.extend((entries[other], entry) for end, other in sorted(open_entries, key=lambda item: item[1]))
+        heapq.heappush(open_entries, (entry[1], index))
+    return pairs
+
+
+def year_conflicts(user, year):
+    """Overlapping (earlier, later) entry pairs that touch calendar ``year``."""
+    start = start_of_day(date(year, 1, 1))
+    end = start_of_day(date(year + 1, 1, 1))
+    return find_conflicts(_entries(user, start, end))
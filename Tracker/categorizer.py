@@ -0,0 +1,114 @@
+import re
+from functools import lru_cache
+
+from .budgets import reconcile_budgets
+from .models import CategoryKeyword, Expenses
+from .rollups import rebuild_rollups
+
+DEFAULT_KEYWORDS = {
+    'BUSINESS': ['business', 'office', 'work', 'company', 'client', 'software', 'hosting', 'domain', 'laptop'],
+    'PERSONAL': ['personal', 'home', 'family', 'shopping', 'rent', 'clothes', 'gym', 'transport', 'fuel'],
+    'INVESTMENT': ['investment', 'stock', 'stocks', 'crypto', 'property', 'asset', 'shares', 'bitcoin', 'savings'],
+    'FOOD': ['food', 'groceries', 'grocery', 'restaurant', 'lunch', 'dinner', 'breakfast', 'coffee', 'snacks'],
+}
+
+DEFAULT_RULES = tuple(
+    (keyword, category)
+    for category, keywords in DEFAULT_KEYWORDS.items()
+    for keyword in keywords
+)
+
+VALID_CATEGORIES = {code for code, label in Expenses.CATEGORY_CHOICES}
+
+
+class KeywordMatcher:
+    """All keyword rules compiled into one alternation regex.
+
+    Each text is scanned once no matter how many rules there are; the
+    matched keyword is then mapped to its category with a dict lookup.
+    Earlier rules win when the same keyword appears twice.
+    """
+
+    def __init__(self, rules):
+        self.categories = {}
+        for keyword, category in rules:
+            self.categories.setdefault(keyword.lower(), category)
+
+        self.pattern = None
+        if self.categories:
+            # Longest first so "stocks" is preferred over "stock".
+            alternatives = sorted(self.categories, key=len, reverse=True)
+            self.pattern = re.compile(
+                r'\b(?:' + '|'.join(re.escape(keyword) for keyword in alternatives) + r')\b',
+                re.IGNORECASE,
+            )
+
+    def match(self, *texts):
+        if self.pattern is None:
+            return None
+        for text in texts:
+            if not text:
+                continue
+            found = self.pattern.search(text)
+            if found:
+                return self.categories[found.group(0).lower()]
+        return None
+
+
+@lru_cache(maxsize=256)
+def compile_rules(rules):
+    return KeywordMatcher(rules)
+
+
+def get_matcher(user):
+    """Matcher for ``user``'s own rules followed by the defaults."""
+    user_rules = tuple(
+        CategoryKeyword.objects.filter(user=user)
+        .order_by('keyword')
+        .values_list('keyword', 'category')
+    )
+    return compile_rules(user_rules + DEFAULT_RULES)
+
+
+def suggest_category(user, name, description=''):
+    """Category code suggested for an expense, or None when no rule matches."""
+    return get_matcher(user).match(name, description)
+
+
+def backfill_categories(user, batch_size=1000):
+    """Categorize ``user``'s expenses whose category is not a valid choice.
+
+    Expenses are read in pk-ordered batches and matches are written with one
+    UPDATE per category per batch. Returns the number of expenses updated.
+    """
+    matcher = get_matcher(user)
+    uncategorized = (
+        Expenses.objects
+        .filter(user=user)
+        .exclude(category__in=VALID_CATEGORIES)
+        .order_by('pk')
+        .values_list('pk', 'name', 'description')
+    )
+
+    updated = 0
+    last_pk = 0
+    while True:
+        batch = list(uncategorized.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+
+        matches = {}
+        for pk, name, description in batch:
+            category = matcher.match(name, description)
+            if category is not None:
+                matches.setdefault(category, []).append(pk)
+        for category, pks in matches.items():
+            updated += Expenses.objects.filter(pk__in=pks).update(category=category)
+
+    if updated:
+        # update() bypasses the signals that maintain the rollups and the
+        # per-category budget spend.
+        rebuild_rollups(user=user)
+        reconcile_budgets(user=user)
+    return updated
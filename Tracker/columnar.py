@@ -0,0 +1,216 @@
+"""Per-user columnar snapshots of the Income and Expenses ledgers.
+
+A snapshot holds one NumPy array per column (local timestamps, amounts in
+minor units of the user's base currency, wallet / category codes), sorted
+by time. Each ledger's columns are built with one ``values_list`` query
+the first time they are used, reused until the user's ledger version changes
+(see ``Tracker.caching``), and kept in a process-local LRU bounded by
+``settings.TRACKER_SNAPSHOT_USERS``. Series and buckets are computed with
+``searchsorted`` / ``bincount`` instead of Python loops.
+
+NumPy is optional: when it is missing ``get_snapshot`` returns None and
+callers fall back to the DailyRollup queries in ``Tracker.stats``.
+"""
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from decimal import Decimal
+from functools import cached_property
+
+from django.conf import settings
+from django.db.models import BigIntegerField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .caching import get_ledger_versions
+from .fields import DEFAULT_CURRENCY, MINOR_UNIT_PLACES
+from .fx import get_base_currency, get_rates
+from .models import WALLETS, Expenses, Income
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+WALLET_CODES = [code for code, label in WALLETS]
+CATEGORY_CODES = [code for code, label in Expenses.CATEGORY_CHOICES]
+
+# Kind -> (model, amount field, code field, known codes)
+LEDGERS = {
+    'income': (Income, 'amount', 'wallet', WALLET_CODES),
+    'expense': (Expenses, 'worth', 'category', CATEGORY_CODES),
+}
+
+_snapshots = OrderedDict()
+_lock = threading.Lock()
+
+
+def is_available():
+    return np is not None
+
+
+def _money(cents):
+    return Decimal(int(cents)).scaleb(-MINOR_UNIT_PLACES)
+
+
+def _day(value):
+    return np.datetime64(value, 'D')
+
+
+class LedgerColumns:
+    """Time-sorted columns of one ledger.
+
+    ``codes`` index into ``labels``; values not in ``labels`` get
+    ``len(labels)``.
+    """
+
+    def __init__(self, times, amounts, codes, labels):
+        self.times = times
+        self.amounts = amounts
+        self.codes = codes
+        self.labels = labels
+
+    @classmethod
+    def from_queryset(cls, queryset, amount_field, code_field, labels, base=DEFAULT_CURRENCY):
+        """Columns of ``queryset`` with amounts converted to ``base``."""
+        # Cast keeps the minor-unit integers so no Decimal is built per row.
+        rows = list(
+            queryset
+            .annotate(_minor=Cast(amount_field, BigIntegerField()))
+            .order_by('date')
+            .values_list('date', '_minor', code_field, 'currency')
+        )
+        lookup = {label: index for index, label in enumerate(labels)}
+        other = len(labels)
+        times = np.array(
+            [timezone.localtime(row[0]).replace(tzinfo=None) for row in rows],
+            dtype='datetime64[s]',
+        )
+        amounts = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        currencies = np.array([row[3] for row in rows], dtype='U3')
+        if (currencies != base).any():
+            amounts = get_rates().convert_array(np, amounts, currencies, times.astype('datetime64[D]'), base)
+        codes = np.fromiter((lookup.get(row[2], other) for row in rows), dtype=np.int16, count=len(rows))
+        return cls(times, amounts, codes, labels)
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.amounts.nbytes + self.codes.nbytes
+
+    def _since(self, since):
+        """Index of the first row on or after the day ``since``."""
+        if since is None:
+            return 0
+        return int(np.searchsorted(self.times, np.datetime64(since, 's')))
+
+    def total(self, since=None):
+        return _money(self.amounts[self._since(since):].sum())
+
+    def daily_totals(self, start, end):
+        """(totals, counts) arrays for each day from ``start`` to ``end`` inclusive.
+
+        Totals are in minor units.
+        """
+        lo = int(np.searchsorted(self.times, np.datetime64(start, 's')))
+        hi = int(np.searchsorted(self.times, np.datetime64(end + timedelta(days=1), 's')))
+        offsets = (self.times[lo:hi].astype('datetime64[D]') - _day(start)).astype(np.int64)
+        days = (end - start).days + 1
+        totals = np.bincount(offsets, weights=self.amounts[lo:hi], minlength=days)
+        return np.rint(totals).astype(np.int64), np.bincount(offsets, minlength=days)
+
+    def bucket_totals(self, unit, since=None):
+        """``[(bucket start date, Decimal total)]`` for buckets with activity.
+
+        ``unit`` is ``'month'`` or ``'week'`` (weeks start on Monday).
+        """
+        lo = self._since(since)
+        days = self.times[lo:].astype('datetime64[D]')
+        if unit == 'month':
+            buckets = days.astype('datetime64[M]').astype(np.int64)
+        elif unit == 'week':
+            # Day 0 (1970-01-01) was a Thursday; shift so weeks start on Monday.
+            buckets = (days.astype(np.int64) + 3) // 7
+        else:
+            raise ValueError(f"Unknown bucket unit {unit!r}")
+
+        keys, inverse = np.unique(buckets, return_inverse=True)
+        totals = np.bincount(inverse, weights=self.amounts[lo:], minlength=len(keys))
+        if unit == 'month':
+            starts = keys.astype('datetime64[M]').astype('datetime64[D]')
+        else:
+            starts = (keys * 7 - 3).astype('datetime64[D]')
+        return [(start.item(), _money(round(total))) for start, total in zip(starts, totals)]
+
+    def bucket_average(self, unit, since=None):
+        """Average total per bucket with activity."""
+        buckets = self.bucket_totals(unit, since=since)
+        if not buckets:
+            return 0
+        return _money(self.amounts[self._since(since):].sum()) / len(buckets)
+
+    def code_totals(self):
+        """``{label: Decimal total}`` for every known code."""
+        totals = np.bincount(self.codes, weights=self.amounts, minlength=len(self.labels) + 1)
+        return {label: _money(round(totals[index])) for index, label in enumerate(self.labels)}
+
+
+class LedgerSnapshot:
+    """Columns of a user's ledgers, each built on first use."""
+
+    def __init__(self, user, version):
+        self.version = version
+        self.user_id = user.pk
+        self.base = get_base_currency(user.pk)
+
+    def _columns(self, kind):
+        model, amount_field, code_field, labels = LEDGERS[kind]
+        return LedgerColumns.from_queryset(
+            model.objects.filter(user_id=self.user_id), amount_field, code_field, labels, base=self.base,
+        )
+
+    @cached_property
+    def income(self):
+        return self._columns('income')
+
+    @cached_property
+    def expense(self):
+        return self._columns('expense')
+
+    @property
+    def nbytes(self):
+        return sum(self.__dict__[kind].nbytes for kind in LEDGERS if kind in self.__dict__)
+
+    def daily_series(self, kind, days=30, now=None):
+        """(labels, Decimal totals) for days with activity in the last ``days`` days."""
+        now = now or timezone.now()
+        start = timezone.localtime(now - timedelta(days=days)).date()
+        end = timezone.localdate(now)
+        totals, counts = getattr(self, kind).daily_totals(start, end)
+        active = np.flatnonzero(counts)
+        labels = [(start + timedelta(days=int(offset))).strftime('%Y-%m-%d') for offset in active]
+        return labels, [_money(totals[offset]) for offset in active]
+
+
+def get_snapshot(user):
+    """The current LedgerSnapshot for ``user``, or None when NumPy is unavailable."""
+    if not is_available():
+        return None
+    version = get_ledger_versions(user.pk)
+    with _lock:
+        snapshot = _snapshots.get(user.pk)
+        if snapshot is not None and snapshot.version == version:
+            _snapshots.move_to_end(user.pk)
+            return snapshot
+
+    snapshot = LedgerSnapshot(user, version)
+    with _lock:
+        _snapshots[user.pk] = snapshot
+        _snapshots.move_to_end(user.pk)
+        while len(_snapshots) > getattr(settings, 'TRACKER_SNAPSHOT_USERS', 64):
+            _snapshots.popitem(last=False)
+    return snapshot
+
+
+def clear_snapshots():
+    with _lock:
+        _snapshots.clear()
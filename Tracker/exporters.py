@@ -0,0 +1,105 @@
+import csv
+import io
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Event, Expenses, Goals, Income, IncomeSource, NowNext, Projects
+
+# kind -> (model, exported columns, field used by the date-range filter)
+EXPORTS = {
+    'income': (Income, ['id', 'date', 'source__name', 'wallet', 'amount', 'currency', 'description'], 'date'),
+    'expenses': (Expenses, ['id', 'date', 'name', 'category', 'worth', 'currency', 'description'], 'date'),
+    'incomesources': (
+        IncomeSource,
+        ['id', 'name', 'client', 'start_date', 'end_date', 'worth', 'got', 'description'],
+        'start_date',
+    ),
+    'events': (
+        Event,
+        ['id', 'title', 'host', 'category', 'start_date', 'end_date', 'location', 'attended'],
+        'start_date',
+    ),
+    'goals': (Goals, ['id', 'goal_title', 'goal_description', 'date_set', 'end_date', 'achieved'], 'date_set'),
+    'projects': (
+        Projects,
+        ['id', 'name', 'status', 'date_set', 'end_date', 'description', 'what_next_id'],
+        'date_set',
+    ),
+    'nownext': (NowNext, ['id', 'date', 'do', 'done', 'challenges', 'gratitude'], 'date'),
+}
+
+CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_rows(user, kind, start=None, end=None, chunk_size=CHUNK_SIZE):
+    """Yield ``kind`` rows for ``user`` as tuples, without building model instances."""
+    model, columns, date_field = EXPORTS[kind]
+    queryset = model.objects.filter(user=user)
+    # Compare against datetime bounds rather than ``__date`` so the
+    # (user, date) indexes can be used.
+    if start is not None:
+        queryset = queryset.filter(**{f'{date_field}__gte': _start_of_day(start)})
+    if end is not None:
+        queryset = queryset.filter(**{f'{date_field}__lt': _start_of_day(end + timedelta(days=1))})
+    return queryset.order_by(date_field, 'pk').values_list(*columns).iterator(chunk_size=chunk_size)
+
+
+def _batched(rows, size=ROWS_PER_WRITE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_csv(kind, rows):
+    """Yield CSV text a few hundred rows at a time."""
+    model, columns, date_field = EXPORTS[kind]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for batch in _batched(rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def stream_json(kind, rows):
+    """Yield a JSON array of objects a few hundred rows at a time."""
+    model, columns, date_field = EXPORTS[kind]
+    encoder = DjangoJSONEncoder()
+    separator = '\n'
+    yield '['
+    for batch in _batched(rows):
+        yield separator + ',\n'.join(encoder.encode(dict(zip(columns, row))) for row in batch)
+        separator = ',\n'
+    yield '\n]\n'
+
+
+def gzip_stream(chunks):
+    """Compress a stream of text chunks into gzip bytes on the fly."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+STREAMERS = {
+    'csv': (stream_csv, 'text/csv'),
+    'json': (stream_json, 'application/json'),
+}
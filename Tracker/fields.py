@@ -0,0 +1,49 @@
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import models
+
+DEFAULT_CURRENCY = 'USD'
+MINOR_UNIT_PLACES = 2
+MINOR_UNIT = Decimal(1).scaleb(-MINOR_UNIT_PLACES)
+
+
+class MoneyField(models.BigIntegerField):
+    """An amount stored as a 64-bit integer count of minor units (cents).
+
+    Python sees ``Decimal`` values with two places, the database sees
+    integers, so ``SUM`` and comparisons in SQL are exact and aggregates
+    over this field come back as ``Decimal`` too.
+    """
+    description = "Money amount stored in minor units"
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal) and value == value.quantize(MINOR_UNIT):
+            return value
+        try:
+            return Decimal(str(value)).quantize(MINOR_UNIT, rounding=ROUND_HALF_UP)
+        except (InvalidOperation, ValueError):
+            raise ValidationError(
+                self.error_messages['invalid'], code='invalid', params={'value': value},
+            )
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        # Averages of minor units can come back as floats.
+        return Decimal(str(value)).scaleb(-MINOR_UNIT_PLACES).quantize(MINOR_UNIT, rounding=ROUND_HALF_UP)
+
+    def get_prep_value(self, value):
+        if value is None or hasattr(value, 'resolve_expression'):
+            return value
+        return int(self.to_python(value).scaleb(MINOR_UNIT_PLACES))
+
+    def formfield(self, **kwargs):
+        # Skip IntegerField's integer form field; amounts are entered in major units.
+        return models.Field.formfield(self, **{
+            'form_class': forms.DecimalField,
+            'decimal_places': MINOR_UNIT_PLACES,
+            'max_digits': 18,
+            **kwargs,
+        })
@@ -0,0 +1,231 @@
+"""Balance projections for IncomeGoals.
+
+Every user's monthly net cash flow (income minus expenses) is loaded from
+DailyRollup into one users x months NumPy matrix. Three models forecast all
+users at once:
+
+* ``moving_average``: mean of the last ``WINDOW`` months,
+* ``seasonal``: mean of the same calendar month in earlier years,
+* ``exponential_smoothing``: simple exponential smoothing with ``ALPHA``.
+
+Each user gets the model with the lowest error on their last ``HOLDOUT``
+months. The balance at a goal's ``by_when`` is the current balance plus the
+forecast for the part of each future month before ``by_when``.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import BigIntegerField, Sum
+from django.db.models.functions import Cast, TruncMonth
+from django.utils import timezone
+
+from .caching import bump_ledger_version
+from .columnar import np
+from .fields import MINOR_UNIT_PLACES
+from .models import DailyRollup, IncomeGoal, IncomeGoalForecast
+
+WINDOW = 3
+ALPHA = 0.5
+SEASON = 12
+HOLDOUT = 3
+
+METHODS = ('moving_average', 'seasonal', 'exponential_smoothing')
+
+
+def is_available():
+    return np is not None
+
+
+def _money(minor_units):
+    return Decimal(int(round(minor_units))).scaleb(-MINOR_UNIT_PLACES)
+
+
+def _month_number(day):
+    return day.year * 12 + day.month - 1
+
+
+def _month_start(number):
+    year, month = divmod(int(number), 12)
+    return timezone.make_aware(datetime(year, month + 1, 1))
+
+
+def load_monthly_net(user_ids=None, now=None):
+    """(user ids, first month number, users x months net matrix in minor units).
+
+    Months run from the earliest month with activity up to and including
+    the month of ``now``; later (scheduled) transactions are left out.
+    """
+    today = timezone.localdate(now or timezone.now())
+    rollups = DailyRollup.objects.filter(day__lte=today)
+    if user_ids is not None:
+        rollups = rollups.filter(user_id__in=user_ids)
+    rows = list(
+        rollups
+        .annotate(month=TruncMonth('day'))
+        .values('user_id', 'month')
+        .annotate(
+            income=Sum(Cast('income_total', BigIntegerField())),
+            expense=Sum(Cast('expense_total', BigIntegerField())),
+        )
+        .order_by()
+        .values_list('user_id', 'month', 'income', 'expense')
+    )
+    current = _month_number(today)
+    if not rows:
+        return np.array([], dtype=np.int64), current, np.zeros((0, 1), dtype=np.float64)
+
+    users = np.array([row[0] for row in rows], dtype=np.int64)
+    months = np.array([_month_number(row[1]) for row in rows], dtype=np.int64)
+    net = np.array([(row[2] or 0) - (row[3] or 0) for row in rows], dtype=np.float64)
+
+    user_ids, user_index = np.unique(users, return_inverse=True)
+    first = min(int(months.min()), current)
+    width = current - first + 1
+    matrix = np.zeros(len(user_ids) * width, dtype=np.float64)
+    np.add.at(matrix, user_index * width + (months - first), net)
+    return user_ids, first, matrix.reshape(len(user_ids), width)
+
+
+def forecast(history, first_month, horizon):
+    """``{method: users x horizon forecast}`` for the months after ``history``.
+
+    ``history`` is a users x months matrix whose first column is the month
+    number ``first_month``.
+    """
+    users, length = history.shape
+    if length == 0:
+        zeros = np.zeros((users, horizon))
+        return {method: zeros for method in METHODS}
+
+    recent = history[:, -WINDOW:].mean(axis=1)
+    moving_average = np.repeat(recent[:, None], horizon, axis=1)
+
+    # Closed form of level = a*x + (1-a)*level, seeded with the first month.
+    weights = ALPHA * (1 - ALPHA) ** np.arange(length - 1, -1, -1)
+    weights[0] = (1 - ALPHA) ** (length - 1)
+    level = history @ weights
+    exponential_smoothing = np.repeat(level[:, None], horizon, axis=1)
+
+    # Mean per calendar month; months never seen fall back to the moving average.
+    calendar = (first_month + np.arange(length)) % SEASON
+    sums = np.zeros((users, SEASON))
+    counts = np.bincount(calendar, minlength=SEASON)
+    for month in range(SEASON):
+        if counts[month]:
+            sums[:, month] = history[:, calendar == month].sum(axis=1)
+    seasonal_means = np.where(counts > 0, sums / np.maximum(counts, 1), recent[:, None])
+    future = (first_month + length + np.arange(horizon)) % SEASON
+    seasonal = seasonal_means[:, future]
+
+    return {
+        'moving_average': moving_average,
+        'seasonal': seasonal,
+        'exponential_smoothing': exponential_smoothing,
+    }
+
+
+def choose_methods(history, first_month):
+    """Index into METHODS of the best backtested model for each user."""
+    users, length = history.shape
+    if length <= HOLDOUT:
+        return np.zeros(users, dtype=np.int64)
+    backtest = forecast(history[:, :-HOLDOUT], first_month, HOLDOUT)
+    actual = history[:, -HOLDOUT:]
+    errors = np.stack([np.abs(backtest[method] - actual).mean(axis=1) for method in METHODS])
+    return errors.argmin(axis=0)
+
+
+def month_overlaps(start, ends, first_month, horizon):
+    """Share of each month from ``first_month`` on between ``start`` and each end.
+
+    Returns a goals x horizon matrix.
+    """
+    month_starts = np.array(
+        [_month_start(first_month + h).timestamp() for h in range(horizon + 1)], dtype=np.float64,
+    )
+    lo = np.maximum(month_starts[:-1], start.timestamp())
+    hi = np.minimum(month_starts[1:][None, :], np.array([end.timestamp() for end in ends])[:, None])
+    return np.clip(hi - lo, 0, None) / (month_starts[1:] - month_starts[:-1])
+
+
+def forecast_goals(user_ids=None, now=None):
+    """Project every (or each given user's) IncomeGoal and store the results.
+
+    Returns the number of forecasts written.
+    """
+    now = now or timezone.now()
+    goals = IncomeGoal.objects.filter(user__isnull=False).order_by('pk')
+    if user_ids is not None:
+        goals = goals.filter(user_id__in=user_ids)
+    goals = list(goals)
+    if not goals:
+        return 0
+
+    ids, first, matrix = load_monthly_net(sorted({goal.user_id for goal in goals}), now=now)
+    row_of = {int(user_id): row for row, user_id in enumerate(ids)}
+    balances = matrix.sum(axis=1)
+
+    # The current month is still in progress: forecast it with the rest of
+    # the future and count its actual-to-date in the balance.
+    current = _month_number(timezone.localtime(now))
+    history = matrix[:, :current - first]
+    last_goal = max(goal.by_when for goal in goals)
+    horizon = max(_month_number(timezone.localtime(last_goal)) - current + 1, 1)
+    forecasts = forecast(history, first, horizon)
+    best = choose_methods(history, first)
+    stacked = np.stack([forecasts[method] for method in METHODS])
+
+    overlaps = month_overlaps(now, [goal.by_when for goal in goals], current, horizon)
+
+    objs = []
+    for index, goal in enumerate(goals):
+        row = row_of.get(goal.user_id)
+        if row is None:
+            balance, monthly, method, added = 0.0, 0.0, METHODS[0], 0.0
+        else:
+            method_index = best[row]
+            series = stacked[method_index, row]
+            balance, monthly, method = balances[row], series[0], METHODS[method_index]
+            added = float(series @ overlaps[index])
+        objs.append(IncomeGoalForecast(
+            goal=goal,
+            projected_balance=_money(balance + added),
+            monthly_net=_money(monthly),
+            method=method,
+            computed_at=now,
+        ))
+
+    IncomeGoalForecast.objects.bulk_create(
+        objs,
+        update_conflicts=True,
+        unique_fields=['goal'],
+        update_fields=['projected_balance', 'monthly_net', 'method', 'computed_at'],
+    )
+    # The income form shows the forecast from the stats cache.
+    if user_ids is None:
+        bump_ledger_version()
+    else:
+        for user_id in user_ids:
+            bump_ledger_version(user_id)
+    return len(objs)
+
+
+def get_goal_forecast(user, now=None):
+    """The user's next IncomeGoal with its forecast, computing it if missing.
+
+    Returns None when the user has no upcoming goal.
+    """
+    now = now or timezone.now()
+    goal = (
+        IncomeGoal.objects
+        .filter(user=user, by_when__gte=now)
+        .select_related('forecast')
+        .order_by('by_when')
+        .first()
+    )
+    if goal is None:
+        return None
+    if not hasattr(goal, 'forecast') and is_available():
+        forecast_goals(user_ids=[user.pk], now=now)
+        goal = IncomeGoal.objects.select_related('forecast').get(pk=goal.pk)
+    return goal
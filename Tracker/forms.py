@@ -1,5 +1,7 @@
 from django import forms
 from .models import *
+from .fields import DEFAULT_CURRENCY
+from .fx import currency_choices
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 
@@ -10,6 +12,22 @@ class CustomUserCreationForm(UserCreationForm):
         model = User
         fields = ("username", "email", "password1", "password2")
 
+class CurrencyField(forms.ChoiceField):
+    """A currency code FX rates are known for; input is upper-cased first.
+
+    Left blank on an optional field it cleans to ``DEFAULT_CURRENCY``.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('initial', DEFAULT_CURRENCY)
+        super().__init__(choices=currency_choices, **kwargs)
+
+    def to_python(self, value):
+        return super().to_python(value).strip().upper()
+
+    def clean(self, value):
+        return super().clean(value) or DEFAULT_CURRENCY
+
 class IncomeSourceForm(forms.ModelForm):
     class Meta:
         model = IncomeSource
@@ -21,18 +39,22 @@ class IncomeSourceForm(forms.ModelForm):
         }
 
 class IncomeForm(forms.ModelForm):
+    currency = CurrencyField(required=False)
+
     class Meta:
         model = Income
-        fields = ['source', 'wallet', 'amount', 'date', 'description']
+        fields = ['source', 'wallet', 'amount', 'currency', 'date', 'description']
         widgets = {
             'date': forms.DateTimeInput(attrs={'type': 'datetime-local', 'class': 'form-control'}),
             'description': forms.Textarea(attrs={'rows': 3, 'class': 'form-control'}),
         }
 
 class ExpensesForm(forms.ModelForm):
+    currency = CurrencyField(required=False)
+
     class Meta:
         model = Expenses
-        fields = ['name', 'worth', 'description', 'date', 'category']
+        fields = ['name', 'worth', 'currency', 'description', 'date', 'category', 'wallet']
         widgets = {
             'date': forms.DateTimeInput(attrs={
                 'type': 'datetime-local',
@@ -66,6 +88,18 @@ class ExpensesForm(forms.ModelForm):
             'placeholder': '0.00'
         })
 
+        # Left blank on create, the view fills in a keyword-based suggestion.
+        if not self.instance.pk:
+            self.fields['category'].required = False
+            self.fields['category'].choices = [('', '---------')] + Expenses.CATEGORY_CHOICES
+            self.initial['category'] = ''
+
+        # Posts that leave the wallet out are paid from the default one.
+        self.fields['wallet'].required = False
+
+    def clean_wallet(self):
+        return self.cleaned_data['wallet'] or Expenses._meta.get_field('wallet').default
+
 class NowNextForm(forms.ModelForm):
     class Meta:
         model = NowNext
@@ -155,4 +189,22 @@ class PictureForm(forms.ModelForm):
             'picture': forms.FileInput(attrs={
                 'class': 'bg-slate-800 border border-slate-700 rounded-lg px-4 py-3 w-full focus:outline-none focus:ring-2 focus:ring-emerald-500'
             }),
-        }
\ No newline at end of file
+        }
+
+class BudgetForm(forms.Form):
+    """This month's spending limit, overall or for one category."""
+    category = forms.ChoiceField(
+        choices=Budget.CATEGORY_CHOICES, required=False, widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    amount = Budget._meta.get_field('amount').formfield(
+        min_value=0, widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
+    )
+
+class LedgerImportForm(forms.Form):
+    KINDS = [
+        ('income', 'Income'),
+        ('expenses', 'Expenses'),
+    ]
+
+    kind = forms.ChoiceField(choices=KINDS, widget=forms.Select(attrs={'class': 'form-control'}))
+    file = forms.FileField(widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv'}))
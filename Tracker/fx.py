@@ -0,0 +1,206 @@
+"""Currency conversion against a local table of FX rates.
+
+FxRate holds, per currency and day, the value of one unit in the pivot
+currency ``DEFAULT_CURRENCY``; it is loaded from CSV files by
+``manage.py load_fx_rates`` and nothing is fetched over the network. On day
+``d`` an amount in currency ``A`` is worth ``amount * rate(A, d) / rate(B, d)``
+in ``B``, where ``rate`` is the latest rate on or before ``d`` (the earliest
+known rate for days before it). The pivot currency, and currencies without
+any rate, count at par.
+
+DailyRollup totals are kept in each user's base currency
+(``UserProfile.base_currency``). Signal handlers, imports and recurring
+rules convert single amounts through the in-process ``RateTable``;
+``rebuild_rollups`` converts in SQL with ``converted_amount``; columnar
+snapshots convert whole columns with ``RateTable.convert_array``.
+"""
+import csv
+import codecs
+import threading
+from bisect import bisect_right
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db.models import Case, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+from django.utils.dateparse import parse_date
+
+from Users.models import UserProfile
+
+from .caching import BASE_CURRENCY_KEY, bump_fx_version, get_cache, get_fx_version
+from .fields import DEFAULT_CURRENCY, MINOR_UNIT, MoneyField
+from .models import FxRate
+
+_table = None
+_lock = threading.Lock()
+
+
+class RateTable:
+    """All FX rates, indexed per currency for lookups by day."""
+
+    def __init__(self, rows):
+        self.dates = {}
+        self.rates = {}
+        for currency, day, rate in rows:
+            self.dates.setdefault(currency, []).append(day)
+            self.rates.setdefault(currency, []).append(rate)
+        self._arrays = {}
+
+    def rate(self, currency, day):
+        dates = self.dates.get(currency)
+        if currency == DEFAULT_CURRENCY or not dates:
+            return Decimal(1)
+        return self.rates[currency][max(bisect_right(dates, day) - 1, 0)]
+
+    def convert(self, amount, currency, base, day):
+        """``amount`` in ``currency`` on ``day``, in ``base``."""
+        if currency == base:
+            return amount
+        value = amount * self.rate(currency, day) / self.rate(base, day)
+        return value.quantize(MINOR_UNIT, rounding=ROUND_HALF_UP)
+
+    def _rate_array(self, np, currency, days):
+        if currency == DEFAULT_CURRENCY or currency not in self.dates:
+            return np.ones(len(days))
+        if currency not in self._arrays:
+            self._arrays[currency] = (
+                np.array(self.dates[currency], dtype='datetime64[D]'),
+                np.array(self.rates[currency], dtype=np.float64),
+            )
+        dates, rates = self._arrays[currency]
+        return rates[np.maximum(np.searchsorted(dates, days, side='right') - 1, 0)]
+
+    def convert_array(self, np, amounts, currencies, days, base):
+        """Vectorised ``convert`` of int64 minor-unit ``amounts``.
+
+        ``currencies`` is an array of currency codes and ``days`` a
+        ``datetime64[D]`` array, both aligned with ``amounts``.
+        """
+        converted = amounts.copy()
+        for currency in np.unique(currencies):
+            if currency == base:
+                continue
+            mask = currencies == currency
+            factor = self._rate_array(np, currency, days[mask]) / self._rate_array(np, base, days[mask])
+            values = amounts[mask] * factor
+            # Half away from zero, like ROUND_HALF_UP and SQL ROUND().
+            converted[mask] = (np.sign(values) * np.floor(np.abs(values) + 0.5)).astype(np.int64)
+        return converted
+
+
+def get_rates():
+    """The process-wide RateTable, reloaded after ``load_rates`` runs anywhere.
+
+    Other processes learn of new rates through the FX version in the stats
+    cache, which is why that cache must be shared (see ``check_shared_cache``).
+    """
+    global _table
+    version = get_fx_version()
+    with _lock:
+        if _table is not None and _table[0] == version:
+            return _table[1]
+    table = RateTable(FxRate.objects.order_by('currency', 'date').values_list('currency', 'date', 'rate'))
+    with _lock:
+        _table = (version, table)
+    return table
+
+
+def currency_choices():
+    """``[(code, code)]`` for the pivot currency and every currency with rates loaded."""
+    return [(code, code) for code in sorted({DEFAULT_CURRENCY, *get_rates().dates})]
+
+
+def get_base_currency(user_id):
+    """The currency ``user_id``'s totals are kept in (cached until their profile changes)."""
+    cache = get_cache()
+    key = BASE_CURRENCY_KEY.format(user_id=user_id)
+    base = cache.get(key)
+    if base is None:
+        base = base_currencies([user_id])[user_id]
+        cache.set(key, base, None)
+    return base
+
+
+def forget_base_currency(user_id):
+    get_cache().delete(BASE_CURRENCY_KEY.format(user_id=user_id))
+
+
+def base_currencies(user_ids):
+    """``{user_id: base currency}`` for many users in one query."""
+    bases = dict.fromkeys(user_ids, DEFAULT_CURRENCY)
+    bases.update(
+        UserProfile.objects.filter(user_id__in=list(user_ids)).values_list('user_id', 'base_currency')
+    )
+    return bases
+
+
+def to_base_currency(user_id, amount, currency, day, base=None):
+    """``amount`` in ``currency`` on ``day``, in the user's base currency."""
+    if user_id is None:
+        return amount
+    base = base or get_base_currency(user_id)
+    if currency == base:
+        return amount
+    return get_rates().convert(amount, currency, base, day)
+
+
+def _rate(currency):
+    # Latest rate on or before the outer row's day, else the earliest rate,
+    # else par; cast so whole-number rates do not divide as integers.
+    rates = FxRate.objects.filter(currency=currency)
+    return Cast(Coalesce(
+        Subquery(rates.filter(date__lte=OuterRef('day')).order_by('-date').values('rate')[:1]),
+        Subquery(rates.order_by('date').values('rate')[:1]),
+        Value(Decimal(1)),
+    ), FloatField())
+
+
+def converted_amount(field):
+    """SQL expression for ``field`` in the row owner's base currency.
+
+    The queryset must be annotated with ``day`` (the row's date) and
+    ``base`` (the owner's base currency, see ``base_currency_expression``).
+    Converted amounts are rounded to minor units row by row, like
+    ``RateTable.convert``, so sums match the incrementally maintained ones.
+    """
+    converted = ExpressionWrapper(
+        F(field) * _rate(OuterRef('currency')) / _rate(OuterRef('base')), output_field=FloatField(),
+    )
+    return Case(
+        When(currency=F('base'), then=F(field)),
+        default=Round(converted),
+        output_field=MoneyField(),
+    )
+
+
+def base_currency_expression():
+    """Annotation for the base currency of each row's ``user``."""
+    return Coalesce(F('user__userprofile__base_currency'), Value(DEFAULT_CURRENCY))
+
+
+def load_rates(fileobj, batch_size=1000):
+    """Load ``date,currency,rate`` CSV rows, replacing existing rates for the same day.
+
+    Returns the number of rows loaded; raises ValidationError on a bad row.
+    """
+    if isinstance(fileobj.read(0), bytes):
+        fileobj = codecs.iterdecode(fileobj, 'utf-8-sig')
+    reader = csv.DictReader(fileobj)
+    objs = []
+    for row in reader:
+        try:
+            day = parse_date((row.get('date') or '').strip())
+            currency = (row.get('currency') or '').strip().upper()
+            rate = Decimal((row.get('rate') or '').strip())
+        except (InvalidOperation, ValueError):
+            day = None
+        if day is None or len(currency) != 3 or not rate > 0:
+            raise ValidationError(f"Line {reader.line_num}: expected date,currency,rate but got {row}")
+        objs.append(FxRate(currency=currency, date=day, rate=rate))
+
+    FxRate.objects.bulk_create(
+        objs, batch_size=batch_size,
+        update_conflicts=True, unique_fields=['currency', 'date'], update_fields=['rate'],
+    )
+    bump_fx_version()
+    return len(objs)
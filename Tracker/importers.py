@@ -0,0 +1,229 @@
+import codecs
+import csv
+import hashlib
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .budgets import reconcile_budgets
+from .caching import bump_ledger_version
+from .fields import MINOR_UNIT
+from .forms import ExpensesForm, IncomeForm
+from .fx import to_base_currency
+from .models import Expenses, Income, IncomeSource
+from .rollups import apply_delta, expense_key, income_key
+from .search import index_objects
+from .wallets import add_moves
+
+MAX_REPORTED_ERRORS = 20
+
+
+class ImportResult:
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Line {line}: {message}")
+
+    def __str__(self):
+        return (
+            f"{self.processed} rows read, {self.created} imported, "
+            f"{self.duplicates} duplicates skipped, {self.invalid} invalid"
+        )
+
+
+class LedgerImporter:
+    """Stream a CSV of Income or Expenses rows into the database.
+
+    Rows are validated with the fields of the matching ModelForm (cleaned
+    field by field, so no form is built per row), de-duplicated on a hash of
+    their cleaned content and written with ``bulk_create`` one batch at a
+    time inside a single transaction. Memory stays bounded by the batch size.
+    """
+    model = None
+    form_class = None
+
+    def __init__(self, user, batch_size=1000, progress=None):
+        self.user = user
+        self.batch_size = batch_size
+        self.progress = progress
+        self.fields = dict(self.form_class.base_fields)
+        self.rollup_deltas = defaultdict(Decimal)
+        self.rollup_counts = defaultdict(int)
+
+    def clean_row(self, row):
+        cleaned = {}
+        errors = []
+        for name, field in self.fields.items():
+            try:
+                cleaned[name] = field.clean(self.raw_value(name, row))
+            except ValidationError as e:
+                errors.append(f"{name}: {' '.join(e.messages)}")
+        if errors:
+            raise ValidationError('; '.join(errors))
+        return cleaned
+
+    def raw_value(self, name, row):
+        value = row.get(name)
+        return value.strip() if isinstance(value, str) else value
+
+    def row_hash(self, cleaned):
+        content = '\x1f'.join(
+            f"{name}={self.hash_value(value)}" for name, value in sorted(cleaned.items())
+        )
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def hash_value(value):
+        if isinstance(value, Decimal):
+            return value.quantize(MINOR_UNIT)
+        return getattr(value, 'pk', value)
+
+    def build(self, cleaned, import_hash):
+        raise NotImplementedError
+
+    def record_rollup(self, obj):
+        raise NotImplementedError
+
+    def apply_rollup(self, key, total, count):
+        raise NotImplementedError
+
+    def run(self, fileobj):
+        """Import every row of ``fileobj`` (text or binary) and return an ImportResult."""
+        if isinstance(fileobj.read(0), bytes):
+            fileobj = codecs.iterdecode(fileobj, 'utf-8-sig')
+        reader = csv.DictReader(fileobj)
+        result = ImportResult()
+
+        with transaction.atomic():
+            batch = {}
+            for row in reader:
+                result.processed += 1
+                try:
+                    cleaned = self.clean_row(row)
+                except ValidationError as e:
+                    result.add_error(reader.line_num, ' '.join(e.messages))
+                    continue
+                import_hash = self.row_hash(cleaned)
+                if import_hash in batch:
+                    result.duplicates += 1
+                    continue
+                batch[import_hash] = cleaned
+                if len(batch) >= self.batch_size:
+                    self.flush(batch, result)
+                    batch = {}
+            if batch:
+                self.flush(batch, result)
+
+            for key, total in self.rollup_deltas.items():
+                self.apply_rollup(dict(key), total, self.rollup_counts[key])
+            # bulk_create skips the signals that keep budget spend current.
+            if result.created and self.model is Expenses:
+                reconcile_budgets(user=self.user)
+
+        if result.created:
+            bump_ledger_version(self.user.pk)
+        return result
+
+    def flush(self, batch, result):
+        existing = set(
+            self.model.objects
+            .filter(user=self.user, import_hash__in=list(batch))
+            .values_list('import_hash', flat=True)
+        )
+        objs = [
+            self.build(cleaned, import_hash)
+            for import_hash, cleaned in batch.items()
+            if import_hash not in existing
+        ]
+        self.model.objects.bulk_create(objs, batch_size=self.batch_size)
+        # bulk_create skips post_save, so the search rows and wallet
+        # balances are written here.
+        index_objects(objs)
+        add_moves(objs)
+        for obj in objs:
+            self.record_rollup(obj)
+
+        result.duplicates += len(existing)
+        result.created += len(objs)
+        if self.progress:
+            self.progress(result)
+
+
+class IncomeImporter(LedgerImporter):
+    """CSV columns: source (name or id, optional), wallet, amount, currency (optional), date, description."""
+    model = Income
+    form_class = IncomeForm
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Resolve sources from an in-memory map instead of a query per row.
+        del self.fields['source']
+        self.sources = {}
+        for source in IncomeSource.objects.filter(user=self.user):
+            self.sources[str(source.pk)] = source
+            self.sources.setdefault(source.name, source)
+
+    def clean_row(self, row):
+        value = self.raw_value('source', row)
+        if value and value not in self.sources:
+            raise ValidationError(f"source: Unknown income source '{value}'.")
+        cleaned = super().clean_row(row)
+        cleaned['source'] = self.sources.get(value) if value else None
+        return cleaned
+
+    def build(self, cleaned, import_hash):
+        return Income(user=self.user, import_hash=import_hash, **cleaned)
+
+    def record_rollup(self, obj):
+        key = income_key(obj.user_id, obj.date, obj.wallet)
+        total = to_base_currency(obj.user_id, obj.amount, obj.currency, key['day'])
+        key = tuple(key.items())
+        self.rollup_deltas[key] += total
+        self.rollup_counts[key] += 1
+
+    def apply_rollup(self, key, total, count):
+        apply_delta(key, income_total=total, income_count=count)
+
+
+class ExpensesImporter(LedgerImporter):
+    """CSV columns: name, worth, currency (optional), description, date, category, wallet (optional)."""
+    model = Expenses
+    form_class = ExpensesForm
+    default_wallet = Expenses._meta.get_field('wallet').default
+
+    def clean_row(self, row):
+        if not self.raw_value('wallet', row):
+            row = {**row, 'wallet': self.default_wallet}
+        return super().clean_row(row)
+
+    def build(self, cleaned, import_hash):
+        return Expenses(user=self.user, import_hash=import_hash, **cleaned)
+
+    def record_rollup(self, obj):
+        key = expense_key(obj.user_id, obj.date, obj.category)
+        total = to_base_currency(obj.user_id, obj.worth, obj.currency, key['day'])
+        key = tuple(key.items())
+        self.rollup_deltas[key] += total
+        self.rollup_counts[key] += 1
+
+    def apply_rollup(self, key, total, count):
+        apply_delta(key, expense_total=total, expense_count=count)
+
+
+IMPORTERS = {
+    'income': IncomeImporter,
+    'expenses': ExpensesImporter,
+}
+
+
+def import_ledger(user, kind, fileobj, batch_size=1000, progress=None):
+    return IMPORTERS[kind](user, batch_size=batch_size, progress=progress).run(fileobj)
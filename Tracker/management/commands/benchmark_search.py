@@ -0,0 +1,75 @@
+import random
+import sqlite3
+import statistics
+import string
+import time
+
+from django.core.management.base import BaseCommand
+
+from Tracker.search import CREATE_TABLE_SQL, INSERT_SQL, SEARCH_SQL, SOURCES, build_match, encode_rowid, owner_token
+
+BATCH_SIZE = 10_000
+WORDS_PER_ROW = 18
+TITLE_WORDS = 3
+
+
+class Command(BaseCommand):
+    help = (
+        "Time full-text queries against a synthetic in-memory search table. "
+        "Words follow a Zipf distribution like natural text. Nothing is written "
+        "to the project database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--vocabulary', type=int, default=20_000)
+        parser.add_argument('--queries', type=int, default=300)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = [
+            ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+            for _ in range(options['vocabulary'])
+        ]
+        weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+        kinds = list(SOURCES)
+
+        db = sqlite3.connect(':memory:')
+        db.execute(CREATE_TABLE_SQL)
+        insert = INSERT_SQL.replace('%s', '?')
+        started = time.perf_counter()
+        for offset in range(0, options['rows'], BATCH_SIZE):
+            pks = range(offset, min(offset + BATCH_SIZE, options['rows']))
+            words = rng.choices(vocabulary, weights, k=len(pks) * WORDS_PER_ROW)
+            rows = []
+            for i, pk in enumerate(pks):
+                row_words = words[i * WORDS_PER_ROW:(i + 1) * WORDS_PER_ROW]
+                kind = kinds[pk % len(kinds)]
+                rows.append((
+                    encode_rowid(kind, pk),
+                    owner_token(rng.randrange(options['users'])),
+                    kind,
+                    ' '.join(row_words[:TITLE_WORDS]),
+                    ' '.join(row_words[TITLE_WORDS:]),
+                ))
+            db.executemany(insert, rows)
+        db.commit()
+        self.stdout.write(f"Indexed {options['rows']} rows in {time.perf_counter() - started:.1f}s")
+
+        select = SEARCH_SQL.replace('%s', '?')
+        timings = []
+        for _ in range(options['queries']):
+            query = ' '.join(rng.choices(vocabulary, weights, k=rng.randint(1, 2)))
+            match = build_match(rng.randrange(options['users']), query)
+            started = time.perf_counter()
+            db.execute(select, ['[', ']', match, 50]).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        percentile = lambda p: timings[max(0, int(len(timings) * p) - 1)]
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(timings)} queries: median {statistics.median(timings):.2f}ms, "
+            f"p90 {percentile(0.9):.2f}ms, p99 {percentile(0.99):.2f}ms, max {timings[-1]:.2f}ms"
+        ))
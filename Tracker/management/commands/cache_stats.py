@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from Tracker.caching import cache_counters, reset_cache_counters
+
+
+class Command(BaseCommand):
+    help = "Report hit and miss counters of the per-user statistics cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Reset the counters after reporting.")
+
+    def handle(self, *args, **options):
+        counters = cache_counters()
+        lookups = counters['hits'] + counters['misses']
+        ratio = (counters['hits'] / lookups * 100) if lookups else 0
+        self.stdout.write(f"hits={counters['hits']} misses={counters['misses']} hit_ratio={ratio:.1f}%")
+        if options['reset']:
+            reset_cache_counters()
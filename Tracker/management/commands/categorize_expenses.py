@@ -0,0 +1,27 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from Tracker.categorizer import backfill_categories
+
+
+class Command(BaseCommand):
+    help = "Assign categories to uncategorized expenses using keyword rules."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only categorize this username's expenses.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        total = 0
+        for user in users.iterator():
+            updated = backfill_categories(user, batch_size=options['batch_size'])
+            if updated:
+                self.stdout.write(f"  {user.username}: {updated} expenses categorized")
+            total += updated
+        self.stdout.write(self.style.SUCCESS(f"Categorized {total} expenses."))
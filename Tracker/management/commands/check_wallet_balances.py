@@ -0,0 +1,31 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from Tracker.wallets import check_balances
+
+
+class Command(BaseCommand):
+    help = "Verify the stored wallet balances against a full recomputation from the ledgers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only check this username's wallets.")
+        parser.add_argument('--fix', action='store_true', help="Rewrite the balances that are out of sync.")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        mismatches = check_balances(user=user, fix=options['fix'])
+        for (user_id, wallet, currency), stored, expected in mismatches:
+            self.stdout.write(f"  user {user_id} {wallet} {currency}: stored {stored}, expected {expected}")
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("All wallet balances are consistent."))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Corrected {len(mismatches)} wallet balances."))
+        else:
+            raise CommandError(f"{len(mismatches)} wallet balances are out of sync; rerun with --fix to correct them.")
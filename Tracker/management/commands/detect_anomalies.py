@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from Tracker.anomalies import CHUNK_USERS, detect_anomalies, is_available
+
+
+class Command(BaseCommand):
+    help = "Flag unusually large expenses for every user. Meant to run nightly."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rescore this username's expenses.")
+        parser.add_argument('--chunk-users', type=int, default=CHUNK_USERS,
+                            help="Users whose expenses are loaded and scored together.")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Score chunks in this many forked processes.")
+
+    def handle(self, *args, **options):
+        if not is_available():
+            raise CommandError("Anomaly detection needs NumPy")
+
+        user_ids = None
+        if options['user']:
+            try:
+                user_ids = [User.objects.get(username=options['user']).pk]
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        def progress(total):
+            self.stdout.write(f"  {total} flagged so far")
+
+        flagged = detect_anomalies(
+            user_ids=user_ids,
+            chunk_users=options['chunk_users'],
+            workers=options['workers'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Flagged {flagged} expenses."))
@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from Tracker.forecasting import forecast_goals, is_available
+
+
+class Command(BaseCommand):
+    help = (
+        "Project every IncomeGoal's balance at its deadline and store the results. "
+        "Meant to run on a schedule, e.g. nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only forecast this username's goals.")
+
+    def handle(self, *args, **options):
+        if not is_available():
+            raise CommandError("Forecasting needs NumPy")
+
+        user_ids = None
+        if options['user']:
+            try:
+                user_ids = [User.objects.get(username=options['user']).pk]
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        written = forecast_goals(user_ids=user_ids)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} goal forecasts."))
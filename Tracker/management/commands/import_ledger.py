@@ -0,0 +1,35 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from Tracker.importers import IMPORTERS, import_ledger
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV file of income or expense records into a user's ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path', help="Path to the CSV file.")
+        parser.add_argument('--user', required=True, help="Username that will own the records.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+
+        def progress(result):
+            self.stdout.write(f"  {result}")
+
+        try:
+            with open(options['path'], 'rb') as f:
+                result = import_ledger(
+                    user, options['kind'], f, batch_size=options['batch_size'], progress=progress,
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for error in result.errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(str(result)))
@@ -0,0 +1,52 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from Tracker.budgets import reconcile_budgets
+from Tracker.fields import DEFAULT_CURRENCY
+from Tracker.fx import load_rates
+from Tracker.models import Expenses, Income
+from Tracker.rollups import rebuild_rollups
+from Users.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Load FX rates from CSV files with date, currency and rate columns, then "
+        "rebuild the rollups of users whose totals are converted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="CSV files of rates.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        loaded = 0
+        try:
+            with transaction.atomic():
+                for path in options['paths']:
+                    with open(path, 'rb') as f:
+                        count = load_rates(f, batch_size=options['batch_size'])
+                    self.stdout.write(f"  {path}: {count} rates")
+                    loaded += count
+        except OSError as e:
+            raise CommandError(str(e))
+        except ValidationError as e:
+            raise CommandError('; '.join(e.messages))
+
+        # Only users with amounts outside the pivot currency, or another base
+        # currency, have totals that depend on the rates.
+        user_ids = set(UserProfile.objects.exclude(base_currency=DEFAULT_CURRENCY).values_list('user_id', flat=True))
+        for model in (Income, Expenses):
+            user_ids.update(
+                model.objects.filter(user__isnull=False).exclude(currency=DEFAULT_CURRENCY)
+                .values_list('user_id', flat=True).distinct()
+            )
+        for user in User.objects.filter(pk__in=user_ids).order_by('pk'):
+            rebuild_rollups(user)
+            reconcile_budgets(user)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {loaded} rates and rebuilt the rollups of {len(user_ids)} users."
+        ))
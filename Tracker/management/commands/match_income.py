@@ -0,0 +1,41 @@
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from Tracker.matching import TOLERANCE, WINDOW_DAYS, match_income
+
+
+class Command(BaseCommand):
+    help = "Link income records without a source to the unpaid income sources they pay, and mark those paid."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only match this username's records.")
+        parser.add_argument('--tolerance', default=str(TOLERANCE),
+                            help="Allowed difference between amount and worth, as a fraction of the worth.")
+        parser.add_argument('--window', type=int, default=WINDOW_DAYS,
+                            help="Days before or after a source's end date an income may fall.")
+        parser.add_argument('--dry-run', action='store_true', help="Report matches without saving them.")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+        try:
+            tolerance = Decimal(options['tolerance'])
+        except InvalidOperation:
+            raise CommandError(f"Invalid tolerance '{options['tolerance']}'")
+
+        def progress(user_id, count):
+            if count:
+                self.stdout.write(f"  user {user_id}: {count} matches")
+
+        matches = match_income(
+            user=user, tolerance=tolerance, window_days=options['window'],
+            dry_run=options['dry_run'], progress=progress,
+        )
+        verb = "Would link" if options['dry_run'] else "Linked"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(matches)} income records to their sources."))
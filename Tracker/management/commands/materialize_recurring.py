@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from Tracker.recurring import BATCH_SIZE, materialize_recurring
+
+
+class Command(BaseCommand):
+    help = "Write every due occurrence of the recurring income and expense rules. Safe to re-run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help="Rules expanded and written per transaction.")
+
+    def handle(self, *args, **options):
+        def progress(processed, created):
+            self.stdout.write(f"  {processed} rules processed, {created} occurrences created")
+
+        processed, created = materialize_recurring(batch_size=options['batch_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} occurrences from {processed} due rules."
+        ))
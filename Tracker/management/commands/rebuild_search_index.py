@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Tracker.search import is_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search table from every searchable record."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not is_available():
+            raise CommandError("Full-text search needs the SQLite database backend")
+        written = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {written} records."))
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from Tracker.budgets import reconcile_budgets
+
+
+class Command(BaseCommand):
+    help = "Recompute budget month-to-date spend from the DailyRollup table and fix any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only reconcile this username's budgets.")
+        parser.add_argument('--month', help="Only reconcile budgets for this month (YYYY-MM).")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        months = None
+        if options['month']:
+            try:
+                months = [datetime.strptime(options['month'], '%Y-%m').date()]
+            except ValueError:
+                raise CommandError(f"Invalid month '{options['month']}', expected YYYY-MM")
+
+        fixed = reconcile_budgets(user=user, months=months)
+        self.stdout.write(self.style.SUCCESS(f"Corrected {fixed} budgets."))
@@ -0,0 +1,133 @@
+"""Linking unlinked Income rows to the open IncomeSource contracts they pay.
+
+An income can pay a contract of the same user and currency when its
+amount is within ``tolerance`` (a fraction of the contract's worth) and
+its date is within ``window`` days of the contract's ``end_date``. Among
+the candidates, contracts whose client (or name) appears in the income's
+description win, then the closest amount, then the closest date. Each
+contract takes one income and is marked ``got``.
+
+Matching is a band join done in Python: per (user, currency) the
+contracts are sorted by ``end_date`` and the incomes by ``date``, and a
+sweep keeps the contracts inside the date window in a list sorted by
+worth, where each income finds its amount range by bisection. That is
+O((n + m) log m) per user instead of a query or a comparison per pair.
+"""
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from .caching import bump_ledger_version
+from .models import Income, IncomeSource
+
+TOLERANCE = Decimal('0.02')
+WINDOW_DAYS = 30
+BATCH_SIZE = 1000
+
+
+def _mentions(description, source):
+    label = (source.client or source.name).strip().lower()
+    return bool(label) and label in description
+
+
+def match_group(incomes, sources, tolerance=TOLERANCE, window=timedelta(days=WINDOW_DAYS)):
+    """``[(income, source)]`` pairs for incomes and contracts of one user and currency."""
+    incomes = sorted(incomes, key=lambda income: (income.date, income.pk))
+    sources = sorted(sources, key=lambda source: (source.end_date, source.pk))
+    descriptions = {income.pk: income.description.lower() for income in incomes}
+
+    active = []  # (worth, index into sources) of contracts inside the window
+    entered = left = 0
+    matches = []
+    for income in incomes:
+        while entered < len(sources) and sources[entered].end_date <= income.date + window:
+            insort(active, (sources[entered].worth, entered))
+            entered += 1
+        while left < entered and sources[left].end_date < income.date - window:
+            position = bisect_left(active, (sources[left].worth, left))
+            if position < len(active) and active[position][1] == left:
+                del active[position]
+            left += 1
+
+        # worth * (1 - tolerance) <= amount <= worth * (1 + tolerance)
+        low = income.amount / (1 + tolerance)
+        high = income.amount / (1 - tolerance) if tolerance < 1 else None
+        start = bisect_left(active, (low, -1))
+        stop = bisect_right(active, (high, len(sources))) if high is not None else len(active)
+        best = None
+        for position in range(start, stop):
+            worth, index = active[position]
+            source = sources[index]
+            rank = (
+                not _mentions(descriptions[income.pk], source),
+                abs(income.amount - worth),
+                abs(income.date - source.end_date),
+            )
+            if best is None or rank < best[0]:
+                best = (rank, position, source)
+        if best is not None:
+            del active[best[1]]
+            matches.append((income, best[2]))
+    return matches
+
+
+def match_user(user_id, tolerance=TOLERANCE, window_days=WINDOW_DAYS):
+    """Matches for one user's unlinked incomes and unpaid contracts."""
+    incomes = defaultdict(list)
+    for income in (
+        Income.objects.filter(user_id=user_id, source__isnull=True)
+        .only('pk', 'amount', 'currency', 'date', 'description')
+    ):
+        incomes[income.currency].append(income)
+    sources = defaultdict(list)
+    for source in (
+        IncomeSource.objects.filter(user_id=user_id, got=False)
+        .only('pk', 'client', 'name', 'worth', 'currency', 'end_date')
+    ):
+        sources[source.currency].append(source)
+
+    window = timedelta(days=window_days)
+    matches = []
+    for currency in incomes.keys() & sources.keys():
+        matches.extend(match_group(incomes[currency], sources[currency], tolerance=tolerance, window=window))
+    return matches
+
+
+def match_income(user=None, tolerance=TOLERANCE, window_days=WINDOW_DAYS, dry_run=False, progress=None):
+    """Link unlinked incomes to the contracts they pay, for one or every user.
+
+    Links are written with ``bulk_update`` and ``got`` flags with one
+    UPDATE per batch; with ``dry_run`` nothing is written. Returns the ``(income, source)`` pairs.
+    """
+    if user is not None:
+        user_ids = [user.pk]
+    else:
+        user_ids = list(
+            Income.objects.filter(user__isnull=False, source__isnull=True)
+            .order_by('user_id').values_list('user_id', flat=True).distinct()
+        )
+
+    matched = []
+    for user_id in user_ids:
+        with transaction.atomic():
+            matches = match_user(user_id, tolerance=tolerance, window_days=window_days)
+            if matches and not dry_run:
+                for income, source in matches:
+                    income.source = source
+                    source.got = True
+                Income.objects.bulk_update([income for income, source in matches], ['source'], batch_size=BATCH_SIZE)
+                # Every flag becomes True, so a plain UPDATE per batch does
+                # what bulk_update would with a CASE branch per row.
+                source_ids = [source.pk for income, source in matches]
+                for start in range(0, len(source_ids), BATCH_SIZE):
+                    IncomeSource.objects.filter(pk__in=source_ids[start:start + BATCH_SIZE]).update(got=True)
+        if matches and not dry_run:
+            # bulk_update skips the signals that bump the version.
+            bump_ledger_version(user_id)
+        matched.extend(matches)
+        if progress:
+            progress(user_id, len(matches))
+    return matched
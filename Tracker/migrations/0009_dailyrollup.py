@@ -0,0 +1,67 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_rollups(apps, schema_editor):
+    Income = apps.get_model('Tracker', 'Income')
+    Expenses = apps.get_model('Tracker', 'Expenses')
+    DailyRollup = apps.get_model('Tracker', 'DailyRollup')
+
+    objs = [
+        DailyRollup(
+            user_id=row['user_id'], day=row['day'], wallet=row['wallet'], category='',
+            income_total=row['total'] or 0, income_count=row['count'],
+        )
+        for row in Income.objects.filter(user__isnull=False)
+        .annotate(day=TruncDate('date'))
+        .values('user_id', 'day', 'wallet')
+        .annotate(total=Sum('amount'), count=Count('pk'))
+        .order_by()
+    ]
+    objs.extend(
+        DailyRollup(
+            user_id=row['user_id'], day=row['day'], wallet='', category=row['category'],
+            expense_total=row['total'] or 0, expense_count=row['count'],
+        )
+        for row in Expenses.objects.filter(user__isnull=False)
+        .annotate(day=TruncDate('date'))
+        .values('user_id', 'day', 'category')
+        .annotate(total=Sum('worth'), count=Count('pk'))
+        .order_by()
+    )
+    DailyRollup.objects.bulk_create(objs, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Tracker', '0008_incomesource_got'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('wallet', models.CharField(blank=True, default='', max_length=100)),
+                ('category', models.CharField(blank=True, default='', max_length=20)),
+                ('income_total', models.FloatField(default=0)),
+                ('income_count', models.IntegerField(default=0)),
+                ('expense_total', models.FloatField(default=0)),
+                ('expense_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'day', 'wallet', 'category'), name='unique_daily_rollup'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tracker', '0009_dailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dreamcar',
+            index=models.Index(fields=['user', 'date_added'], name='dreamcar_user_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dreamcar',
+            index=models.Index(fields=['user', 'bought', 'date_added'], name='dreamcar_user_bought_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', 'start_date'], name='event_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', 'attended'], name='event_user_attended_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', 'category'], name='event_user_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expenses',
+            index=models.Index(fields=['user', 'date'], name='expenses_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expenses',
+            index=models.Index(fields=['user', 'category', 'date'], name='expenses_user_cat_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goals',
+            index=models.Index(fields=['user', 'achieved', 'end_date'], name='goals_user_achieved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['user', 'date'], name='income_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incomesource',
+            index=models.Index(fields=['user', 'got', 'end_date'], name='incomesource_user_got_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incomesource',
+            index=models.Index(fields=['user', 'client'], name='incomesource_user_client_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nownext',
+            index=models.Index(fields=['user', 'date'], name='nownext_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projects',
+            index=models.Index(fields=['user', 'status'], name='projects_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projects',
+            index=models.Index(fields=['user', 'end_date'], name='projects_user_end_date_idx'),
+        ),
+    ]
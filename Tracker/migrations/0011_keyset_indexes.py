@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tracker', '0010_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='goals',
+            index=models.Index(fields=['user', 'date_set'], name='goals_user_date_set_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projects',
+            index=models.Index(fields=['user', 'date_set'], name='projects_user_date_set_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tracker', '0011_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expenses',
+            name='import_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40, null=True),
+        ),
+        migrations.AddField(
+            model_name='income',
+            name='import_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='expenses',
+            constraint=models.UniqueConstraint(fields=('user', 'import_hash'), name='unique_expenses_import_hash'),
+        ),
+        migrations.AddConstraint(
+            model_name='income',
+            constraint=models.UniqueConstraint(fields=('user', 'import_hash'), name='unique_income_import_hash'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Tracker', '0012_import_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryKeyword',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=100)),
+                ('category', models.CharField(choices=[('BUSINESS', 'Business'), ('PERSONAL', 'Personal'), ('INVESTMENT', 'Investment'), ('FOOD', 'Food')], max_length=20)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='categorykeyword',
+            constraint=models.UniqueConstraint(fields=('user', 'keyword'), name='unique_category_keyword'),
+        ),
+    ]
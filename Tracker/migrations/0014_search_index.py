@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:40
+
+from django.db import migrations
+
+# (kind, code, table, title columns, body columns) as they are at this migration.
+SOURCES = [
+    ('income', 1, 'Tracker_income', ['amount', 'wallet'], ['description']),
+    ('expenses', 2, 'Tracker_expenses', ['name'], ['description']),
+    ('nownext', 3, 'Tracker_nownext', ['do'], ['challenges', 'gratitude']),
+    ('projects', 4, 'Tracker_projects', ['name'], ['description']),
+    ('goals', 5, 'Tracker_goals', ['goal_title'], ['goal_description']),
+    ('events', 6, 'Tracker_event', ['title'], ['host', 'category', 'location']),
+    ('dreamcars', 7, 'Tracker_dreamcar', ['brand', 'model'], ['description']),
+]
+
+
+def _concat(columns):
+    return "trim(" + " || ' ' || ".join(f'coalesce("{column}", \'\')' for column in columns) + ")"
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS tracker_search USING fts5("
+        "owner, kind, title, body, tokenize = 'porter unicode61', prefix = '2 3')"
+    )
+    for kind, code, table, title, body in SOURCES:
+        schema_editor.execute(
+            f"INSERT INTO tracker_search (rowid, owner, kind, title, body) "
+            f"SELECT ({code} << 40) | id, 'u' || user_id, '{kind}', {_concat(title)}, {_concat(body)} "
+            f"FROM \"{table}\" WHERE user_id IS NOT NULL"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS tracker_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tracker', '0013_categorykeyword'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:23
+
+import Tracker.fields
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+MONEY_COLUMNS = [
+    ('DailyRollup', 'income_total'),
+    ('DailyRollup', 'expense_total'),
+    ('DreamCar', 'price'),
+    ('EmergencyFunds', 'amount'),
+    ('Expenses', 'worth'),
+    ('Income', 'amount'),
+    ('IncomeGoal', 'amount'),
+    ('IncomeSource', 'worth'),
+]
+
+
+def to_minor_units(apps, schema_editor):
+    # Runs while the columns are still floats; the AlterFields below then
+    # store the rounded values as integers.
+    for model_name, field in MONEY_COLUMNS:
+        apps.get_model('Tracker', model_name).objects.update(**{field: Round(F(field) * 100)})
+
+
+def to_major_units(apps, schema_editor):
+    for model_name, field in MONEY_COLUMNS:
+        apps.get_model('Tracker', model_name).objects.update(**{field: F(field) / 100.0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tracker', '0014_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_minor_units, to_major_units),
+        migrations.AddField(
+            model_name='dreamcar',
+            name='currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='emergencyfunds',
+            name='currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='expenses',
+            name='currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='income',
+            name='currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='incomegoal',
+            name='currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='incomesource',
+            name='currency',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+        migrations.AlterField(
+            model_name='dailyrollup',
+            name='expense_total',
+            field=Tracker.fields.MoneyField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='dailyrollup',
+            name='income_total',
+            field=Tracker.fields.MoneyField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='dreamcar',
+            name='price',
+            field=Tracker.fields.MoneyField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='emergencyfunds',
+            name='amount',
+            field=Tracker.fields.MoneyField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='expenses',
+            name='worth',
+            field=Tracker.fields.MoneyField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='income',
+            name='amount',
+            field=Tracker.fields.MoneyField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='incomegoal',
+            name='amount',
+            field=Tracker.fields.MoneyField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='incomesource',
+            name='worth',
+            field=Tracker.fields.MoneyField(default=0),
+        ),
+    ]
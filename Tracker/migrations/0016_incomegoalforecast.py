@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:29
+
+import Tracker.fields
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tracker', '0015_money_minor_units'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncomeGoalForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('projected_balance', Tracker.fields.MoneyField(default=0)),
+                ('monthly_net', Tracker.fields.MoneyField(default=0)),
+                ('method', models.CharField(max_length=30)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('goal', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast', to='Tracker.incomegoal')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Tracker', '0016_incomegoalforecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(choices=[('robust', 'Far above the median for its category'), ('rolling', 'Far above recent spending in its category')], max_length=10)),
+                ('score', models.FloatField()),
+                ('detected_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expense', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='anomaly', to='Tracker.expenses')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:34
+
+import Tracker.fields
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Tracker', '0017_expenseanomaly'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=10)),
+                ('name', models.CharField(default='', max_length=100)),
+                ('amount', Tracker.fields.MoneyField(default=0)),
+                ('currency', models.CharField(default='USD', max_length=3)),
+                ('wallet', models.CharField(choices=[('Binance', 'Binance'), ('M-pesa', 'M-pesa'), ('TrustWallet', 'TrustWallet'), ('Bank', 'Bank'), ('Paypal', 'Paypal'), ('Other', 'Other')], default='Bank', max_length=100)),
+                ('category', models.CharField(choices=[('BUSINESS', 'Business'), ('PERSONAL', 'Personal'), ('INVESTMENT', 'Investment'), ('FOOD', 'Food')], default='PERSONAL', max_length=20)),
+                ('description', models.TextField(blank=True, default='')),
+                ('frequency', models.CharField(choices=[('DAILY', 'Daily'), ('WEEKLY', 'Weekly'), ('MONTHLY', 'Monthly'), ('YEARLY', 'Yearly')], default='MONTHLY', max_length=10)),
+                ('interval', models.PositiveIntegerField(default=1)),
+                ('start_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('end_date', models.DateTimeField(blank=True, null=True)),
+                ('next_run', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='expenses',
+            name='occurrence_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='income',
+            name='occurrence_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='recurringrule',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='Tracker.incomesource'),
+        ),
+        migrations.AddField(
+            model_name='recurringrule',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='expenses',
+            name='recurring_rule',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='Tracker.recurringrule'),
+        ),
+        migrations.AddField(
+            model_name='income',
+            name='recurring_rule',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='Tracker.recurringrule'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringrule',
+            index=models.Index(fields=['active', 'next_run'], name='recurringrule_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='expenses',
+            constraint=models.UniqueConstraint(fields=('recurring_rule', 'occurrence_date'), name='unique_expenses_occurrence'),
+        ),
+        migrations.AddConstraint(
+            model_name='income',
+            constraint=models.UniqueConstraint(fields=('recurring_rule', 'occurrence_date'), name='unique_income_occurrence'),
+        ),
+    ]
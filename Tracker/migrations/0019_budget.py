@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:56
+
+import Tracker.fields
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Tracker', '0018_recurring_rules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Budget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(blank=True, choices=[('', 'All categories'), ('BUSINESS', 'Business'), ('PERSONAL', 'Personal'), ('INVESTMENT', 'Investment'), ('FOOD', 'Food')], default='', max_length=20)),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('amount', Tracker.fields.MoneyField(default=0)),
+                ('currency', models.CharField(default='USD', max_length=3)),
+                ('spent', Tracker.fields.MoneyField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='budget',
+            constraint=models.UniqueConstraint(fields=('user', 'month', 'category'), name='unique_budget'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tracker', '0019_budget'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FxRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=10, max_digits=20)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='fxrate',
+            constraint=models.UniqueConstraint(fields=('currency', 'date'), name='unique_fx_rate'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:08
+
+import Tracker.fields
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import Count, Sum
+
+
+def populate_balances(apps, schema_editor):
+    WalletBalance = apps.get_model('Tracker', 'WalletBalance')
+    balances = defaultdict(lambda: [Decimal(0), 0])
+    for model_name, amount_field, sign in (
+        ('Income', 'amount', 1), ('Expenses', 'worth', -1), ('EmergencyFunds', 'amount', -1),
+    ):
+        model = apps.get_model('Tracker', model_name)
+        for row in (
+            model.objects.filter(user__isnull=False)
+            .values('user_id', 'wallet', 'currency')
+            .annotate(total=Sum(amount_field), count=Count('pk'))
+            .order_by()
+        ):
+            balance = balances[(row['user_id'], row['wallet'], row['currency'])]
+            balance[0] += sign * (row['total'] or 0)
+            balance[1] += row['count']
+    WalletBalance.objects.bulk_create([
+        WalletBalance(user_id=user_id, wallet=wallet, currency=currency, balance=balance, moves=moves)
+        for (user_id, wallet, currency), (balance, moves) in balances.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Tracker', '0020_fxrate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expenses',
+            name='wallet',
+            field=models.CharField(choices=[('Binance', 'Binance'), ('M-pesa', 'M-pesa'), ('TrustWallet', 'TrustWallet'), ('Bank', 'Bank'), ('Paypal', 'Paypal'), ('Other', 'Other')], default='Bank', max_length=100),
+        ),
+        migrations.CreateModel(
+            name='WalletBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wallet', models.CharField(choices=[('Binance', 'Binance'), ('M-pesa', 'M-pesa'), ('TrustWallet', 'TrustWallet'), ('Bank', 'Bank'), ('Paypal', 'Paypal'), ('Other', 'Other')], max_length=100)),
+                ('currency', models.CharField(default='USD', max_length=3)),
+                ('balance', Tracker.fields.MoneyField(default=0)),
+                ('moves', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='walletbalance',
+            constraint=models.UniqueConstraint(fields=('user', 'wallet', 'currency'), name='unique_wallet_balance'),
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
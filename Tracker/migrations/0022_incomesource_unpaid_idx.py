@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tracker', '0021_wallet_balances'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='incomesource',
+            index=models.Index(condition=models.Q(('got', False)), fields=['user', 'client', 'end_date'], name='incomesource_unpaid_idx'),
+        ),
+    ]
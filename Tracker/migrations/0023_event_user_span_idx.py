@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tracker', '0022_incomesource_unpaid_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='event',
+            name='event_user_start_idx',
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', 'start_date', 'end_date'], name='event_user_span_idx'),
+        ),
+    ]
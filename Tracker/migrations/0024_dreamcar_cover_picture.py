@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Min
+
+
+def populate_covers(apps, schema_editor):
+    DreamCar = apps.get_model('Tracker', 'DreamCar')
+    covers = (
+        DreamCar.pictures.through.objects.values('dreamcar_id')
+        .annotate(first=Min('pictures_id')).order_by().values_list('dreamcar_id', 'first')
+    )
+    for car_id, picture_id in covers:
+        DreamCar.objects.filter(pk=car_id).update(cover_picture_id=picture_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Tracker', '0023_event_user_span_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dreamcar',
+            name='cover_picture',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='Tracker.pictures'),
+        ),
+        migrations.RunPython(populate_covers, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .fields import DEFAULT_CURRENCY, MoneyField
+
 WALLETS = [
     ("Binance", "Binance"),
     ("M-pesa", "M-pesa"),
@@ -13,27 +15,58 @@ WALLETS = [
 
 class EmergencyFunds(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, default=True)
-    amount = models.FloatField(default=0)
+    amount = MoneyField(default=0)
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
     date_added = models.DateTimeField(default=timezone.now)
     wallet = models.CharField(max_length=100, choices=WALLETS, default="Bank")
 
 
 class IncomeGoal(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
-    amount = models.FloatField(default=0)
+    amount = MoneyField(default=0)
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
     by_when = models.DateTimeField(default=timezone.now)
     wallet = models.CharField(max_length=100, choices=WALLETS, default="Bank")
 
+class IncomeGoalForecast(models.Model):
+    """Projected balance at an IncomeGoal's ``by_when``.
+
+    Written in batch by ``manage.py forecast_goals`` (see ``Tracker.forecasting``).
+    """
+    goal = models.OneToOneField(IncomeGoal, on_delete=models.CASCADE, related_name='forecast')
+    projected_balance = MoneyField(default=0)
+    monthly_net = MoneyField(default=0)
+    method = models.CharField(max_length=30)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    @property
+    def on_track(self):
+        return self.projected_balance >= self.goal.amount
+
+    def __str__(self):
+        return f"{self.goal} - {self.projected_balance}"
+
 class IncomeSource(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     name = models.CharField(max_length=100, default="")
     client = models.CharField(max_length=100, default="")
     start_date = models.DateTimeField(default=timezone.now)
     end_date = models.DateTimeField(default=timezone.now)
-    worth = models.FloatField(default=0)
+    worth = MoneyField(default=0)
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
     got = models.BooleanField(default=False)
     description = models.TextField(default="")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'got', 'end_date'], name='incomesource_user_got_idx'),
+            models.Index(fields=['user', 'client'], name='incomesource_user_client_idx'),
+            # Receivables aging only reads unpaid contracts.
+            models.Index(
+                fields=['user', 'client', 'end_date'], condition=models.Q(got=False), name='incomesource_unpaid_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.client}"
 
@@ -41,9 +74,22 @@ class Income(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
     source = models.ForeignKey(IncomeSource, on_delete=models.CASCADE, null=True, blank=True)
     wallet = models.CharField(max_length=100, choices=WALLETS, default="Bank")
-    amount = models.FloatField(default=0)
+    amount = MoneyField(default=0)
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
     date = models.DateTimeField(default=timezone.now)
     description = models.TextField(default="")
+    import_hash = models.CharField(max_length=40, null=True, blank=True, editable=False)
+    recurring_rule = models.ForeignKey('RecurringRule', on_delete=models.SET_NULL, null=True, blank=True, editable=False)
+    occurrence_date = models.DateField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='income_user_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'import_hash'], name='unique_income_import_hash'),
+            models.UniqueConstraint(fields=['recurring_rule', 'occurrence_date'], name='unique_income_occurrence'),
+        ]
 
     def __str__(self):
         return f"{self.amount} - {self.wallet}"
@@ -58,14 +104,149 @@ class Expenses(models.Model):
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
     name = models.CharField(max_length=100, default="")
-    worth = models.FloatField(default=0)
+    worth = MoneyField(default=0)
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
     description = models.TextField(default="")
     date = models.DateTimeField(default=timezone.now)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='OTHER')
+    wallet = models.CharField(max_length=100, choices=WALLETS, default="Bank")
+    import_hash = models.CharField(max_length=40, null=True, blank=True, editable=False)
+    recurring_rule = models.ForeignKey('RecurringRule', on_delete=models.SET_NULL, null=True, blank=True, editable=False)
+    occurrence_date = models.DateField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='expenses_user_date_idx'),
+            models.Index(fields=['user', 'category', 'date'], name='expenses_user_cat_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'import_hash'], name='unique_expenses_import_hash'),
+            models.UniqueConstraint(fields=['recurring_rule', 'occurrence_date'], name='unique_expenses_occurrence'),
+        ]
 
     def __str__(self):
         return self.name
 
+class RecurringRule(models.Model):
+    """A repeating Income or Expenses entry, e.g. a salary or rent.
+
+    Occurrences follow RRULE-style ``frequency`` / ``interval`` from
+    ``start_date`` until ``end_date`` and are written by
+    ``manage.py materialize_recurring`` (see ``Tracker.recurring``).
+    ``next_run`` is the first occurrence not written yet.
+    """
+    INCOME = 'income'
+    EXPENSE = 'expense'
+    KIND_CHOICES = [
+        (INCOME, 'Income'),
+        (EXPENSE, 'Expense'),
+    ]
+
+    DAILY = 'DAILY'
+    WEEKLY = 'WEEKLY'
+    MONTHLY = 'MONTHLY'
+    YEARLY = 'YEARLY'
+    FREQUENCY_CHOICES = [
+        (DAILY, 'Daily'),
+        (WEEKLY, 'Weekly'),
+        (MONTHLY, 'Monthly'),
+        (YEARLY, 'Yearly'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    name = models.CharField(max_length=100, default="")
+    amount = MoneyField(default=0)
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
+    source = models.ForeignKey(IncomeSource, on_delete=models.SET_NULL, null=True, blank=True)
+    wallet = models.CharField(max_length=100, choices=WALLETS, default="Bank")
+    category = models.CharField(max_length=20, choices=Expenses.CATEGORY_CHOICES, default='PERSONAL')
+    description = models.TextField(default="", blank=True)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default=MONTHLY)
+    interval = models.PositiveIntegerField(default=1)
+    start_date = models.DateTimeField(default=timezone.now)
+    end_date = models.DateTimeField(null=True, blank=True)
+    next_run = models.DateTimeField(null=True, blank=True, editable=False)
+    active = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['active', 'next_run'], name='recurringrule_due_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.next_run is None:
+            self.next_run = self.start_date
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.name} - {self.get_frequency_display()}"
+
+class CategoryKeyword(models.Model):
+    """A user's own keyword -> expense category rule, checked before the defaults."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    keyword = models.CharField(max_length=100)
+    category = models.CharField(max_length=20, choices=Expenses.CATEGORY_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'keyword'], name='unique_category_keyword'),
+        ]
+
+    def __str__(self):
+        return f"{self.keyword} -> {self.category}"
+
+class Budget(models.Model):
+    """A user's spending limit for one month, overall or for one category.
+
+    ``spent`` is the month-to-date total of the matching Expenses. It is
+    kept current by the Expenses signals (see ``Tracker.budgets``), and
+    ``manage.py reconcile_budgets`` corrects any drift from DailyRollup.
+    """
+    ALL = ''
+    CATEGORY_CHOICES = [(ALL, 'All categories')] + Expenses.CATEGORY_CHOICES
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default=ALL, blank=True)
+    month = models.DateField(help_text="First day of the month")
+    amount = MoneyField(default=0)
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
+    spent = MoneyField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month', 'category'], name='unique_budget'),
+        ]
+
+    @property
+    def remaining(self):
+        return self.amount - self.spent
+
+    @property
+    def percentage(self):
+        return self.spent / self.amount * 100 if self.amount > 0 else 0
+
+    def __str__(self):
+        return f"{self.user} - {self.month:%Y-%m} {self.get_category_display()}"
+
+class ExpenseAnomaly(models.Model):
+    """An expense flagged as unusually large by ``manage.py detect_anomalies``."""
+    ROBUST = 'robust'
+    ROLLING = 'rolling'
+    METHOD_CHOICES = [
+        (ROBUST, 'Far above the median for its category'),
+        (ROLLING, 'Far above recent spending in its category'),
+    ]
+
+    expense = models.OneToOneField(Expenses, on_delete=models.CASCADE, related_name='anomaly')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    method = models.CharField(max_length=10, choices=METHOD_CHOICES)
+    score = models.FloatField()
+    detected_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.expense} ({self.score:.1f})"
+
 class NowNext(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
     date = models.DateTimeField(default=timezone.now)
@@ -74,6 +255,11 @@ class NowNext(models.Model):
     challenges = models.TextField(default="")
     gratitude = models.TextField(default="")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='nownext_user_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.date.date()} - {'Done' if self.done else 'Pending'}"
 
@@ -91,6 +277,13 @@ class Projects(models.Model):
         ('On Hold', 'On Hold')
     ], default='Planning')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status'], name='projects_user_status_idx'),
+            models.Index(fields=['user', 'end_date'], name='projects_user_end_date_idx'),
+            models.Index(fields=['user', 'date_set'], name='projects_user_date_set_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -102,6 +295,12 @@ class Goals(models.Model):
     end_date = models.DateTimeField(default=timezone.now)
     achieved = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'achieved', 'end_date'], name='goals_user_achieved_idx'),
+            models.Index(fields=['user', 'date_set'], name='goals_user_date_set_idx'),
+        ]
+
     def __str__(self):
         return self.goal_title
 
@@ -122,6 +321,13 @@ class Event(models.Model):
     category = models.CharField(max_length=50, default="Hackathon", choices=EVENTS)
     attended = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'start_date', 'end_date'], name='event_user_span_idx'),
+            models.Index(fields=['user', 'attended'], name='event_user_attended_idx'),
+            models.Index(fields=['user', 'category'], name='event_user_category_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -139,12 +345,88 @@ class DreamCar(models.Model):
     model = models.CharField(max_length=100, default="")
     horsepower = models.IntegerField(default=0)
     year = models.IntegerField(default=2024)
-    price = models.FloatField(default=0)
+    price = MoneyField(default=0)
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
     bought = models.BooleanField(default=False)
     date_bought = models.DateTimeField(null=True, blank=True)
     date_added = models.DateTimeField(default=timezone.now)
     description = models.TextField(default="")
     pictures = models.ManyToManyField(Pictures, blank=True)
+    # The gallery thumbnail: the first of ``pictures``, kept current by
+    # ``Tracker.signals`` so the list view can join it instead of asking
+    # every car for its pictures.
+    cover_picture = models.ForeignKey(
+        Pictures, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date_added'], name='dreamcar_user_added_idx'),
+            models.Index(fields=['user', 'bought', 'date_added'], name='dreamcar_user_bought_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.brand} - {self.model}"
+
+class DailyRollup(models.Model):
+    """Per-user daily totals of Income (by wallet) and Expenses (by category).
+
+    Totals are in the user's base currency (see ``Tracker.fx``). Kept
+    current by the signal handlers in ``Tracker.signals`` and rebuilt from
+    scratch by ``manage.py rebuild_rollups``.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    day = models.DateField()
+    wallet = models.CharField(max_length=100, default="", blank=True)
+    category = models.CharField(max_length=20, default="", blank=True)
+    income_total = MoneyField(default=0)
+    income_count = models.IntegerField(default=0)
+    expense_total = MoneyField(default=0)
+    expense_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'wallet', 'category'], name='unique_daily_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.day}"
+
+class WalletBalance(models.Model):
+    """Money currently in one of a user's wallets, in one currency.
+
+    Income adds to its wallet; Expenses and EmergencyFunds moves take from
+    theirs. Kept current by the signal handlers in ``Tracker.signals`` (see
+    ``Tracker.wallets``) and checked against the ledgers by
+    ``manage.py check_wallet_balances``.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    wallet = models.CharField(max_length=100, choices=WALLETS)
+    currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY)
+    balance = MoneyField(default=0)
+    moves = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'wallet', 'currency'], name='unique_wallet_balance'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.wallet} {self.balance} {self.currency}"
+
+class FxRate(models.Model):
+    """Value of one unit of ``currency`` in DEFAULT_CURRENCY on ``date``.
+
+    Loaded from CSV files by ``manage.py load_fx_rates``.
+    """
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'date'], name='unique_fx_rate'),
+        ]
 
     def __str__(self):
-        return f"{self.brand} - {self.model}"
\ No newline at end of file
+        return f"{self.currency} {self.date} {self.rate}"
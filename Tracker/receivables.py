@@ -0,0 +1,92 @@
+"""Aging of unpaid IncomeSource contracts.
+
+An unpaid contract (``got=False``) is due at its ``end_date`` and ages in
+the buckets of ``BUCKETS`` by days past that date. ``aging_report``
+computes every bucket for every (client, currency) with one grouped query
+using filtered aggregates, which the partial index
+``incomesource_unpaid_idx`` on (user, client, end_date) WHERE NOT got
+serves without touching paid contracts.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import IncomeSource
+
+# (key, label, minimum days past due, maximum days past due or None)
+BUCKETS = [
+    ('current', 'Not yet due', None, -1),
+    ('days_0_30', '0-30 days', 0, 30),
+    ('days_31_60', '31-60 days', 31, 60),
+    ('days_61_90', '61-90 days', 61, 90),
+    ('days_over_90', '90+ days', 91, None),
+]
+COLUMNS = ['count', 'total'] + [key for key, label, low, high in BUCKETS]
+
+
+def _bucket_filter(now, low, high):
+    # Days past due are whole days since ``end_date``, so ``d`` days past
+    # due means an end_date in (now - (d + 1) days, now - d days].
+    condition = Q()
+    if low is not None:
+        condition &= Q(end_date__lte=now - timedelta(days=low))
+    if high is not None:
+        condition &= Q(end_date__gt=now - timedelta(days=high + 1))
+    return condition
+
+
+def unpaid_sources(user, client=None):
+    sources = IncomeSource.objects.filter(user=user, got=False)
+    if client is not None:
+        sources = sources.filter(client=client)
+    return sources
+
+
+def aging_queryset(user, now=None, client=None):
+    """Outstanding amounts per (client, currency) and bucket, as one grouped query.
+
+    Each row has ``client``, ``currency``, ``count``, ``total`` and one key
+    per bucket.
+    """
+    now = now or timezone.now()
+    aggregates = {'count': Count('pk'), 'total': Sum('worth')}
+    for key, label, low, high in BUCKETS:
+        aggregates[key] = Sum('worth', filter=_bucket_filter(now, low, high), default=Decimal(0))
+    return (
+        unpaid_sources(user, client)
+        .values('client', 'currency')
+        .annotate(**aggregates)
+        .order_by('client', 'currency')
+    )
+
+
+def aging_report(user, now=None, client=None):
+    return list(aging_queryset(user, now=now, client=client))
+
+
+def report_totals(rows):
+    """``{currency: {column: total}}`` over ``aging_report`` rows."""
+    totals = {}
+    for row in rows:
+        total = totals.setdefault(row['currency'], dict.fromkeys(COLUMNS, 0))
+        for key in COLUMNS:
+            total[key] += row[key]
+    return totals
+
+
+def bucket_label(days_overdue):
+    for key, label, low, high in BUCKETS:
+        if (low is None or days_overdue >= low) and (high is None or days_overdue <= high):
+            return label
+
+
+def client_sources(user, client, now=None):
+    """The client's unpaid sources, oldest due first, with ``days_overdue`` and ``bucket``."""
+    now = now or timezone.now()
+    sources = list(unpaid_sources(user, client).order_by('end_date', 'pk'))
+    for source in sources:
+        source.days_overdue = (now - source.end_date).days
+        source.bucket = bucket_label(source.days_overdue)
+    return sources
@@ -0,0 +1,230 @@
+"""Expansion of RecurringRules into Income and Expenses rows.
+
+A rule's n-th occurrence is ``start_date`` plus ``n * interval`` days,
+weeks, months or years, computed from the start rather than from the
+previous occurrence so that e.g. a rule starting on the 31st falls on the
+last day of shorter months and returns to the 31st afterwards.
+
+``materialize_recurring`` walks every due rule in primary-key batches and
+writes the occurrences with ``bulk_create``. Each row carries its rule and
+occurrence date, which are unique together, so running it twice never
+duplicates an occurrence.
+"""
+from calendar import monthrange
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .budgets import budget_month, reconcile_budgets
+from .caching import bump_ledger_version
+from .fields import MINOR_UNIT
+from .fx import base_currencies, get_rates
+from .models import Expenses, Income, RecurringRule
+from .rollups import apply_deltas
+from .search import index_objects
+from .wallets import add_moves
+
+BATCH_SIZE = 1000
+# Upper bound on occurrences written per rule and run, so a daily rule
+# created with a start date years ago cannot flood a single run.
+MAX_OCCURRENCES = 366
+
+DAYS = {RecurringRule.DAILY: 1, RecurringRule.WEEKLY: 7}
+MONTHS = {RecurringRule.MONTHLY: 1, RecurringRule.YEARLY: 12}
+
+# Occurrences per month of a rule with interval 1, for monthly totals.
+PER_MONTH = {
+    RecurringRule.DAILY: Decimal(365) / 12,
+    RecurringRule.WEEKLY: Decimal(52) / 12,
+    RecurringRule.MONTHLY: Decimal(1),
+    RecurringRule.YEARLY: Decimal(1) / 12,
+}
+
+
+def _local(value, tz):
+    return value.astimezone(tz).replace(tzinfo=None) if timezone.is_aware(value) else value
+
+
+def _add_months(value, months):
+    year, month = divmod(value.month - 1 + months, 12)
+    year += value.year
+    day = min(value.day, monthrange(year, month + 1)[1])
+    return value.replace(year=year, month=month + 1, day=day)
+
+
+def occurrence(frequency, interval, start, number):
+    """The ``number``-th (0-based) occurrence after the naive datetime ``start``."""
+    if frequency in DAYS:
+        return start + timedelta(days=DAYS[frequency] * interval * number)
+    return _add_months(start, MONTHS[frequency] * interval * number)
+
+
+def occurrence_number(frequency, interval, start, value):
+    """Number of the first occurrence on or after the naive datetime ``value``."""
+    if value <= start:
+        return 0
+    if frequency in DAYS:
+        step = timedelta(days=DAYS[frequency] * interval)
+        return -((start - value) // step)
+    step = MONTHS[frequency] * interval
+    number = ((value.year - start.year) * 12 + value.month - start.month) // step
+    while occurrence(frequency, interval, start, number) < value:
+        number += 1
+    return number
+
+
+def due_occurrences(rule, now, tz=None):
+    """(aware datetimes of ``rule`` due up to ``now``, the next one or None).
+
+    Occurrences are computed in ``tz`` (the current time zone by default).
+    The next occurrence is None once the rule's ``end_date`` has passed.
+    """
+    tz = tz or timezone.get_current_timezone()
+    start = _local(rule.start_date, tz)
+    until = _local(now, tz)
+    end = _local(rule.end_date, tz) if rule.end_date is not None else None
+    if end is not None:
+        until = min(until, end)
+    interval = max(rule.interval, 1)
+
+    number = occurrence_number(rule.frequency, interval, start, _local(rule.next_run or rule.start_date, tz))
+    due = []
+    value = occurrence(rule.frequency, interval, start, number)
+    while value <= until and len(due) < MAX_OCCURRENCES:
+        due.append(value.replace(tzinfo=tz))
+        number += 1
+        value = occurrence(rule.frequency, interval, start, number)
+
+    if end is not None and value > end:
+        return due, None
+    return due, value.replace(tzinfo=tz)
+
+
+def build_occurrence(rule, when):
+    """An unsaved Income or Expenses row for ``rule`` on ``when`` (aware, local)."""
+    common = {
+        'user_id': rule.user_id,
+        'currency': rule.currency,
+        'date': when,
+        'recurring_rule': rule,
+        'occurrence_date': when.date(),
+    }
+    if rule.kind == RecurringRule.INCOME:
+        return Income(
+            source_id=rule.source_id, wallet=rule.wallet, amount=rule.amount,
+            description=rule.description or rule.name, **common,
+        )
+    return Expenses(
+        name=rule.name, worth=rule.amount, category=rule.category, wallet=rule.wallet,
+        description=rule.description, **common,
+    )
+
+
+def _existing(model, rule_ids, since):
+    return set(
+        model.objects
+        .filter(recurring_rule_id__in=rule_ids, occurrence_date__gte=since)
+        .values_list('recurring_rule_id', 'occurrence_date')
+    )
+
+
+def _save_next_runs(rules):
+    # One parameterised UPDATE run for the whole batch; bulk_update would
+    # build a CASE branch per rule.
+    field = RecurringRule._meta.get_field('next_run')
+    quote = connection.ops.quote_name
+    sql = (
+        f"UPDATE {quote(RecurringRule._meta.db_table)} SET {quote(field.column)} = %s "
+        f"WHERE {quote(RecurringRule._meta.pk.column)} = %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(field.get_db_prep_save(rule.next_run, connection), rule.pk) for rule in rules])
+
+
+def _materialize_batch(rules, now, months):
+    """Write the due occurrences of ``rules``; returns the number created.
+
+    The months of the expenses written are added to the set ``months``.
+    """
+    tz = timezone.get_current_timezone()
+    pending = []
+    for rule in rules:
+        due, rule.next_run = due_occurrences(rule, now, tz)
+        pending.extend(build_occurrence(rule, when) for when in due)
+    if not pending:
+        _save_next_runs(rules)
+        return 0
+
+    # Occurrences written by an earlier, interrupted run are skipped here;
+    # the unique (rule, occurrence_date) constraint backs this up.
+    rule_ids = [rule.pk for rule in rules]
+    since = min(obj.occurrence_date for obj in pending)
+    existing = _existing(Income, rule_ids, since) | _existing(Expenses, rule_ids, since)
+    incomes, expenses = [], []
+    for obj in pending:
+        if (obj.recurring_rule_id, obj.occurrence_date) not in existing:
+            (incomes if isinstance(obj, Income) else expenses).append(obj)
+
+    months.update(budget_month(obj.occurrence_date) for obj in expenses)
+
+    # Rollups are kept in each user's base currency.
+    rates = get_rates()
+    bases = base_currencies({rule.user_id for rule in rules})
+    deltas = defaultdict(lambda: [Decimal(0), 0, Decimal(0), 0])
+    for obj in incomes:
+        delta = deltas[(obj.user_id, obj.occurrence_date, obj.wallet, '')]
+        delta[0] += rates.convert(obj.amount, obj.currency, bases[obj.user_id], obj.occurrence_date)
+        delta[1] += 1
+    for obj in expenses:
+        delta = deltas[(obj.user_id, obj.occurrence_date, '', obj.category)]
+        delta[2] += rates.convert(obj.worth, obj.currency, bases[obj.user_id], obj.occurrence_date)
+        delta[3] += 1
+
+    with transaction.atomic():
+        Income.objects.bulk_create(incomes, batch_size=BATCH_SIZE)
+        Expenses.objects.bulk_create(expenses, batch_size=BATCH_SIZE)
+        # bulk_create skips post_save, so rollups, search rows and wallet
+        # balances are written here.
+        apply_deltas(deltas, batch_size=BATCH_SIZE)
+        index_objects(incomes + expenses)
+        add_moves(incomes + expenses)
+        _save_next_runs(rules)
+    return len(incomes) + len(expenses)
+
+
+def materialize_recurring(now=None, batch_size=BATCH_SIZE, progress=None):
+    """Write every occurrence due by ``now`` across all users.
+
+    Returns ``(rules processed, occurrences created)``.
+    """
+    now = now or timezone.now()
+    due = RecurringRule.objects.filter(active=True, next_run__lte=now).order_by('pk')
+    processed = created = 0
+    last_pk = 0
+    months = set()
+    while True:
+        rules = list(due.filter(pk__gt=last_pk)[:batch_size])
+        if not rules:
+            break
+        last_pk = rules[-1].pk
+        created += _materialize_batch(rules, now, months)
+        processed += len(rules)
+        if progress:
+            progress(processed, created)
+    if months:
+        # bulk_create skips the signals that keep budget spend current.
+        reconcile_budgets(months=months)
+    if created:
+        bump_ledger_version()
+    return processed, created
+
+
+def monthly_total(rules):
+    """Monthly equivalent of the amounts of ``rules`` (a RecurringRule queryset)."""
+    total = Decimal(0)
+    for amount, frequency, interval in rules.values_list('amount', 'frequency', 'interval'):
+        total += amount * PER_MONTH[frequency] / max(interval, 1)
+    return total.quantize(MINOR_UNIT)
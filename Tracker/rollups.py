@@ -0,0 +1,141 @@
+from django.db import connection, transaction
+from django.db.models import F, Sum, Count, Value
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .caching import bump_ledger_version
+from .fields import MoneyField
+from .fx import base_currency_expression, converted_amount
+from .models import DailyRollup, Expenses, Income
+
+DELTA_FIELDS = ['income_total', 'income_count', 'expense_total', 'expense_count']
+
+
+def rollup_day(value):
+    """Calendar day a transaction is bucketed under (matches ``TruncDate``)."""
+    if timezone.is_aware(value):
+        return timezone.localtime(value).date()
+    return value.date()
+
+
+def income_key(user_id, date, wallet):
+    return {'user_id': user_id, 'day': rollup_day(date), 'wallet': wallet, 'category': ''}
+
+
+def expense_key(user_id, date, category):
+    return {'user_id': user_id, 'day': rollup_day(date), 'wallet': '', 'category': category}
+
+
+def apply_delta(key, income_total=0, income_count=0, expense_total=0, expense_count=0):
+    """Add the given amounts to the rollup row identified by ``key``."""
+    if key['user_id'] is None:
+        return
+    with transaction.atomic():
+        # The amounts are bound as MoneyField values so they are added in
+        # minor units, like the columns they are added to.
+        updated = DailyRollup.objects.filter(**key).update(
+            income_total=F('income_total') + Value(income_total, output_field=MoneyField()),
+            income_count=F('income_count') + income_count,
+            expense_total=F('expense_total') + Value(expense_total, output_field=MoneyField()),
+            expense_count=F('expense_count') + expense_count,
+        )
+        # A missing row with a negative delta means the rollup was already
+        # removed (e.g. during a cascading user delete), so there is nothing to undo.
+        if not updated and (income_count > 0 or expense_count > 0):
+            DailyRollup.objects.create(
+                income_total=income_total,
+                income_count=income_count,
+                expense_total=expense_total,
+                expense_count=expense_count,
+                **key,
+            )
+
+
+def _upsert_sql():
+    meta = DailyRollup._meta
+    quote = connection.ops.quote_name
+    keys = [quote(meta.get_field(name).column) for name in ('user', 'day', 'wallet', 'category')]
+    totals = [quote(meta.get_field(name).column) for name in DELTA_FIELDS]
+    table = quote(meta.db_table)
+    return (
+        f"INSERT INTO {table} ({', '.join(keys + totals)}) VALUES ({', '.join(['%s'] * 8)}) "
+        f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+        + ', '.join(f"{column} = {table}.{column} + excluded.{column}" for column in totals)
+    )
+
+
+def apply_deltas(deltas, batch_size=1000):
+    """Add many deltas at once.
+
+    ``deltas`` maps ``(user_id, day, wallet, category)`` to
+    ``[income_total, income_count, expense_total, expense_count]``. Each
+    batch is one ``INSERT ... ON CONFLICT DO UPDATE`` adding to existing
+    rows, instead of an UPDATE (and possibly an INSERT) per key.
+    """
+    money = MoneyField()
+    rows = [
+        (
+            user_id, connection.ops.adapt_datefield_value(day), wallet, category,
+            money.get_db_prep_save(income_total, connection), income_count,
+            money.get_db_prep_save(expense_total, connection), expense_count,
+        )
+        for (user_id, day, wallet, category), (income_total, income_count, expense_total, expense_count)
+        in deltas.items()
+        if user_id is not None
+    ]
+    sql = _upsert_sql()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+
+
+def rebuild_rollups(user=None, batch_size=1000):
+    """Recompute DailyRollup rows from the raw Income and Expenses tables.
+
+    Rebuilds every user's rollups, or only ``user``'s when given. Amounts
+    are converted to each user's base currency in SQL, against the FxRate
+    table. Returns the number of rollup rows written.
+    """
+    incomes = Income.objects.filter(user__isnull=False)
+    expenses = Expenses.objects.filter(user__isnull=False)
+    rollups = DailyRollup.objects.all()
+    if user is not None:
+        incomes = incomes.filter(user=user)
+        expenses = expenses.filter(user=user)
+        rollups = rollups.filter(user=user)
+
+    income_rows = (
+        incomes
+        .annotate(day=TruncDate('date'), base=base_currency_expression())
+        .values('user_id', 'day', 'wallet')
+        .annotate(total=Sum(converted_amount('amount')), count=Count('pk'))
+        .order_by()
+    )
+    expense_rows = (
+        expenses
+        .annotate(day=TruncDate('date'), base=base_currency_expression())
+        .values('user_id', 'day', 'category')
+        .annotate(total=Sum(converted_amount('worth')), count=Count('pk'))
+        .order_by()
+    )
+
+    objs = [
+        DailyRollup(
+            user_id=row['user_id'], day=row['day'], wallet=row['wallet'], category='',
+            income_total=row['total'] or 0, income_count=row['count'],
+        )
+        for row in income_rows.iterator()
+    ]
+    objs.extend(
+        DailyRollup(
+            user_id=row['user_id'], day=row['day'], wallet='', category=row['category'],
+            expense_total=row['total'] or 0, expense_count=row['count'],
+        )
+        for row in expense_rows.iterator()
+    )
+
+    with transaction.atomic():
+        rollups.delete()
+        DailyRollup.objects.bulk_create(objs, batch_size=batch_size)
+    bump_ledger_version(user.pk if user is not None else None)
+    return len(objs)
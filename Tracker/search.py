@@ -0,0 +1,207 @@
+"""Full-text search over Tracker records using an SQLite FTS5 table.
+
+Every searchable record has one row in ``tracker_search``. Its rowid
+encodes the record's kind and pk so a record can be replaced or removed
+with a rowid lookup, and the ``owner`` and ``kind`` columns are indexed
+tokens so per-user (and per-kind) filtering is part of the FTS match
+instead of a post-filter.
+"""
+import html
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import DreamCar, Event, Expenses, Goals, Income, NowNext, Projects
+
+TABLE = 'tracker_search'
+
+CREATE_TABLE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "owner, kind, title, body, tokenize = 'porter unicode61', prefix = '2 3')"
+)
+
+INSERT_SQL = f"INSERT INTO {TABLE} (rowid, owner, kind, title, body) VALUES (%s, %s, %s, %s, %s)"
+
+# Title matches weigh ten times body matches; owner and kind only filter.
+SEARCH_SQL = (
+    f"SELECT rowid, title, snippet({TABLE}, 3, %s, %s, '…', 16) FROM {TABLE} "
+    f"WHERE {TABLE} MATCH %s ORDER BY bm25({TABLE}, 0.0, 0.0, 10.0, 1.0) LIMIT %s"
+)
+
+# Every match of one kind, unranked: the record pk is the rowid minus the
+# kind code's high bits.
+PKS_SQL = f"SELECT rowid - %s FROM {TABLE} WHERE {TABLE} MATCH %s"
+
+# The kind code is stored above bit 40 of the rowid, the record pk below it.
+KIND_SHIFT = 40
+
+# kind -> (code stored in the rowid, model, url name of a result, title fields, body fields)
+SOURCES = {
+    'income': (1, Income, 'income-update', ('amount', 'wallet'), ('description',)),
+    'expenses': (2, Expenses, 'expenses-update', ('name',), ('description',)),
+    'nownext': (3, NowNext, 'nownext-update', ('do',), ('challenges', 'gratitude')),
+    'projects': (4, Projects, 'projects-update', ('name',), ('description',)),
+    'goals': (5, Goals, 'goals-update', ('goal_title',), ('goal_description',)),
+    'events': (6, Event, 'event-update', ('title',), ('host', 'category', 'location')),
+    'dreamcars': (7, DreamCar, 'dreamcar-detail', ('brand', 'model'), ('description',)),
+}
+
+KIND_LABELS = {
+    'income': 'Income',
+    'expenses': 'Expense',
+    'nownext': 'Now & Next',
+    'projects': 'Project',
+    'goals': 'Goal',
+    'events': 'Event',
+    'dreamcars': 'Dream Car',
+}
+
+KIND_BY_MODEL = {source[1]: kind for kind, source in SOURCES.items()}
+KIND_BY_CODE = {source[0]: kind for kind, source in SOURCES.items()}
+
+# Private-use characters mark snippet highlights so user text can be
+# escaped before the markers are turned into <mark> tags.
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_END = '\ue001'
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def encode_rowid(kind, pk):
+    return (SOURCES[kind][0] << KIND_SHIFT) | pk
+
+
+def decode_rowid(rowid):
+    return KIND_BY_CODE[rowid >> KIND_SHIFT], rowid & ((1 << KIND_SHIFT) - 1)
+
+
+def owner_token(user_id):
+    return f'u{user_id}'
+
+
+def _join(values):
+    return ' '.join(str(value) for value in values if value not in (None, ''))
+
+
+def _index_row(kind, pk, user_id, values):
+    title_fields = SOURCES[kind][3]
+    split = len(title_fields)
+    return (encode_rowid(kind, pk), owner_token(user_id), kind, _join(values[:split]), _join(values[split:]))
+
+
+def _fields(kind):
+    return SOURCES[kind][3] + SOURCES[kind][4]
+
+
+def index_objects(objs):
+    """Add or replace the search rows of saved model instances."""
+    if not is_available():
+        return
+    rows = []
+    for obj in objs:
+        if obj.user_id is None:
+            continue
+        kind = KIND_BY_MODEL[type(obj)]
+        rows.append(_index_row(kind, obj.pk, obj.user_id, [getattr(obj, field) for field in _fields(kind)]))
+    if rows:
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+            cursor.executemany(INSERT_SQL, rows)
+
+
+def unindex(model, pks):
+    """Remove the search rows of ``model`` instances with the given pks."""
+    if not is_available():
+        return
+    kind = KIND_BY_MODEL[model]
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {TABLE} WHERE rowid = %s", [(encode_rowid(kind, pk),) for pk in pks])
+
+
+def rebuild_index(batch_size=2000):
+    """Recreate the search table from every searchable model."""
+    if not is_available():
+        return 0
+    written = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        for kind, (code, model, *rest) in SOURCES.items():
+            rows = []
+            values = model.objects.filter(user__isnull=False).values_list('pk', 'user_id', *_fields(kind))
+            for pk, user_id, *row in values.iterator(chunk_size=batch_size):
+                rows.append(_index_row(kind, pk, user_id, row))
+                if len(rows) >= batch_size:
+                    cursor.executemany(INSERT_SQL, rows)
+                    written += len(rows)
+                    rows = []
+            if rows:
+                cursor.executemany(INSERT_SQL, rows)
+                written += len(rows)
+    return written
+
+
+def build_match(user_id, query, kind=None):
+    """FTS5 MATCH expression for a free-text ``query``, or None if it has no terms.
+
+    Every word becomes a quoted term, so user input can never be parsed as
+    FTS5 syntax. Only the last word is a prefix term: expanding every word
+    multiplies the doclists that have to be merged.
+    """
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return None
+    text = ' '.join(f'"{term}"' for term in terms) + '*'
+    expression = f'owner:"{owner_token(user_id)}" AND {{title body}}: ({text})'
+    if kind is not None:
+        expression = f'kind:"{kind}" AND {expression}'
+    return expression
+
+
+def search(user, query, kind=None, limit=50):
+    """Ranked matches for ``query`` among ``user``'s records.
+
+    Returns dicts with ``kind``, ``label``, ``pk``, ``url_name``, ``title`` and
+    ``snippet`` (already HTML-escaped, matches wrapped in <mark>).
+    """
+    match = build_match(user.pk, query, kind)
+    if match is None or not is_available():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_SQL, [HIGHLIGHT_START, HIGHLIGHT_END, match, limit])
+        rows = cursor.fetchall()
+
+    results = []
+    for rowid, title, snippet in rows:
+        result_kind, pk = decode_rowid(rowid)
+        results.append({
+            'kind': result_kind,
+            'label': KIND_LABELS[result_kind],
+            'pk': pk,
+            'url_name': SOURCES[result_kind][2],
+            'title': title,
+            'snippet': _highlight(snippet),
+        })
+    return results
+
+
+def search_pks(user, query, kind):
+    """Every pk of ``user``'s ``kind`` records matching ``query``, for a ``pk__in`` filter.
+
+    A subquery rather than a list, so there is no limit on the matches
+    and no ranking or snippets are computed for them.
+    """
+    match = build_match(user.pk, query, kind)
+    if match is None:
+        return []
+    return RawSQL(PKS_SQL, [SOURCES[kind][0] << KIND_SHIFT, match])
+
+
+def _highlight(snippet):
+    return (
+        html.escape(snippet)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_END, '</mark>')
+    )
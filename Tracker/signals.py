@@ -0,0 +1,283 @@
+from django.contrib.auth.models import User
+from django.db.models import Min
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from Users.models import UserProfile
+
+from .budgets import add_spend, reconcile_budgets
+from .caching import bump_ledger_version, touch_calendar
+from .calendars import FEEDS as CALENDAR_FEEDS, SCHEDULES, forget_feed_key, forget_longer_span
+from .fields import DEFAULT_CURRENCY
+from .fx import forget_base_currency, to_base_currency
+from .models import (
+    Budget, DreamCar, EmergencyFunds, Event, Expenses, Goals, Income, IncomeGoal, IncomeSource, NowNext, Pictures,
+    Projects,
+)
+from .rollups import apply_delta, expense_key, income_key, rebuild_rollups, rollup_day
+from .search import SOURCES as SEARCH_SOURCES, index_objects, unindex
+from .wallets import MOVES as WALLET_MOVES, add_to_balance, move as wallet_move
+
+# Models whose writes change a user's cached statistics.
+LEDGER_MODELS = (
+    EmergencyFunds, IncomeGoal, IncomeSource, Income, Expenses,
+    NowNext, Projects, Goals, Event, DreamCar, Budget,
+)
+
+
+def in_base_currency(user_id, amount, currency, date):
+    """``amount`` converted for the rollups, which are kept in the user's base currency."""
+    return to_base_currency(user_id, amount, currency, rollup_day(date))
+
+
+@receiver(pre_save, sender=Income)
+def remember_previous_income(sender, instance, raw=False, **kwargs):
+    instance._previous = None
+    if instance.pk and not raw:
+        instance._previous = (
+            Income.objects.filter(pk=instance.pk)
+            .values('user_id', 'date', 'wallet', 'amount', 'currency')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Income)
+def rollup_income_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        apply_delta(
+            income_key(previous['user_id'], previous['date'], previous['wallet']),
+            income_total=-in_base_currency(previous['user_id'], previous['amount'], previous['currency'], previous['date']),
+            income_count=-1,
+        )
+    apply_delta(
+        income_key(instance.user_id, instance.date, instance.wallet),
+        income_total=in_base_currency(instance.user_id, instance.amount, instance.currency, instance.date),
+        income_count=1,
+    )
+
+
+@receiver(post_delete, sender=Income)
+def rollup_income_deleted(sender, instance, **kwargs):
+    apply_delta(
+        income_key(instance.user_id, instance.date, instance.wallet),
+        income_total=-in_base_currency(instance.user_id, instance.amount, instance.currency, instance.date),
+        income_count=-1,
+    )
+
+
+@receiver(pre_save, sender=Expenses)
+def remember_previous_expense(sender, instance, raw=False, **kwargs):
+    instance._previous = None
+    if instance.pk and not raw:
+        instance._previous = (
+            Expenses.objects.filter(pk=instance.pk)
+            .values('user_id', 'date', 'category', 'wallet', 'worth', 'currency')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Expenses)
+def rollup_expense_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        apply_delta(
+            expense_key(previous['user_id'], previous['date'], previous['category']),
+            expense_total=-in_base_currency(previous['user_id'], previous['worth'], previous['currency'], previous['date']),
+            expense_count=-1,
+        )
+    apply_delta(
+        expense_key(instance.user_id, instance.date, instance.category),
+        expense_total=in_base_currency(instance.user_id, instance.worth, instance.currency, instance.date),
+        expense_count=1,
+    )
+
+
+@receiver(post_delete, sender=Expenses)
+def rollup_expense_deleted(sender, instance, **kwargs):
+    apply_delta(
+        expense_key(instance.user_id, instance.date, instance.category),
+        expense_total=-in_base_currency(instance.user_id, instance.worth, instance.currency, instance.date),
+        expense_count=-1,
+    )
+
+
+@receiver(post_save, sender=Expenses)
+def budget_expense_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        add_spend(
+            previous['user_id'], previous['date'], previous['category'],
+            -in_base_currency(previous['user_id'], previous['worth'], previous['currency'], previous['date']),
+        )
+    add_spend(
+        instance.user_id, instance.date, instance.category,
+        in_base_currency(instance.user_id, instance.worth, instance.currency, instance.date),
+    )
+
+
+@receiver(post_delete, sender=Expenses)
+def budget_expense_deleted(sender, instance, **kwargs):
+    add_spend(
+        instance.user_id, instance.date, instance.category,
+        -in_base_currency(instance.user_id, instance.worth, instance.currency, instance.date),
+    )
+
+
+@receiver(pre_save, sender=EmergencyFunds)
+def remember_previous_emergency_fund(sender, instance, raw=False, **kwargs):
+    instance._previous = None
+    if instance.pk and not raw:
+        instance._previous = (
+            EmergencyFunds.objects.filter(pk=instance.pk)
+            .values('user_id', 'wallet', 'amount', 'currency')
+            .first()
+        )
+
+
+def balance_move_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    amount_field, date_field, sign = WALLET_MOVES[sender]
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        add_to_balance(
+            previous['user_id'], previous['wallet'], previous['currency'], -sign * previous[amount_field], -1,
+        )
+    key, amount = wallet_move(instance)
+    add_to_balance(*key, amount, 1)
+
+
+def balance_move_deleted(sender, instance, **kwargs):
+    key, amount = wallet_move(instance)
+    add_to_balance(*key, -amount, -1)
+
+
+for model in WALLET_MOVES:
+    post_save.connect(balance_move_saved, sender=model, dispatch_uid=f'wallet-balance-save-{model.__name__}')
+    post_delete.connect(balance_move_deleted, sender=model, dispatch_uid=f'wallet-balance-delete-{model.__name__}')
+
+
+@receiver(pre_save, sender=UserProfile)
+def remember_previous_base_currency(sender, instance, raw=False, **kwargs):
+    instance._previous_base_currency = None
+    if instance.pk and not raw:
+        instance._previous_base_currency = (
+            UserProfile.objects.filter(pk=instance.pk).values_list('base_currency', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=UserProfile)
+def rebuild_on_base_currency_change(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = DEFAULT_CURRENCY if created else getattr(instance, '_previous_base_currency', None)
+    forget_base_currency(instance.user_id)
+    if instance.base_currency != previous:
+        # Rollups and budget spend are kept in the base currency.
+        rebuild_rollups(instance.user)
+        reconcile_budgets(instance.user)
+
+
+def bump_ledger_version_on_write(sender, instance, raw=False, **kwargs):
+    if not raw and instance.user_id is not None:
+        bump_ledger_version(instance.user_id)
+
+
+for model in LEDGER_MODELS:
+    post_save.connect(bump_ledger_version_on_write, sender=model, dispatch_uid=f'ledger-version-save-{model.__name__}')
+    post_delete.connect(bump_ledger_version_on_write, sender=model, dispatch_uid=f'ledger-version-delete-{model.__name__}')
+
+
+# Model -> the calendar feed its rows appear in.
+CALENDAR_KINDS = {model: kind for kind, (model, *rest) in CALENDAR_FEEDS.items()}
+
+
+def touch_calendar_on_write(sender, instance, raw=False, **kwargs):
+    if not raw and instance.user_id is not None:
+        touch_calendar(instance.user_id, CALENDAR_KINDS[sender])
+
+
+for model in CALENDAR_KINDS:
+    post_save.connect(touch_calendar_on_write, sender=model, dispatch_uid=f'calendar-save-{model.__name__}')
+    post_delete.connect(touch_calendar_on_write, sender=model, dispatch_uid=f'calendar-delete-{model.__name__}')
+
+
+def forget_feed_key_on_write(sender, instance, raw=False, **kwargs):
+    # Deactivating or deleting a user (or their profile) stops their feeds.
+    forget_feed_key(instance.pk if sender is User else instance.user_id)
+
+
+for model in (User, UserProfile):
+    post_save.connect(forget_feed_key_on_write, sender=model, dispatch_uid=f'calendar-key-save-{model.__name__}')
+    post_delete.connect(forget_feed_key_on_write, sender=model, dispatch_uid=f'calendar-key-delete-{model.__name__}')
+
+
+# Model -> its kind in the schedule conflict checks.
+SCHEDULE_KINDS = {model: kind for kind, (model, *rest) in SCHEDULES.items()}
+
+
+def forget_longer_span_on_save(sender, instance, raw=False, **kwargs):
+    if not raw and instance.user_id is not None:
+        model, start_field, end_field, title_field = SCHEDULES[SCHEDULE_KINDS[sender]]
+        forget_longer_span(
+            instance.user_id, SCHEDULE_KINDS[sender], getattr(instance, start_field), getattr(instance, end_field),
+        )
+
+
+for model in SCHEDULE_KINDS:
+    post_save.connect(forget_longer_span_on_save, sender=model, dispatch_uid=f'schedule-span-save-{model.__name__}')
+
+
+def refresh_covers(car_ids, exclude=None):
+    """Point each car's ``cover_picture`` at its first picture, leaving out ``exclude``."""
+    links = DreamCar.pictures.through.objects.filter(dreamcar_id__in=car_ids)
+    if exclude is not None:
+        links = links.exclude(pictures_id=exclude)
+    covers = dict(
+        links.values('dreamcar_id').annotate(first=Min('pictures_id')).order_by()
+        .values_list('dreamcar_id', 'first')
+    )
+    for car_id in car_ids:
+        DreamCar.objects.filter(pk=car_id).update(cover_picture_id=covers.get(car_id))
+
+
+@receiver(m2m_changed, sender=DreamCar.pictures.through)
+def refresh_cover_on_pictures_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        refresh_covers([instance.pk])
+    elif pk_set:
+        refresh_covers(list(pk_set))
+    else:
+        # picture.dreamcar_set.clear(): only the cars it was the cover of change.
+        refresh_covers(list(DreamCar.objects.filter(cover_picture=instance).values_list('pk', flat=True)))
+
+
+@receiver(pre_delete, sender=Pictures)
+def move_cover_off_deleted_picture(sender, instance, **kwargs):
+    # Runs before the SET_NULL update, so cars that have another picture keep a cover.
+    refresh_covers(
+        list(DreamCar.objects.filter(cover_picture=instance).values_list('pk', flat=True)), exclude=instance.pk,
+    )
+
+
+def index_search_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_objects([instance])
+
+
+def unindex_search_on_delete(sender, instance, **kwargs):
+    unindex(sender, [instance.pk])
+
+
+for kind, (code, model, *rest) in SEARCH_SOURCES.items():
+    post_save.connect(index_search_on_save, sender=model, dispatch_uid=f'search-save-{model.__name__}')
+    post_delete.connect(unindex_search_on_delete, sender=model, dispatch_uid=f'search-delete-{model.__name__}')
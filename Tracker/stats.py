@@ -0,0 +1,155 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+
+from .columnar import get_snapshot
+from .fields import MoneyField
+from .fx import base_currency_expression, converted_amount
+from .models import DailyRollup, Event, Expenses, IncomeSource, Projects
+
+
+def _subquery_total(queryset, field, aggregate=Sum, output_field=None):
+    """Correlated per-user aggregate usable as an annotation on User."""
+    output_field = output_field or MoneyField()
+    subquery = (
+        queryset
+        .filter(user=OuterRef('pk'))
+        .order_by()
+        .values('user')
+        .annotate(total=aggregate(field))
+        .values('total')
+    )
+    return Coalesce(Subquery(subquery, output_field=output_field), Value(0), output_field=output_field)
+
+
+def get_quick_stats(user, now=None):
+    """Totals and counts shown in the dashboard header, in a single query."""
+    now = now or timezone.now()
+    row = (
+        User.objects
+        .filter(pk=user.pk)
+        .annotate(
+            total_income=_subquery_total(DailyRollup.objects.all(), 'income_total'),
+            total_expenses=_subquery_total(DailyRollup.objects.all(), 'expense_total'),
+            # Contracts are valued at the rate on their end date, like the
+            # rollups convert each transaction on its own day.
+            net_worth=_subquery_total(
+                IncomeSource.objects.annotate(day=TruncDate('end_date'), base=base_currency_expression()),
+                converted_amount('worth'),
+            ),
+            active_projects=_subquery_total(
+                Projects.objects.filter(status='In Progress'), 'pk', Count, IntegerField()
+            ),
+            upcoming_events=_subquery_total(
+                Event.objects.filter(start_date__gte=now), 'pk', Count, IntegerField()
+            ),
+        )
+        .values('total_income', 'total_expenses', 'net_worth', 'active_projects', 'upcoming_events')
+        .first()
+    ) or {}
+
+    stats = {
+        'total_income': row.get('total_income', 0),
+        'total_expenses': row.get('total_expenses', 0),
+        'net_worth': row.get('net_worth', 0),
+        'active_projects': row.get('active_projects', 0),
+        'upcoming_events': row.get('upcoming_events', 0),
+    }
+    stats['balance'] = stats['total_income'] - stats['total_expenses']
+    return stats
+
+
+def get_expenses_by_category(user):
+    """Expense totals per ``Expenses.category`` using one conditional aggregate."""
+    aggregates = {
+        code: Sum('expense_total', filter=Q(category=code))
+        for code, label in Expenses.CATEGORY_CHOICES
+    }
+    totals = DailyRollup.objects.filter(user=user, expense_count__gt=0).aggregate(**aggregates)
+    return {
+        label: totals[code] or 0
+        for code, label in Expenses.CATEGORY_CHOICES
+    }
+
+
+def get_daily_income(user, days=30, now=None):
+    """(labels, data) for the income line chart over the last ``days`` days."""
+    now = now or timezone.now()
+    start_day = timezone.localtime(now - timedelta(days=days)).date()
+    daily_income = (
+        DailyRollup.objects
+        .filter(user=user, day__gte=start_day, income_count__gt=0)
+        .values('day')
+        .annotate(total=Sum('income_total'))
+        .order_by('day')
+    )
+    labels = []
+    data = []
+    for item in daily_income:
+        labels.append(item['day'].strftime('%Y-%m-%d'))
+        data.append(item['total'])
+    return labels, data
+
+
+def get_ledger_totals(user, since=None):
+    """Income and expense totals for ``user``, optionally from ``since`` (a date) on."""
+    rollups = DailyRollup.objects.filter(user=user)
+    if since is not None:
+        rollups = rollups.filter(day__gte=since)
+    totals = rollups.aggregate(income=Sum('income_total'), expenses=Sum('expense_total'))
+    return {
+        'income': totals['income'] or 0,
+        'expenses': totals['expenses'] or 0,
+    }
+
+
+def get_monthly_totals(user, field, since=None):
+    """List of ``{'month': date, 'total': Decimal}`` for months with activity.
+
+    ``field`` is ``'income'`` or ``'expense'``.
+    """
+    rollups = DailyRollup.objects.filter(user=user, **{f'{field}_count__gt': 0})
+    if since is not None:
+        rollups = rollups.filter(day__gte=since)
+    return list(
+        rollups
+        .annotate(month=TruncMonth('day'))
+        .values('month')
+        .annotate(total=Sum(f'{field}_total'))
+        .order_by('month')
+    )
+
+
+def get_monthly_average(user, field):
+    """Average ``field`` total per month with activity, computed in SQL."""
+    totals = DailyRollup.objects.filter(user=user, **{f'{field}_count__gt': 0}).aggregate(
+        total=Sum(f'{field}_total'),
+        months=Count(TruncMonth('day'), distinct=True),
+    )
+    if not totals['months']:
+        return 0
+    return totals['total'] / totals['months']
+
+
+def get_dashboard_stats(user, now=None):
+    """Everything on the dashboard except the "recent" lists, as plain data."""
+    now = now or timezone.now()
+    expenses_by_category = get_expenses_by_category(user)
+    snapshot = get_snapshot(user)
+    if snapshot is not None:
+        income_labels, income_data = snapshot.daily_series('income', days=30, now=now)
+    else:
+        income_labels, income_data = get_daily_income(user, days=30, now=now)
+    return {
+        'quick_stats': get_quick_stats(user, now=now),
+        'chart_data': {
+            'income_labels': json.dumps(income_labels),
+            'income_data': json.dumps([float(total) for total in income_data]),
+            'expense_labels': json.dumps(list(expenses_by_category.keys())),
+            'expense_data': json.dumps([float(total) for total in expenses_by_category.values()]),
+        },
+    }
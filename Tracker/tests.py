@@ -1,3 +1,1594 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.db.models import Q, Sum
+from django.urls import reverse
+from django.utils import timezone
+
+from Users.forms import UserProfileForm
+from Users.models import UserProfile
+
+from .models import *
+from .anomalies import detect_anomalies, robust_scores, rolling_scores
+from .budgets import budget_month, get_budget, reconcile_budgets
+from .bulk import apply_edits
+from .calendars import (
+    conflicts_with, feed_token, find_conflicts, longest_span, overlapping, overlapping_entries, year_conflicts,
+)
+from .caching import (
+    GLOBAL_VERSION_KEY, STATS_KEY, USER_VERSION_KEY, bump_fx_version, bump_ledger_version, cache_counters,
+    cached_stats, check_shared_cache, reset_cache_counters,
+)
+from .categorizer import backfill_categories, suggest_category
+from .columnar import clear_snapshots, get_snapshot, np
+from .forecasting import METHODS, choose_methods, forecast_goals, get_goal_forecast
+from .forms import ExpensesForm
+from .fx import currency_choices, get_rates, load_rates
+from .importers import import_ledger
+from .matching import match_income
+from .receivables import aging_queryset, aging_report
+from .recurring import due_occurrences, materialize_recurring
+from .rollups import rebuild_rollups
+from .search import rebuild_index, search, search_pks
+from .stats import (
+    get_daily_income, get_dashboard_stats, get_expenses_by_category, get_monthly_average, get_monthly_totals,
+    get_quick_stats,
+)
+from .wallets import balance_history, check_balances
+
+_test_cache = None
+
+
+def setUpModule():
+    # The configured cache is shared on disk with running servers; tests get
+    # their own directory so runs neither see nor clobber each other's keys.
+    global _test_cache
+    location = tempfile.mkdtemp()
+    _test_cache = override_settings(CACHES={'default': {**settings.CACHES['default'], 'LOCATION': location}})
+    _test_cache.enable()
+
+
+def tearDownModule():
+    location = settings.CACHES['default']['LOCATION']
+    _test_cache.disable()
+    shutil.rmtree(location, ignore_errors=True)
+
+
+def create_ledger(user, rows):
+    """Give ``user`` ``rows`` of every kind of record the dashboard reads."""
+    now = timezone.now()
+    source = IncomeSource.objects.create(user=user, name="Contract", client="Acme", worth=100)
+    categories = [code for code, label in Expenses.CATEGORY_CHOICES]
+    for i in range(rows):
+        Income.objects.create(user=user, source=source, amount=10, date=now - timedelta(days=i % 40))
+        Expenses.objects.create(
+            user=user, name=f"Expense {i}", worth=4,
+            category=categories[i % len(categories)], date=now - timedelta(days=i % 40),
+        )
+        Projects.objects.create(user=user, name=f"Project {i}", status='In Progress')
+        Event.objects.create(user=user, title=f"Event {i}", start_date=now + timedelta(days=i + 1))
+
+
+class DashboardQueryBudgetTests(TestCase):
+    # session + user + quick stats + categories + income series + 3 recent lists
+    QUERY_BUDGET = 8
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.client.force_login(self.user)
+
+    def count_dashboard_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_is_fixed(self):
+        create_ledger(self.user, 2)
+        small = self.count_dashboard_queries()
+        create_ledger(self.user, 40)
+        large = self.count_dashboard_queries()
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, self.QUERY_BUDGET)
+
+    def test_quick_stats_match_ledger(self):
+        create_ledger(self.user, 8)
+        other = User.objects.create_user(username="bob", password="secret")
+        create_ledger(other, 3)
+
+        stats = get_quick_stats(self.user)
+        self.assertEqual(stats['total_income'], 80)
+        self.assertEqual(stats['total_expenses'], 32)
+        self.assertEqual(stats['net_worth'], 100)
+        self.assertEqual(stats['active_projects'], 8)
+        self.assertEqual(stats['upcoming_events'], 8)
+        self.assertEqual(stats['balance'], 48)
+
+    def test_net_worth_is_in_base_currency(self):
+        end = timezone.make_aware(datetime(2026, 2, 10, 12))
+        FxRate.objects.create(currency='EUR', date=end.date(), rate=Decimal('1.25'))
+        bump_fx_version()
+        self.addCleanup(cache.clear)
+        IncomeSource.objects.create(user=self.user, name="Retainer", worth=100, currency='EUR', end_date=end)
+        IncomeSource.objects.create(user=self.user, name="Site", worth=50, end_date=end)
+        self.assertEqual(get_quick_stats(self.user)['net_worth'], Decimal('175.00'))
+
+        UserProfile.objects.create(user=self.user, base_currency='EUR')
+        self.assertEqual(get_quick_stats(self.user)['net_worth'], Decimal('140.00'))
+
+    def test_quick_stats_empty_ledger(self):
+        stats = get_quick_stats(self.user)
+        self.assertEqual(stats['total_income'], 0)
+        self.assertEqual(stats['active_projects'], 0)
+        self.assertEqual(stats['balance'], 0)
+
+    def test_expenses_by_category_uses_category_field(self):
+        Expenses.objects.create(user=self.user, name="Business lunch", worth=5, category='FOOD')
+        Expenses.objects.create(user=self.user, name="Laptop", worth=7, category='BUSINESS')
+        totals = get_expenses_by_category(self.user)
+        self.assertEqual(totals, {'Business': 7, 'Personal': 0, 'Investment': 0, 'Food': 5})
+
+
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", password="secret")
+
+    def snapshot(self):
+        return sorted(
+            DailyRollup.objects.filter(user=self.user)
+            .filter(Q(income_count__gt=0) | Q(expense_count__gt=0))
+            .values_list('day', 'wallet', 'category', 'income_total', 'income_count',
+                         'expense_total', 'expense_count')
+        )
+
+    def test_signals_match_rebuild(self):
+        now = timezone.now()
+        income = Income.objects.create(user=self.user, amount=50, wallet="Bank", date=now)
+        Income.objects.create(user=self.user, amount=20, wallet="Bank", date=now)
+        expense = Expenses.objects.create(user=self.user, name="Rent", worth=30, category='PERSONAL', date=now)
+        Expenses.objects.create(user=self.user, name="Lunch", worth=5, category='FOOD', date=now)
+
+        income.amount = 60
+        income.wallet = "Paypal"
+        income.date = now - timedelta(days=3)
+        income.save()
+        expense.category = 'BUSINESS'
+        expense.save()
+        Expenses.objects.filter(name="Lunch").get().delete()
+
+        incremental = self.snapshot()
+        rebuild_rollups(user=self.user)
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_user_delete_cascades(self):
+        Income.objects.create(user=self.user, amount=5)
+        Expenses.objects.create(user=self.user, name="Coffee", worth=2, category='FOOD')
+        self.user.delete()
+        self.assertFalse(DailyRollup.objects.exists())
+
+
+class LedgerCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.other = User.objects.create_user(username="bob", password="secret")
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return {'calls': self.calls}
+
+    def test_served_from_cache_until_user_writes(self):
+        reset_cache_counters()
+        self.assertEqual(cached_stats(self.user, 'test', self.compute), {'calls': 1})
+        self.assertEqual(cached_stats(self.user, 'test', self.compute), {'calls': 1})
+
+        # Another user's writes leave this user's entry alone.
+        Expenses.objects.create(user=self.other, name="Coffee", worth=3)
+        self.assertEqual(cached_stats(self.user, 'test', self.compute), {'calls': 1})
+
+        Expenses.objects.create(user=self.user, name="Coffee", worth=3)
+        self.assertEqual(cached_stats(self.user, 'test', self.compute), {'calls': 2})
+        Expenses.objects.filter(user=self.user).get().delete()
+        self.assertEqual(cached_stats(self.user, 'test', self.compute), {'calls': 3})
+        self.assertEqual(cache_counters(), {'hits': 2, 'misses': 3})
+
+    def test_versions_and_counters_are_shared_between_processes(self):
+        # A second backend instance stands in for another worker or a cron job.
+        worker = caches.create_connection('default')
+        cached_stats(self.user, 'test', self.compute)
+        self.assertEqual(worker.get(STATS_KEY.format(
+            user_id=self.user.pk, global_version=worker.get(GLOBAL_VERSION_KEY),
+            version=worker.get(USER_VERSION_KEY.format(user_id=self.user.pk)), name='test',
+        )), {'calls': 1})
+
+        version = worker.get(USER_VERSION_KEY.format(user_id=self.user.pk))
+        bump_ledger_version(self.user.pk)
+        self.assertGreater(worker.get(USER_VERSION_KEY.format(user_id=self.user.pk)), version)
+
+        reset_cache_counters()
+        cached_stats(self.user, 'test', self.compute)
+        cached_stats(self.user, 'test', self.compute)
+        out = io.StringIO()
+        call_command('cache_stats', stdout=out)
+        self.assertEqual(out.getvalue().strip(), "hits=1 misses=1 hit_ratio=50.0%")
+
+    def test_rebuild_invalidates_all_users(self):
+        cached_stats(self.user, 'test', self.compute)
+        rebuild_rollups()
+        cached_stats(self.user, 'test', self.compute)
+        self.assertEqual(self.calls, 2)
+
+    def test_dashboard_hit_skips_stats_queries(self):
+        self.client.force_login(self.user)
+        create_ledger(self.user, 3)
+        with CaptureQueriesContext(connection) as miss:
+            self.client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as hit:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['quick_stats']['total_income'], 30)
+        self.assertEqual(len(miss.captured_queries) - len(hit.captured_queries), 3)
+
+
+@skipUnlessDBFeature('supports_explaining_query_execution')
+class QueryPlanTests(TestCase):
+    """Hot per-user queries must be answered from an index, never a table scan."""
+
+    # "SCAN <table>" without "USING ... INDEX" is SQLite's full table scan.
+    FULL_SCAN = re.compile(r'\bSCAN (?P<table>\w+)(?! USING (COVERING )?INDEX)')
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.now = timezone.now()
+
+    def hot_queries(self):
+        user, now = self.user, self.now
+        return {
+            'income by date': Income.objects.filter(user=user, date__gte=now).order_by('-date'),
+            'expenses by date': Expenses.objects.filter(user=user).order_by('-date'),
+            'expenses by category': Expenses.objects.filter(user=user, category='FOOD', date__gte=now),
+            'unpaid income sources': IncomeSource.objects.filter(user=user, got=False, end_date__lt=now),
+            'income sources by client': IncomeSource.objects.filter(user=user, client="Acme"),
+            'receivables aging': aging_queryset(user, now=now),
+            'upcoming events': Event.objects.filter(user=user, start_date__gte=now).order_by('start_date'),
+            'attended events': Event.objects.filter(user=user, attended=True),
+            'calendar month': overlapping(user, now.date(), now.date() + timedelta(days=30)),
+            'active projects': Projects.objects.filter(user=user, status='In Progress'),
+            'open goals': Goals.objects.filter(user=user, achieved=False).order_by('end_date'),
+            'nownext by date': NowNext.objects.filter(user=user).order_by('-date'),
+            'dream cars': DreamCar.objects.filter(user=user).order_by('-date_added'),
+            'bought dream cars': DreamCar.objects.filter(user=user, bought=True).order_by('-date_added'),
+            'rollup by day': DailyRollup.objects.filter(user=user, day__gte=now.date()),
+            'projects page': Projects.objects.filter(user=user).order_by('-date_set', '-pk'),
+            'goals page': Goals.objects.filter(user=user).order_by('-date_set', '-pk'),
+            'expenses after cursor': Expenses.objects.filter(
+                Q(date__lte=now), Q(date__lt=now) | Q(pk__lt=10), user=user,
+            ).order_by('-date', '-pk'),
+        }
+
+    def test_no_full_table_scans(self):
+        for label, queryset in self.hot_queries().items():
+            with self.subTest(label):
+                plan = queryset.explain()
+                match = self.FULL_SCAN.search(plan)
+                self.assertIsNone(match, f"{label} scans {match and match['table']}:\n{plan}")
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.client.force_login(self.user)
+        now = timezone.now()
+        # Pairs of rows share a timestamp so the pk tie-breaker is exercised.
+        for i in range(60):
+            Expenses.objects.create(user=self.user, name=f"Expense {i}", worth=1, date=now - timedelta(hours=i // 2))
+
+    def test_walks_every_row_once_without_count(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'cursor': cursor} if cursor else {}
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse('expenses-list'), params)
+            self.assertFalse(any('COUNT(*)' in q['sql'] for q in ctx.captured_queries))
+            seen.extend(expense.pk for expense in response.context['expenses'])
+            cursor = response.context['next_cursor']
+            if cursor is None:
+                break
+
+        expected = list(
+            Expenses.objects.filter(user=self.user).order_by('-date', '-pk').values_list('pk', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_tampered_cursor_is_rejected(self):
+        response = self.client.get(reverse('expenses-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_goal_totals_cover_every_page(self):
+        for i in range(30):
+            Goals.objects.create(user=self.user, goal_title=f"Goal {i}", achieved=i < 6)
+        response = self.client.get(reverse('goals-list'))
+        self.assertEqual(len(response.context['goals']), 25)
+        self.assertContains(response, "30 goals total")
+        self.assertEqual(
+            [response.context[name] for name in ('achieved_count', 'in_progress_count', 'success_rate')], [6, 24, 20],
+        )
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('goals-list'))
+        self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+
+
+class LedgerImportTests(TestCase):
+    CSV = (
+        "name,worth,description,date,category\n"
+        "Rent,500,Flat,2026-01-01 09:00,PERSONAL\n"
+        "Laptop,900,Work laptop,2026-01-02 10:00,BUSINESS\n"
+        "Rent,500,Flat,2026-01-01 09:00,PERSONAL\n"
+        "Broken,abc,Bad amount,2026-01-03 10:00,FOOD\n"
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", password="secret")
+
+    def test_import_skips_duplicates_and_invalid_rows(self):
+        result = import_ledger(self.user, 'expenses', io.StringIO(self.CSV), batch_size=2)
+        self.assertEqual((result.processed, result.created, result.duplicates, result.invalid), (4, 2, 1, 1))
+        self.assertEqual(len(result.errors), 1)
+
+        again = import_ledger(self.user, 'expenses', io.BytesIO(self.CSV.encode()))
+        self.assertEqual((again.created, again.duplicates), (0, 3))
+        self.assertEqual(Expenses.objects.filter(user=self.user).count(), 2)
+
+    def test_amounts_hash_by_value(self):
+        csv_text = (
+            "name,worth,description,date,category\n"
+            "Rent,500,Flat,2026-01-01 09:00,PERSONAL\n"
+            "Rent,500.00,Flat,2026-01-01 09:00,PERSONAL\n"
+            "Rent,500.01,Flat,2026-01-01 09:00,PERSONAL\n"
+        )
+        result = import_ledger(self.user, 'expenses', io.StringIO(csv_text))
+        self.assertEqual((result.created, result.duplicates), (2, 1))
+
+    def test_rows_differing_in_currency_or_wallet_are_not_duplicates(self):
+        FxRate.objects.create(currency='EUR', date=timezone.datetime(2026, 1, 1).date(), rate=Decimal('1.10'))
+        bump_fx_version()
+        csv_text = (
+            "name,worth,currency,description,date,category,wallet\n"
+            "Rent,500,,Flat,2026-01-01 09:00,PERSONAL,\n"
+            "Rent,500,EUR,Flat,2026-01-01 09:00,PERSONAL,\n"
+            "Rent,500,,Flat,2026-01-01 09:00,PERSONAL,Bank\n"
+            "Rent,500,USD,Flat,2026-01-01 09:00,PERSONAL,M-pesa\n"
+        )
+        result = import_ledger(self.user, 'expenses', io.StringIO(csv_text))
+        self.assertEqual((result.created, result.duplicates), (3, 1))
+
+    def test_import_updates_rollups(self):
+        source = IncomeSource.objects.create(user=self.user, name="Acme")
+        csv_text = (
+            "source,wallet,amount,date,description\n"
+            "Acme,Bank,100,2026-01-01 09:00,Invoice 1\n"
+            ",Paypal,50,2026-01-01 12:00,Tip\n"
+        )
+        result = import_ledger(self.user, 'income', io.StringIO(csv_text))
+        self.assertEqual(result.created, 2)
+        self.assertEqual(Income.objects.get(amount=100).source, source)
+
+        incremental = sorted(DailyRollup.objects.filter(user=self.user).values_list(
+            'day', 'wallet', 'income_total', 'income_count'))
+        rebuild_rollups(user=self.user)
+        rebuilt = sorted(DailyRollup.objects.filter(user=self.user).values_list(
+            'day', 'wallet', 'income_total', 'income_count'))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_import_view(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile("expenses.csv", self.CSV.encode(), content_type="text/csv")
+        response = self.client.post(reverse('ledger-import'), {'kind': 'expenses', 'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['import_errors']), 1)
+        self.assertEqual(Expenses.objects.filter(user=self.user).count(), 2)
+
+
+class LedgerExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.client.force_login(self.user)
+        other = User.objects.create_user(username="bob", password="secret")
+        Expenses.objects.create(user=other, name="Not mine", worth=1, date=timezone.now())
+        for day in range(1, 4):
+            Expenses.objects.create(
+                user=self.user, name=f"Expense {day}", worth=day, category='FOOD',
+                date=timezone.make_aware(timezone.datetime(2026, 1, day, 12)),
+            )
+
+    def export(self, fmt, **params):
+        response = self.client.get(reverse('ledger-export', args=['expenses', fmt]), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_export(self):
+        rows = list(csv.reader(io.StringIO(self.export('csv').decode())))
+        self.assertEqual(rows[0], ['id', 'date', 'name', 'category', 'worth', 'currency', 'description'])
+        self.assertEqual([row[2] for row in rows[1:]], ["Expense 1", "Expense 2", "Expense 3"])
+
+    def test_json_export_with_date_range(self):
+        data = json.loads(self.export('json', start='2026-01-02', end='2026-01-02'))
+        self.assertEqual([item['name'] for item in data], ["Expense 2"])
+        self.assertEqual(json.loads(self.export('json', start='2030-01-01')), [])
+
+    def test_gzip_export(self):
+        data = gzip.decompress(self.export('csv', gzip='1')).decode()
+        self.assertEqual(len(data.strip().splitlines()), 4)
+
+    def test_bad_parameters(self):
+        url = reverse('ledger-export', args=['expenses', 'csv'])
+        self.assertEqual(self.client.get(url, {'start': '2026-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('ledger-export', args=['users', 'csv'])).status_code, 404)
+
+
+class CategorizerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", password="secret")
+
+    def test_default_and_user_rules(self):
+        self.assertEqual(suggest_category(self.user, "Team lunch"), 'FOOD')
+        self.assertEqual(suggest_category(self.user, "Misc", "bought more Stocks"), 'INVESTMENT')
+        self.assertIsNone(suggest_category(self.user, "Something else"))
+
+        CategoryKeyword.objects.create(user=self.user, keyword="lunch", category='BUSINESS')
+        self.assertEqual(suggest_category(self.user, "Team lunch"), 'BUSINESS')
+
+    def test_create_view_fills_blank_category(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('expenses-create'), {
+            'name': "Groceries", 'worth': 12, 'description': "Weekly shop",
+            'date': '2026-01-05T10:00', 'category': '',
+        })
+        self.assertEqual(Expenses.objects.get(user=self.user).category, 'FOOD')
+
+    def test_backfill(self):
+        Expenses.objects.create(user=self.user, name="Office chair", worth=80)
+        Expenses.objects.create(user=self.user, name="Mystery", worth=5)
+        Expenses.objects.create(user=self.user, name="Coffee", worth=3, category='PERSONAL')
+
+        self.assertEqual(backfill_categories(self.user, batch_size=1), 1)
+        categories = dict(Expenses.objects.values_list('name', 'category'))
+        self.assertEqual(categories, {"Office chair": 'BUSINESS', "Mystery": 'OTHER', "Coffee": 'PERSONAL'})
+        self.assertEqual(get_expenses_by_category(self.user)['Business'], 80)
+
+    def test_backfill_moves_category_budget_spend(self):
+        chair = Expenses.objects.create(user=self.user, name="Office chair", worth=80)
+        business = get_budget(self.user, category='BUSINESS')
+        other = get_budget(self.user, category=chair.category)
+        self.assertEqual((business.spent, other.spent), (0, Decimal('80.00')))
+
+        backfill_categories(self.user)
+        business.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((business.spent, other.spent), (Decimal('80.00'), 0))
+        self.assertEqual(reconcile_budgets(user=self.user), 0)
+
+
+
+class MoneyFieldTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", password="secret")
+
+    def test_amounts_are_stored_as_minor_units(self):
+        expense = Expenses.objects.create(user=self.user, name="Coffee", worth="3.105")
+        expense.refresh_from_db()
+        self.assertEqual(expense.worth, Decimal('3.11'))
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT worth FROM {Expenses._meta.db_table} WHERE id = %s", [expense.pk])
+            self.assertEqual(cursor.fetchone()[0], 311)
+
+    def test_aggregates_are_exact(self):
+        for worth in ("0.10", "0.20", "0.10"):
+            Expenses.objects.create(user=self.user, name="Gum", worth=Decimal(worth), category='FOOD')
+        self.assertEqual(Expenses.objects.aggregate(total=Sum('worth'))['total'], Decimal('0.40'))
+        self.assertEqual(get_expenses_by_category(self.user)['Food'], Decimal('0.40'))
+        self.assertEqual(Expenses.objects.filter(worth__gt=Decimal('0.15')).count(), 1)
+
+
+class ColumnarSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_snapshots()
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.now = timezone.make_aware(timezone.datetime(2026, 3, 18, 12))
+        categories = [code for code, label in Expenses.CATEGORY_CHOICES]
+        for i in range(90):
+            Income.objects.create(user=self.user, amount=Decimal('10.05'), date=self.now - timedelta(days=i % 45))
+            Expenses.objects.create(
+                user=self.user, name=f"Expense {i}", worth=Decimal('2.50') + i,
+                category=categories[i % len(categories)], date=self.now - timedelta(days=i),
+            )
+
+    def test_matches_rollup_figures(self):
+        snapshot = get_snapshot(self.user)
+        self.assertEqual(
+            snapshot.expense.bucket_totals('month'),
+            [(row['month'], row['total']) for row in get_monthly_totals(self.user, 'expense')],
+        )
+        self.assertEqual(snapshot.expense.bucket_average('month'), get_monthly_average(self.user, 'expense'))
+        self.assertEqual(
+            list(snapshot.expense.code_totals().values()),
+            list(get_expenses_by_category(self.user).values()),
+        )
+        self.assertEqual(snapshot.daily_series('income', days=30, now=self.now), get_daily_income(self.user, 30, self.now))
+
+    def test_weeks_start_on_monday(self):
+        weeks = get_snapshot(self.user).expense.bucket_totals('week')
+        self.assertTrue(all(start.weekday() == 0 for start, total in weeks))
+        self.assertEqual(sum(total for start, total in weeks), get_snapshot(self.user).expense.total())
+
+    def test_invalidated_on_write(self):
+        snapshot = get_snapshot(self.user)
+        self.assertIs(get_snapshot(self.user), snapshot)
+        Expenses.objects.create(user=self.user, name="Late", worth=1, date=self.now)
+        fresh = get_snapshot(self.user)
+        self.assertIsNot(fresh, snapshot)
+        self.assertEqual(len(fresh.expense.amounts), 91)
+
+    def test_columns_are_built_per_kind_on_first_use(self):
+        snapshot = get_snapshot(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            snapshot.expense.total()
+            snapshot.expense.total()
+        self.assertEqual([q['sql'] for q in ctx.captured_queries if 'Tracker_income' in q['sql']], [])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn('income', vars(snapshot))
+
+    def test_dashboard_income_chart_comes_from_snapshot(self):
+        stats = get_dashboard_stats(self.user, now=self.now)
+        labels, data = get_daily_income(self.user, 30, self.now)
+        self.assertEqual(stats['chart_data']['income_labels'], json.dumps(labels))
+        self.assertEqual(stats['chart_data']['income_data'], json.dumps([float(total) for total in data]))
+        self.assertIn('income', vars(get_snapshot(self.user)))
+
+    @override_settings(TRACKER_SNAPSHOT_USERS=1)
+    def test_lru_is_bounded(self):
+        other = User.objects.create_user(username="bob", password="secret")
+        snapshot = get_snapshot(self.user)
+        get_snapshot(other)
+        self.assertIsNot(get_snapshot(self.user), snapshot)
+
+
+@skipUnless(np is not None, "Forecasting needs NumPy")
+class ForecastTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.now = timezone.make_aware(timezone.datetime(2026, 6, 1))
+        for month in range(12):
+            year, index = divmod(2025 * 12 + 5 + month, 12)
+            day = timezone.make_aware(timezone.datetime(year, index + 1, 15))
+            Income.objects.create(user=self.user, amount=1000, date=day)
+            Expenses.objects.create(user=self.user, name="Rent", worth=400, date=day)
+
+    def test_steady_cash_flow_is_projected_linearly(self):
+        goal = IncomeGoal.objects.create(
+            user=self.user, amount=9500, by_when=timezone.make_aware(timezone.datetime(2026, 9, 1)),
+        )
+        self.assertEqual(forecast_goals(now=self.now), 1)
+        forecast = IncomeGoalForecast.objects.get(goal=goal)
+        self.assertEqual(forecast.monthly_net, Decimal('600.00'))
+        self.assertEqual(forecast.projected_balance, Decimal('9000.00'))
+        self.assertFalse(forecast.on_track)
+
+        # Running again updates the stored forecast in place.
+        goal.amount = 8000
+        goal.save()
+        forecast_goals(now=self.now)
+        self.assertTrue(IncomeGoalForecast.objects.get(goal=goal).on_track)
+
+    def test_seasonal_history_picks_seasonal_model(self):
+        months = np.arange(36)
+        history = np.vstack([
+            100 + 1000 * (months % 12 == 11),
+            np.full(36, 100),
+        ]).astype(float)
+        best = choose_methods(history, first_month=0)
+        self.assertEqual(METHODS[best[0]], 'seasonal')
+
+    def test_goal_page_reads_forecast(self):
+        IncomeGoal.objects.create(user=self.user, amount=100, by_when=timezone.now() + timedelta(days=40))
+        goal = get_goal_forecast(self.user)
+        self.assertTrue(goal.forecast.on_track)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('income-form-stats'))
+        self.assertIn("on track", response.json()['panels']['banner'])
+
+
+@skipUnless(np is not None, "Anomaly detection needs NumPy")
+class AnomalyDetectionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.other = User.objects.create_user(username="bob", password="secret")
+        start = timezone.now() - timedelta(days=60)
+        for user in (self.user, self.other):
+            for i in range(30):
+                Expenses.objects.create(
+                    user=user, name="Lunch", worth=10 + i % 3, category='FOOD', date=start + timedelta(days=i),
+                )
+        self.spike = Expenses.objects.create(
+            user=self.user, name="Banquet", worth=400, category='FOOD', date=start + timedelta(days=31),
+        )
+        # Large, but normal for its own category.
+        for i in range(6):
+            Expenses.objects.create(
+                user=self.user, name="Server", worth=390 + i, category='BUSINESS', date=start + timedelta(days=i),
+            )
+
+    def test_scores(self):
+        amounts = np.array([10, 11, 12, 10, 11, 100, 1, 2], dtype=float)
+        starts = np.array([0, 6])
+        robust = robust_scores(amounts, starts)
+        self.assertGreater(robust[5], 3.5)
+        self.assertTrue(np.isnan(robust[6:]).all())  # group too small
+
+        rolling = rolling_scores(amounts, starts, window=5)
+        self.assertTrue(np.isnan(rolling[:5]).all())
+        self.assertGreater(rolling[5], 3)
+
+    def test_flags_only_outliers_in_their_category(self):
+        self.assertEqual(detect_anomalies(chunk_users=1), 1)
+        anomaly = ExpenseAnomaly.objects.get()
+        self.assertEqual((anomaly.expense, anomaly.user, anomaly.method), (self.spike, self.user, ExpenseAnomaly.ROBUST))
+
+        # Rerunning replaces rather than duplicates.
+        self.assertEqual(detect_anomalies(user_ids=[self.user.pk]), 1)
+        self.assertEqual(ExpenseAnomaly.objects.count(), 1)
+
+    def test_amounts_are_compared_in_base_currency(self):
+        # 1,400 KES is about 11 USD: an ordinary lunch, not a spike.
+        FxRate.objects.create(currency='KES', date=self.spike.date.date() - timedelta(days=90), rate=Decimal('0.0080'))
+        bump_fx_version()
+        self.addCleanup(cache.clear)
+        Expenses.objects.filter(pk=self.spike.pk).update(worth=1400, currency='KES')
+        self.assertEqual(detect_anomalies(), 0)
+
+        UserProfile.objects.create(user=self.user, base_currency='KES')
+        self.assertEqual(detect_anomalies(), 0)
+
+    def test_expenses_list_joins_flags(self):
+        detect_anomalies()
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('expenses-list'))
+        self.assertContains(response, "Unusual", count=1)
+        self.assertFalse(any('"Tracker_expenseanomaly"."expense_id" =' in q['sql'] for q in ctx.captured_queries))
+
+class RecurringRuleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.start = timezone.make_aware(datetime(2024, 1, 31, 9, 0))
+        self.salary = RecurringRule.objects.create(
+            user=self.user, kind=RecurringRule.INCOME, name="Salary", amount=Decimal('2500.00'),
+            wallet='Bank', frequency=RecurringRule.MONTHLY, start_date=self.start,
+        )
+        self.gym = RecurringRule.objects.create(
+            user=self.user, kind=RecurringRule.EXPENSE, name="Gym", amount=Decimal('30.00'),
+            category='PERSONAL', frequency=RecurringRule.WEEKLY, interval=2, start_date=self.start,
+            end_date=self.start + timedelta(weeks=5),
+        )
+
+    def test_occurrences_clamp_to_month_end(self):
+        due, next_run = due_occurrences(self.salary, timezone.make_aware(datetime(2024, 4, 15)))
+        self.assertEqual([timezone.localdate(value).isoformat() for value in due],
+                         ['2024-01-31', '2024-02-29', '2024-03-31'])
+        self.assertEqual(timezone.localdate(next_run).isoformat(), '2024-04-30')
+
+    def test_materialize_is_idempotent(self):
+        now = timezone.make_aware(datetime(2024, 4, 15))
+        self.assertEqual(materialize_recurring(now=now), (2, 6))
+        self.assertEqual(Income.objects.filter(recurring_rule=self.salary).count(), 3)
+        self.assertEqual(Expenses.objects.filter(recurring_rule=self.gym).count(), 3)
+
+        # The gym rule has ended; only the salary is still due.
+        self.assertEqual(materialize_recurring(now=now), (0, 0))
+        self.gym.refresh_from_db()
+        self.assertIsNone(self.gym.next_run)
+
+        # Occurrences already written are skipped even if the rule is rewound.
+        RecurringRule.objects.filter(pk=self.salary.pk).update(next_run=self.start)
+        self.assertEqual(materialize_recurring(now=now), (1, 0))
+
+    def test_materialize_updates_rollups_and_search(self):
+        Income.objects.create(user=self.user, amount=5, date=self.start)
+        materialize_recurring(now=timezone.make_aware(datetime(2024, 4, 15)))
+        rows = DailyRollup.objects.order_by('day', 'wallet', 'category').values_list(
+            'day', 'wallet', 'category', 'income_total', 'income_count', 'expense_total', 'expense_count',
+        )
+        materialized = list(rows)
+        rebuild_rollups()
+        self.assertEqual(materialized, list(rows))
+        self.assertEqual(len(search(self.user, "gym")), 3)
+
+    def test_salary_is_monthly_recurring_income(self):
+        RecurringRule.objects.create(
+            user=self.user, kind=RecurringRule.INCOME, name="Bonus", amount=Decimal('1200.00'),
+            frequency=RecurringRule.YEARLY,
+        )
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('incomesource-list'))
+        self.assertEqual(response.context['salary'], Decimal('2600.00'))
+
+
+class BudgetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.month = budget_month(timezone.localdate())
+        Expenses.objects.create(user=self.user, name="Rent", worth=300, category='PERSONAL')
+
+    def test_new_month_starts_from_rollups_and_previous_amount(self):
+        previous = (self.month - timedelta(days=1)).replace(day=1)
+        Budget.objects.create(user=self.user, month=previous, amount=Decimal('500.00'))
+        budget = get_budget(self.user)
+        self.assertEqual((budget.amount, budget.spent), (Decimal('500.00'), Decimal('300.00')))
+
+    def test_spend_follows_expense_writes(self):
+        overall = get_budget(self.user)
+        food = get_budget(self.user, category='FOOD')
+        lunch = Expenses.objects.create(user=self.user, name="Lunch", worth=Decimal('12.50'), category='FOOD')
+        lunch.worth = Decimal('15.00')
+        lunch.save()
+        Expenses.objects.create(user=self.user, name="Last year", worth=99, date=timezone.now() - timedelta(days=400))
+        overall.refresh_from_db()
+        food.refresh_from_db()
+        self.assertEqual((overall.spent, food.spent), (Decimal('315.00'), Decimal('15.00')))
+
+        lunch.delete()
+        overall.refresh_from_db()
+        self.assertEqual(overall.spent, Decimal('300.00'))
+        self.assertEqual(reconcile_budgets(), 0)
+
+    def test_reconcile_fixes_drift(self):
+        budget = get_budget(self.user)
+        Budget.objects.filter(pk=budget.pk).update(spent=0)
+        self.assertEqual(reconcile_budgets(user=self.user), 1)
+        budget.refresh_from_db()
+        self.assertEqual(budget.spent, Decimal('300.00'))
+
+    def test_user_set_amount_carries_over(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('budget-update'), {'category': 'FOOD'})
+        self.assertEqual(response.context['form'].initial['amount'], Decimal('2000.00'))
+        response = self.client.post(reverse('budget-update'), {'category': 'FOOD', 'amount': '250.50'})
+        self.assertRedirects(response, reverse('expenses-list'))
+        self.assertEqual(get_budget(self.user, category='FOOD').amount, Decimal('250.50'))
+        self.assertEqual(get_budget(self.user).amount, Decimal('2000.00'))
+
+        next_month = (self.month + timedelta(days=31)).replace(day=1)
+        self.assertEqual(get_budget(self.user, category='FOOD', month=next_month).amount, Decimal('250.50'))
+
+        response = self.client.post(reverse('budget-update'), {'category': '', 'amount': '-1'})
+        self.assertTrue(response.context['form'].has_error('amount'))
+
+    def test_form_widgets_use_budget_row(self):
+        Budget.objects.create(user=self.user, month=self.month, amount=Decimal('400.00'), spent=Decimal('300.00'))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('expenses-form-stats'))
+        self.assertEqual(response.json()['values'], {'budget': '400.00', 'month_expenses': '300.00'})
+        self.assertIn("$100.00", response.json()['panels']['budget'])
+
+
+class FormStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", password="secret")
+        create_ledger(self.user, 3)
+        self.client.force_login(self.user)
+
+    def test_form_renders_without_stats_queries(self):
+        get_rates()  # the currency choices come from the process-wide rate table
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('expenses-create'))
+        self.assertContains(response, reverse('expenses-form-stats'))
+        self.assertFalse(any('"Tracker_' in q['sql'] for q in ctx.captured_queries))
+
+    def test_etag_revalidation(self):
+        for name in ('income-form-stats', 'expenses-form-stats'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('recent', response.json()['panels'])
+            etag = response['ETag']
+
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertFalse(any('"Tracker_' in q['sql'] for q in ctx.captured_queries))
+
+            Expenses.objects.create(user=self.user, name="Coffee", worth=3)
+            response = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+
+
+class FxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Base currencies are cached per user id, which the next test may reuse.
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.jan = datetime(2026, 1, 10, 12, tzinfo=timezone.utc)
+        self.feb = datetime(2026, 2, 10, 12, tzinfo=timezone.utc)
+        FxRate.objects.bulk_create([
+            FxRate(currency='EUR', date=self.jan.date(), rate=Decimal('1.10')),
+            FxRate(currency='EUR', date=self.feb.date(), rate=Decimal('1.25')),
+            FxRate(currency='KES', date=self.jan.date(), rate=Decimal('0.0080')),
+        ])
+        bump_fx_version()
+
+    def rollup_totals(self):
+        return sorted(
+            DailyRollup.objects.filter(user=self.user)
+            .values_list('day', 'wallet', 'category', 'income_total', 'expense_total')
+        )
+
+    def test_rate_table_uses_latest_rate_on_or_before_day(self):
+        rates = get_rates()
+        self.assertEqual(rates.rate('EUR', self.jan.date() - timedelta(days=5)), Decimal('1.10'))
+        self.assertEqual(rates.rate('EUR', self.feb.date() - timedelta(days=1)), Decimal('1.10'))
+        self.assertEqual(rates.rate('EUR', self.feb.date() + timedelta(days=30)), Decimal('1.25'))
+        self.assertEqual(rates.rate('GBP', self.feb.date()), 1)
+        self.assertEqual(rates.convert(Decimal('100.00'), 'EUR', 'USD', self.feb.date()), Decimal('125.00'))
+        self.assertEqual(rates.convert(Decimal('1000.00'), 'KES', 'EUR', self.feb.date()), Decimal('6.40'))
+
+    def test_rollups_are_kept_in_base_currency(self):
+        Income.objects.create(user=self.user, amount=110, currency='USD', wallet='Bank', date=self.jan)
+        Income.objects.create(user=self.user, amount=5000, currency='KES', wallet='M-pesa', date=self.feb)
+        lunch = Expenses.objects.create(user=self.user, name="Lunch", worth=20, currency='EUR', date=self.feb)
+        self.assertEqual(
+            DailyRollup.objects.filter(user=self.user).aggregate(total=Sum('income_total'))['total'],
+            Decimal('150.00'),
+        )
+
+        UserProfile.objects.create(user=self.user, base_currency='EUR')
+        self.assertEqual(self.rollup_totals(), [
+            (self.jan.date(), 'Bank', '', Decimal('100.00'), 0),
+            (self.feb.date(), '', lunch.category, 0, Decimal('20.00')),
+            (self.feb.date(), 'M-pesa', '', Decimal('32.00'), 0),
+        ])
+
+        # Incremental updates and a SQL rebuild agree.
+        lunch.worth = Decimal('33.33')
+        lunch.currency = 'USD'
+        lunch.save()
+        Expenses.objects.create(user=self.user, name="Taxi", worth=Decimal('7.77'), currency='KES', date=self.jan)
+        incremental = self.rollup_totals()
+        rebuild_rollups(self.user)
+        self.assertEqual(self.rollup_totals(), incremental)
+
+    def test_ledger_rows_carry_a_currency(self):
+        self.client.force_login(self.user)
+        post = {'name': "Hotel", 'worth': 100, 'description': "Two nights", 'date': '2026-02-10T12:00', 'category': 'PERSONAL'}
+        self.client.post(reverse('expenses-create'), {**post, 'currency': 'eur'})
+        self.assertEqual(Expenses.objects.get(user=self.user).currency, 'EUR')
+        response = self.client.post(reverse('expenses-create'), {**post, 'currency': 'XYZ'})
+        self.assertTrue(response.context['form'].has_error('currency'))
+
+        result = import_ledger(self.user, 'income', io.StringIO(
+            "wallet,amount,currency,date,description\n"
+            "M-pesa,5000,kes,2026-02-10 12:00,Sale\n"
+            "Bank,10,,2026-02-10 12:00,Tip\n"
+            "Bank,10,XYZ,2026-02-10 12:00,Bad\n"
+        ))
+        self.assertEqual((result.created, result.invalid), (2, 1))
+        self.assertEqual(
+            sorted(Income.objects.filter(user=self.user).values_list('description', 'currency')),
+            [("Sale", 'KES'), ("Tip", 'USD')],
+        )
+        self.assertEqual(
+            DailyRollup.objects.filter(user=self.user).aggregate(total=Sum('income_total'))['total'],
+            Decimal('50.00'),
+        )
+
+        response = self.client.get(reverse('ledger-export', args=['income', 'csv']))
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(sorted(row['currency'] for row in rows), ['KES', 'USD'])
+
+    def test_base_currency_must_have_rates(self):
+        form = UserProfileForm(data={'base_currency': 'eur'}, instance=UserProfile(user=self.user))
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['base_currency'], 'EUR')
+        form = UserProfileForm(data={'base_currency': 'XYZ'}, instance=UserProfile(user=self.user))
+        self.assertTrue(form.has_error('base_currency'))
+
+    @skipUnless(np is not None, "NumPy is not installed")
+    def test_snapshot_converts_like_rollups(self):
+        UserProfile.objects.create(user=self.user, base_currency='EUR')
+        Income.objects.create(user=self.user, amount=Decimal('10.01'), currency='USD', wallet='Bank', date=self.jan)
+        Income.objects.create(user=self.user, amount=1234, currency='KES', wallet='M-pesa', date=self.feb)
+        clear_snapshots()
+        self.assertEqual(
+            get_snapshot(self.user).income.total(),
+            DailyRollup.objects.filter(user=self.user).aggregate(total=Sum('income_total'))['total'],
+        )
+
+    def test_rates_loaded_by_another_process_are_picked_up(self):
+        self.assertNotIn(('GBP', 'GBP'), currency_choices())
+        # The loader runs with its own cache connection, like a management
+        # command next to a running server.
+        with mock.patch('Tracker.caching.get_cache', return_value=caches.create_connection('default')):
+            load_rates(io.StringIO("date,currency,rate\n2026-02-10,GBP,1.30\n"))
+        self.assertIn(('GBP', 'GBP'), currency_choices())
+        self.assertEqual(get_rates().rate('GBP', self.feb.date()), Decimal('1.30'))
+        form = ExpensesForm(data={'currency': 'gbp'})
+        form.is_valid()
+        self.assertEqual(form.cleaned_data['currency'], 'GBP')
+
+    def test_process_local_stats_cache_is_flagged(self):
+        self.assertEqual(check_shared_cache(None), [])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([w.id for w in check_shared_cache(None)], ['Tracker.W001'])
+
+    def test_load_fx_rates_command(self):
+        Expenses.objects.create(user=self.user, name="Hotel", worth=100, currency='EUR', date=self.feb)
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write("date,currency,rate\n2026-02-10,EUR,1.50\n2026-02-10,gbp,1.30\n")
+        self.addCleanup(os.remove, f.name)
+        call_command('load_fx_rates', f.name, stdout=io.StringIO())
+        self.assertEqual(FxRate.objects.get(currency='EUR', date=self.feb.date()).rate, Decimal('1.50'))
+        self.assertTrue(FxRate.objects.filter(currency='GBP').exists())
+        self.assertEqual(self.rollup_totals()[0][4], Decimal('150.00'))
+
+        with open(f.name, 'w') as bad:
+            bad.write("date,currency,rate\nyesterday,EUR,1\n")
+        with self.assertRaisesMessage(CommandError, "Line 2"):
+            call_command('load_fx_rates', f.name, stdout=io.StringIO())
+
+class WalletBalanceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.jan = datetime(2026, 1, 10, 12, tzinfo=timezone.utc)
+
+    def balances(self):
+        return {
+            (row.wallet, row.currency): row.balance
+            for row in WalletBalance.objects.filter(user=self.user, moves__gt=0)
+        }
+
+    def test_balances_follow_writes(self):
+        income = Income.objects.create(user=self.user, wallet='M-pesa', amount=500, date=self.jan)
+        Income.objects.create(user=self.user, wallet='Binance', amount=80, currency='EUR', date=self.jan)
+        rent = Expenses.objects.create(user=self.user, name="Rent", worth=200, wallet='M-pesa', date=self.jan)
+        EmergencyFunds.objects.create(user=self.user, amount=50, wallet='M-pesa')
+        self.assertEqual(self.balances(), {('M-pesa', 'USD'): Decimal('250.00'), ('Binance', 'EUR'): Decimal('80.00')})
+
+        rent.wallet = 'Bank'
+        rent.save()
+        income.delete()
+        self.assertEqual(self.balances(), {
+            ('M-pesa', 'USD'): Decimal('-50.00'), ('Binance', 'EUR'): Decimal('80.00'),
+            ('Bank', 'USD'): Decimal('-200.00'),
+        })
+        self.assertEqual(check_balances(), [])
+
+    def test_check_finds_and_fixes_drift(self):
+        Income.objects.create(user=self.user, wallet='Bank', amount=100, date=self.jan)
+        WalletBalance.objects.filter(user=self.user).update(balance=0)
+        with self.assertRaises(CommandError):
+            call_command('check_wallet_balances', stdout=io.StringIO())
+        call_command('check_wallet_balances', '--fix', stdout=io.StringIO())
+        self.assertEqual(self.balances(), {('Bank', 'USD'): Decimal('100.00')})
+        self.assertEqual(check_balances(user=self.user), [])
+
+    def test_import_updates_balances(self):
+        rows = "name,worth,description,date,category,wallet\nTaxi,12.50,Airport,2026-01-10 10:00,PERSONAL,Paypal\n"
+        result = import_ledger(self.user, 'expenses', io.StringIO(rows))
+        self.assertEqual(result.created, 1)
+        self.assertEqual(self.balances(), {('Paypal', 'USD'): Decimal('-12.50')})
+
+    def test_history_is_a_running_balance(self):
+        Income.objects.create(user=self.user, wallet='Bank', amount=100, date=self.jan)
+        Expenses.objects.create(user=self.user, name="Food", worth=30, wallet='Bank', date=self.jan + timedelta(days=1))
+        Income.objects.create(user=self.user, wallet='Bank', amount=5, date=self.jan + timedelta(days=3))
+        history = balance_history(self.user, since=self.jan.date() + timedelta(days=1))
+        self.assertEqual(history[('Bank', 'USD')], [
+            (self.jan.date() + timedelta(days=1), Decimal('70.00')),
+            (self.jan.date() + timedelta(days=3), Decimal('75.00')),
+        ])
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('wallet-balances'))
+        self.assertContains(response, "75.00")
+
+class ReceivablesAgingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.now = timezone.now()
+        for days, client, worth in [(-5, "Acme", 10), (0, "Acme", 20), (45, "Acme", 30), (200, "Acme", 40), (75, "Globex", 50)]:
+            IncomeSource.objects.create(
+                user=self.user, name=f"{client} {days}", client=client, worth=worth,
+                end_date=self.now - timedelta(days=days, hours=1),
+            )
+        IncomeSource.objects.create(user=self.user, name="Paid", client="Acme", worth=999, got=True,
+                                    end_date=self.now - timedelta(days=10))
+
+    def test_buckets_per_client_in_one_query(self):
+        with self.assertNumQueries(1):
+            rows = aging_report(self.user, now=self.now)
+        acme, globex = rows
+        self.assertEqual(
+            [acme[key] for key in ('count', 'total', 'current', 'days_0_30', 'days_31_60', 'days_61_90', 'days_over_90')],
+            [4, Decimal('100.00'), Decimal('10.00'), Decimal('20.00'), Decimal('30.00'), 0, Decimal('40.00')],
+        )
+        self.assertEqual((globex['client'], globex['days_61_90']), ("Globex", Decimal('50.00')))
+
+    @skipUnless(connection.vendor == 'sqlite', "Checks SQLite's query plan")
+    def test_uses_partial_index(self):
+        self.assertIn('incomesource_unpaid_idx', aging_queryset(self.user, now=self.now).explain())
+
+    def test_drill_down_and_csv_export(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('receivables-aging'), {'client': "Acme"})
+        self.assertEqual([source.days_overdue for source in response.context['sources']], [200, 45, 0, -5])
+        self.assertNotContains(response, "Globex")
+
+        response = self.client.get(reverse('receivables-aging-export'))
+        rows = list(csv.reader(io.StringIO(response.content.decode())))
+        self.assertEqual(rows[0][:4], ['client', 'currency', 'count', 'total'])
+        self.assertEqual(rows[2], ['Globex', 'USD', '1', '50.00', '0.00', '0.00', '0.00', '50.00', '0.00'])
+
+    def test_list_renders_average_worth_in_major_units(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('incomesource-list'))
+        self.assertEqual(response.context['avg_worth'], Decimal('191.50'))
+        self.assertContains(response, "$191.50")
+
+class IncomeMatchingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.due = timezone.now() - timedelta(days=20)
+
+    def source(self, name, client, worth, days=0, **kwargs):
+        return IncomeSource.objects.create(
+            user=self.user, name=name, client=client, worth=worth, end_date=self.due + timedelta(days=days), **kwargs,
+        )
+
+    def income(self, amount, days=0, description="", **kwargs):
+        return Income.objects.create(
+            user=self.user, amount=amount, date=self.due + timedelta(days=days), description=description, **kwargs,
+        )
+
+    def test_matches_by_amount_date_and_client(self):
+        acme = self.source("Website", "Acme", 1000)
+        globex = self.source("App", "Globex", 1000, days=2)
+        far = self.source("Audit", "Initech", 500, days=-90)
+        paid = self.income(Decimal('990.00'), days=3, description="Payment from GLOBEX")
+        other = self.income(1000, days=1)
+        self.income(500, days=1)  # Within tolerance of nothing open nearby.
+        self.income(1000, days=1, currency='EUR')
+
+        matches = match_income(user=self.user)
+        self.assertEqual({(income.pk, source.pk) for income, source in matches}, {(paid.pk, globex.pk), (other.pk, acme.pk)})
+        self.assertEqual(Income.objects.get(pk=paid.pk).source, globex)
+        self.assertEqual(set(IncomeSource.objects.filter(got=True)), {acme, globex})
+        self.assertFalse(IncomeSource.objects.get(pk=far.pk).got)
+        self.assertEqual(match_income(user=self.user), [])
+
+    def test_dry_run_writes_nothing(self):
+        self.source("Website", "Acme", 1000)
+        self.income(1000)
+        out = io.StringIO()
+        call_command('match_income', '--dry-run', stdout=out)
+        self.assertIn("Would link 1", out.getvalue())
+        self.assertFalse(Income.objects.filter(source__isnull=False).exists())
+
+    def test_each_source_takes_one_income(self):
+        sources = [self.source(f"Month {i}", "Acme", 100, days=i) for i in range(3)]
+        incomes = [self.income(100, days=i) for i in range(5)]
+        # Users, incomes, sources and two bulk updates, plus a savepoint pair.
+        with self.assertNumQueries(7):
+            matches = match_income()
+        self.assertEqual(len(matches), 3)
+        self.assertEqual(len({source.pk for income, source in matches}), 3)
+        self.assertEqual(sorted(income.pk for income, source in matches), [income.pk for income in incomes[:3]])
+
+
+class EventCalendarTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.client.force_login(self.user)
+        tz = timezone.get_current_timezone()
+        self.events = {}
+        for title, start, end in [
+            ("September", datetime(2026, 9, 10, 9), datetime(2026, 9, 10, 17)),
+            ("Across months", datetime(2026, 9, 28, 9), datetime(2026, 10, 2, 17)),
+            ("October", datetime(2026, 10, 15, 9), datetime(2026, 10, 15, 17)),
+            ("Last evening", datetime(2026, 10, 31, 20), datetime(2026, 10, 31, 22)),
+            ("November", datetime(2026, 11, 1, 9), datetime(2026, 11, 1, 17)),
+        ]:
+            self.events[title] = Event.objects.create(
+                user=self.user, title=title, start_date=start.replace(tzinfo=tz), end_date=end.replace(tzinfo=tz),
+            )
+        other = User.objects.create_user(username="bob", password="secret")
+        Event.objects.create(user=other, title="Not mine", start_date=datetime(2026, 10, 15, 9, tzinfo=tz))
+
+    def calendar(self, start, end, **headers):
+        return self.client.get(reverse('event-calendar'), {'start': start, 'end': end}, **headers)
+
+    def test_returns_only_overlapping_events(self):
+        response = self.calendar('2026-10-01', '2026-10-31')
+        self.assertEqual(response.status_code, 200)
+        events = response.json()['events']
+        self.assertEqual([event['title'] for event in events], ["Across months", "October", "Last evening"])
+        self.assertEqual((events[0]['start'], events[0]['end']), ('2026-09-28', '2026-10-02'))
+
+    def test_event_ending_before_it_starts_shows_on_its_start_day(self):
+        tz = timezone.get_current_timezone()
+        Event.objects.create(
+            user=self.user, title="Backwards",
+            start_date=datetime(2026, 10, 20, 9, tzinfo=tz), end_date=datetime(2026, 9, 1, 9, tzinfo=tz),
+        )
+        events = self.calendar('2026-10-01', '2026-10-31').json()['events']
+        backwards = next(event for event in events if event['title'] == "Backwards")
+        self.assertEqual((backwards['start'], backwards['end']), ('2026-10-20', '2026-10-20'))
+        self.assertNotIn("Backwards", [event['title'] for event in self.calendar('2026-09-01', '2026-09-30').json()['events']])
+
+    def test_rejects_bad_ranges(self):
+        for start, end in [('2026-10-31', '2026-10-01'), ('2026-01-01', '2026-12-31'), ('2026-02-30', '2026-03-01'), ('', '')]:
+            with self.subTest(start=start, end=end):
+                self.assertEqual(self.calendar(start, end).status_code, 400)
+
+    def test_etag_revalidation(self):
+        etag = self.calendar('2026-10-01', '2026-10-31')['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.calendar('2026-10-01', '2026-10-31', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('"Tracker_' in q['sql'] for q in ctx.captured_queries))
+
+        self.events["October"].attended = True
+        self.events["October"].save()
+        self.assertEqual(self.calendar('2026-10-01', '2026-10-31', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_past_events_are_paginated(self):
+        now = timezone.now()
+        for i in range(12):
+            Event.objects.create(user=self.user, title=f"Past {i}", start_date=now - timedelta(days=i // 2 + 1))
+        seen = []
+        params = {}
+        while True:
+            response = self.client.get(reverse('event-list'), params)
+            self.assertLessEqual(len(response.context['past_events']), 10)
+            seen.extend(event.pk for event in response.context['past_events'])
+            if response.context['past_cursor'] is None:
+                break
+            params = {'past_cursor': response.context['past_cursor']}
+        expected = Event.objects.filter(user=self.user, start_date__lt=timezone.now()).order_by('-start_date', '-pk')
+        self.assertEqual(seen, list(expected.values_list('pk', flat=True)))
+        self.assertNotContains(response, "Not mine")
+
+
+class CalendarFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.event = Event.objects.create(
+            user=self.user, title="Hack; the planet, again", location="Main hall\nRoom 2",
+            start_date=timezone.now(), end_date=timezone.now() + timedelta(hours=3),
+        )
+        Goals.objects.create(user=self.user, goal_title="Save up", goal_description="x" * 200)
+        Projects.objects.create(user=self.user, name="Launch", status="Completed")
+        self.token = feed_token(self.user)
+
+    def feed(self, kind='events', token=None, **headers):
+        return self.client.get(reverse('calendar-feed', args=[token or self.token, kind]), **headers)
+
+    def test_feeds_render_icalendar(self):
+        response = self.feed()
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertIn(f'UID:events-{self.event.pk}@tracker\r\n', body)
+        self.assertIn('SUMMARY:Hack\\; the planet\\, again\r\n', body)
+        self.assertIn('LOCATION:Main hall\\nRoom 2\r\n', body)
+
+        body = b''.join(self.feed('goals').streaming_content).decode()
+        self.assertIn('SUMMARY:Goal: Save up', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+        body = b''.join(self.feed('projects').streaming_content).decode()
+        self.assertIn('CATEGORIES:Completed', body)
+
+    def test_conditional_get_skips_the_table(self):
+        response = self.feed()
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        b''.join(response.streaming_content)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.feed(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.feed(HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(ctx.captured_queries, [])
+
+        self.event.title = "Renamed"
+        self.event.save()
+        self.assertEqual(self.feed(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_rejects_bad_tokens_and_kinds(self):
+        self.assertEqual(self.feed(token='not-a-token').status_code, 404)
+        self.assertEqual(self.feed(kind='expenses').status_code, 404)
+
+    def test_reset_revokes_issued_urls(self):
+        self.assertEqual(feed_token(self.user), self.token)
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('calendar-feed-reset'))
+        self.assertRedirects(response, reverse('event-list'))
+        self.assertEqual(self.feed().status_code, 404)
+
+        token = feed_token(self.user)
+        self.assertNotEqual(token, self.token)
+        self.assertEqual(self.feed(token=token).status_code, 200)
+
+    def test_inactive_and_deleted_users_lose_their_feeds(self):
+        self.assertEqual(self.feed().status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.feed().status_code, 404)
+
+        other = User.objects.create_user(username="bob", password="secret")
+        token = feed_token(other)
+        other.delete()
+        self.assertEqual(self.feed(token=token).status_code, 404)
+
+
+class ScheduleConflictTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.client.force_login(self.user)
+        tz = timezone.get_current_timezone()
+        self.day = datetime(2026, 3, 10, tzinfo=tz)
+
+    def test_sweep_matches_pairwise_comparison(self):
+        rng = random.Random(7)
+        entries = []
+        for pk in range(300):
+            start = rng.randrange(0, 5000)
+            entries.append((start, start + rng.randrange(0, 60), 'event', pk, f"Event {pk}"))
+        expected = {
+            frozenset((a[3], b[3])) for i, a in enumerate(entries) for b in entries[i + 1:]
+            if a[0] < b[1] and b[0] < a[1]
+        }
+        pairs = find_conflicts(entries)
+        self.assertEqual(len(pairs), len(expected))
+        self.assertEqual({frozenset((a[3], b[3])) for a, b in pairs}, expected)
+
+    def test_create_warns_about_overlaps(self):
+        Event.objects.create(user=self.user, title="Conference", start_date=self.day, end_date=self.day + timedelta(days=2))
+        Projects.objects.create(user=self.user, name="Sprint", date_set=self.day - timedelta(days=7), end_date=self.day)
+        response = self.client.post(reverse('event-create'), {
+            'title': "Hackathon", 'host': "BCL", 'category': "Hackathon", 'location': "Online",
+            'start_date': (self.day + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M'),
+            'end_date': (self.day + timedelta(days=3)).strftime('%Y-%m-%dT%H:%M'),
+        }, follow=True)
+        self.assertEqual([str(m) for m in response.context['messages']], ['"Hackathon" overlaps "Conference".'])
+
+        event = Event.objects.get(title="Hackathon")
+        self.assertEqual(conflicts_with(self.user, event.start_date, event.end_date, exclude=event)[0][4], "Conference")
+
+    def test_year_report(self):
+        for i in range(50):
+            start = self.day + timedelta(days=i)
+            Event.objects.create(user=self.user, title=f"Event {i}", start_date=start, end_date=start + timedelta(hours=36))
+        Projects.objects.create(user=self.user, name="Launch", date_set=self.day, end_date=self.day + timedelta(hours=12))
+        # Also caches the longest entry of each kind.
+        self.assertEqual(year_conflicts(self.user, 2025), [])
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('schedule-conflicts'), {'year': 2026})
+        pairs = response.context['conflicts']
+        self.assertEqual(len(pairs), 50)
+        self.assertEqual((pairs[0][0][4], pairs[0][1][4]), ("Launch", "Event 0"))
+
+    def test_conflict_query_is_bounded_by_longest_entry(self):
+        for i in range(100):
+            start = self.day - timedelta(days=400 - i)
+            Event.objects.create(
+                user=self.user, title=f"Old {i}", location="Online", start_date=start, end_date=start + timedelta(hours=2),
+            )
+        self.assertEqual(longest_span(self.user, 'event'), timedelta(hours=2))
+        queryset = overlapping_entries(self.user, 'event', self.day, self.day + timedelta(hours=1))
+        if connection.vendor == 'sqlite':
+            self.assertIn('start_date>? AND start_date<?', queryset.explain())
+        self.assertEqual(queryset.count(), 0)
+
+        # Saving a longer entry drops the cached span, so it is still found.
+        long = Event.objects.create(
+            user=self.user, title="Sabbatical", start_date=self.day - timedelta(days=300), end_date=self.day + timedelta(days=1),
+        )
+        self.assertEqual([entry[4] for entry in conflicts_with(self.user, self.day, self.day + timedelta(hours=1))], ["Sabbatical"])
+
+        # So do inline edits, which skip the signals.
+        long.delete()
+        old = Event.objects.get(title="Old 0")
+        summary = apply_edits(self.user, 'events', [{'id': old.pk, 'end_date': self.day + timedelta(days=1)}])
+        self.assertEqual(summary['updated'], 1)
+        self.assertEqual([entry[4] for entry in conflicts_with(self.user, self.day, self.day + timedelta(hours=1))], ["Old 0"])
+
+
+class BulkActionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.other = User.objects.create_user(username="bob", password="secret")
+        self.client.force_login(self.user)
+        self.day = datetime(2026, 3, 10, 12, tzinfo=timezone.utc)
+
+    def post(self, kind, payload, name='bulk-action'):
+        return self.client.post(reverse(name, args=[kind]), json.dumps(payload), content_type='application/json')
+
+    def rollups(self):
+        return {
+            (row.day, row.wallet, row.category): (row.income_total, row.income_count, row.expense_total, row.expense_count)
+            for row in DailyRollup.objects.filter(user=self.user).exclude(income_count=0, expense_count=0)
+        }
+
+    def assertDerivedDataConsistent(self):
+        rollups = self.rollups()
+        rebuild_rollups(self.user)
+        self.assertEqual(rollups, self.rollups())
+        self.assertEqual(check_balances(user=self.user), [])
+        self.assertEqual(reconcile_budgets(user=self.user), 0)
+
+    def test_update_is_one_statement(self):
+        goals = [Goals.objects.create(user=self.user, goal_title=f"Goal {i}") for i in range(30)]
+        theirs = Goals.objects.create(user=self.other, goal_title="Theirs")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post('goals', {'action': 'mark-achieved', 'ids': [goal.pk for goal in goals] + [theirs.pk]})
+        self.assertEqual(response.json(), {'kind': 'goals', 'action': 'mark-achieved', 'requested': 31, 'updated': 30})
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in ctx.captured_queries), 1)
+        self.assertEqual(Goals.objects.filter(achieved=True).count(), 30)
+
+        response = self.post('projects', {'action': 'status-in-progress', 'ids': []})
+        self.assertEqual(response.json()['updated'], 0)
+        self.assertEqual(self.post('goals', {'action': 'mark-done', 'ids': [1]}).status_code, 400)
+        self.assertEqual(self.post('goals', {'action': 'delete', 'ids': 'all'}).status_code, 400)
+        self.assertEqual(self.post('budgets', {'action': 'delete', 'ids': [1]}).status_code, 404)
+
+    def test_delete_keeps_ledger_totals(self):
+        Budget.objects.create(user=self.user, month=self.day.date().replace(day=1), amount=500)
+        expenses = [
+            Expenses.objects.create(user=self.user, name=f"Taxi {i}", worth=10 + i, category='PERSONAL',
+                                    wallet='M-pesa', date=self.day + timedelta(days=i % 3))
+            for i in range(6)
+        ]
+        ExpenseAnomaly.objects.create(expense=expenses[0], user=self.user, method='mad', score=9)
+        source = IncomeSource.objects.create(user=self.user, name="Contract", worth=300)
+        Income.objects.create(user=self.user, source=source, amount=300, wallet='Bank', date=self.day)
+        Income.objects.create(user=self.user, amount=40, wallet='Bank', date=self.day)
+
+        response = self.post('expenses', {'action': 'delete', 'ids': [expense.pk for expense in expenses[:4]]})
+        self.assertEqual(response.json()['deleted'], 4)
+        response = self.post('incomesources', {'action': 'delete', 'ids': [source.pk]})
+        self.assertEqual(response.json()['cascaded'], {'Tracker.Income': 1, 'Tracker.IncomeSource': 1})
+
+        self.assertEqual(Expenses.objects.count(), 2)
+        self.assertFalse(ExpenseAnomaly.objects.exists())
+        self.assertEqual(list(Income.objects.values_list('amount', flat=True)), [Decimal('40.00')])
+        self.assertEqual(Budget.objects.get().spent, Decimal('29.00'))
+        self.assertEqual(len(search(self.user, "taxi")), 2)
+        self.assertDerivedDataConsistent()
+
+    def test_delete_follows_every_relation(self):
+        source = IncomeSource.objects.create(user=self.user, name="Contract", worth=300)
+        Income.objects.create(user=None, source=source, amount=300, wallet='Bank', date=self.day)
+        Income.objects.create(user=self.other, source=source, amount=10, wallet='Bank', date=self.day)
+        rule = RecurringRule.objects.create(
+            user=self.user, kind=RecurringRule.INCOME, name="Retainer", amount=100, source=source, start_date=self.day,
+        )
+        task = NowNext.objects.create(user=self.user, do="Plan launch")
+        Projects.objects.create(user=self.user, name="Launch", what_next=task)
+
+        response = self.post('incomesources', {'action': 'delete', 'ids': [source.pk]})
+        self.assertEqual(response.json()['cascaded'], {'Tracker.Income': 2, 'Tracker.IncomeSource': 1})
+        rule.refresh_from_db()
+        self.assertIsNone(rule.source)
+        self.assertEqual(check_balances(user=self.other), [])
+
+        response = self.post('nownext', {'action': 'delete', 'ids': [task.pk]})
+        self.assertEqual(response.json()['cascaded'], {'Tracker.Projects': 1, 'Tracker.NowNext': 1})
+
+    def test_inline_edits_use_one_bulk_update(self):
+        expenses = [
+            Expenses.objects.create(user=self.user, name=f"Lunch {i}", worth=10, category='FOOD',
+                                    description="Team lunch", date=self.day)
+            for i in range(3)
+        ]
+        response = self.post('expenses', {'rows': [
+            {'id': expenses[0].pk, 'worth': '12.50', 'category': 'BUSINESS'},
+            {'id': expenses[1].pk, 'wallet': 'Paypal'},
+        ]}, name='bulk-edit')
+        self.assertEqual(response.json(), {'kind': 'expenses', 'updated': 2, 'errors': {}})
+        expenses[0].refresh_from_db()
+        self.assertEqual((expenses[0].worth, expenses[0].category, expenses[0].name), (Decimal('12.50'), 'BUSINESS', "Lunch 0"))
+        self.assertDerivedDataConsistent()
+
+        response = self.post('expenses', {'rows': [
+            {'id': expenses[2].pk, 'name': "Dinner"},
+            {'id': expenses[1].pk, 'category': 'NOT-A-CATEGORY'},
+        ]}, name='bulk-edit')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['errors']), [str(expenses[1].pk)])
+        self.assertFalse(Expenses.objects.filter(name="Dinner").exists())
+        response = self.post('expenses', {'rows': [{'id': expenses[2].pk, 'import_hash': "x"}]}, name='bulk-edit')
+        self.assertEqual(response.status_code, 400)
+
+    def test_mark_event_attended_route(self):
+        event = Event.objects.create(user=self.user, title="Meetup")
+        response = self.client.post(reverse('event-mark-attended', args=[event.pk]))
+        self.assertEqual(response.json(), {'success': True})
+        event.refresh_from_db()
+        self.assertTrue(event.attended)
+        theirs = Event.objects.create(user=self.other, title="Theirs")
+        self.assertFalse(self.client.post(reverse('event-mark-attended', args=[theirs.pk])).json()['success'])
+
+
+class DreamCarGalleryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.client.force_login(self.user)
+
+    def add_car(self, pictures=1, **fields):
+        car = DreamCar.objects.create(user=self.user, brand="Porsche", model="911", **fields)
+        car.pictures.add(*[
+            Pictures.objects.create(picture=f"car_pictures/{car.pk}-{n}.jpg") for n in range(pictures)
+        ])
+        return car
+
+    def gallery_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dreamcar-list'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_cover_follows_pictures(self):
+        car = self.add_car(pictures=3)
+        first, second, third = car.pictures.order_by('pk')
+        car.refresh_from_db()
+        self.assertEqual(car.cover_picture, first)
+
+        car.pictures.remove(first)
+        car.refresh_from_db()
+        self.assertEqual(car.cover_picture, second)
+
+        second.delete()
+        car.refresh_from_db()
+        self.assertEqual(car.cover_picture, third)
+
+        third.dreamcar_set.clear()
+        car.refresh_from_db()
+        self.assertIsNone(car.cover_picture)
+
+    def test_gallery_query_count_does_not_grow_with_page(self):
+        self.add_car(pictures=0)
+        self.add_car(pictures=2)
+        response, few = self.gallery_queries()
+        for n in range(10):
+            self.add_car(pictures=2)
+        response, many = self.gallery_queries()
+
+        self.assertEqual(few, many)
+        self.assertEqual(len(response.context['cars_with_images']), 12)
+        covers = {item['car'].pk: item['first_picture'] for item in response.context['cars_with_images']}
+        for car in DreamCar.objects.filter(user=self.user):
+            self.assertEqual(covers[car.pk], car.pictures.order_by('pk').first())
+
+    def test_uncovered_cars_fall_back_to_prefetch(self):
+        car = self.add_car(pictures=2)
+        DreamCar.objects.filter(pk=car.pk).update(cover_picture=None)
+        response, _ = self.gallery_queries()
+        self.assertEqual(
+            response.context['cars_with_images'][0]['first_picture'], car.pictures.order_by('pk').first(),
+        )
+
+    def test_totals_come_from_one_aggregate(self):
+        self.add_car(bought=True, price=Decimal('100.50'))
+        self.add_car(bought=True, price=Decimal('20.00'))
+        self.add_car(price=Decimal('999.00'))
+        response = self.client.get(reverse('dreamcar-list'))
+        self.assertEqual(response.context['total_cars'], 3)
+        self.assertEqual(response.context['bought_cars'], 2)
+        self.assertEqual(response.context['dream_cars'], 1)
+        self.assertEqual(response.context['total_value'], Decimal('120.50'))
+
+        response = self.client.get(reverse('dreamcar-list'), {'status': 'not_bought'})
+        self.assertEqual(response.context['total_cars'], 1)
+        self.assertEqual(response.context['total_value'], 0)
+
+@skipUnless(connection.vendor == 'sqlite', "Full-text search uses SQLite FTS5")
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", password="secret")
+        self.other = User.objects.create_user(username="bob", password="secret")
+
+    def titles(self, query, **kwargs):
+        return [result['title'] for result in search(self.user, query, **kwargs)]
+
+    def test_index_follows_saves_and_deletes(self):
+        expense = Expenses.objects.create(user=self.user, name="Hosting", worth=9, description="Yearly server renewal")
+        NowNext.objects.create(user=self.user, do="Plan launch", gratitude="Renewed energy")
+        Expenses.objects.create(user=self.other, name="Hosting", worth=9, description="Server renewal")
+
+        self.assertEqual(sorted(self.titles("renew")), ["Hosting", "Plan launch"])
+        self.assertEqual(self.titles("renew", kind='nownext'), ["Plan launch"])
+
+        expense.description = "Domain"
+        expense.save()
+        self.assertEqual(self.titles("server"), [])
+        NowNext.objects.filter(user=self.user).get().delete()
+        self.assertEqual(self.titles("renew"), [])
+
+    def test_ranking_snippets_and_query_syntax(self):
+        Projects.objects.create(user=self.user, name="Garden", description="Mentions <b>budget</b> once")
+        Projects.objects.create(user=self.user, name="Budget review", description="Quarterly budget")
+
+        results = search(self.user, "budget")
+        self.assertEqual([result['title'] for result in results], ["Budget review", "Garden"])
+        self.assertIn("&lt;b&gt;<mark>budget</mark>&lt;/b&gt;", results[1]['snippet'])
+        # FTS5 operators in the input are searched for as plain words.
+        self.assertEqual(search(self.user, 'budget" OR NEAR(*'), [])
+        self.assertEqual(search(self.user, '"*'), [])
+
+    def test_imports_and_rebuild_are_indexed(self):
+        import_ledger(self.user, 'expenses', io.StringIO(
+            "name,worth,description,date,category\nTyres,300,Winter set,2026-01-01 09:00,PERSONAL\n"
+        ))
+        self.assertEqual(self.titles("winter"), ["Tyres"])
+
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM tracker_search")
+        self.assertEqual(rebuild_index(), 1)
+        self.assertEqual(self.titles("tyre"), ["Tyres"])
+
+    def test_views(self):
+        DreamCar.objects.create(user=self.user, brand="Porsche", model="911", description="Air cooled")
+        DreamCar.objects.create(user=self.user, brand="Tesla", model="Model S")
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('dreamcar-list'), {'search': 'cooled'})
+        self.assertEqual([car.brand for car in response.context['cars']], ["Porsche"])
+
+        response = self.client.get(reverse('search'), {'q': 'tesla'})
+        self.assertContains(response, "Dream Car")
+        self.assertEqual([result['title'] for result in response.context['results']], ["Tesla Model S"])
+
+    def test_list_filter_keeps_every_match(self):
+        DreamCar.objects.bulk_create([
+            DreamCar(user=self.user, brand="Porsche", model=f"911 #{i}", description="Air cooled") for i in range(1200)
+        ])
+        DreamCar.objects.create(user=self.other, brand="Porsche", model="Theirs", description="Air cooled")
+        DreamCar.objects.create(user=self.user, brand="Tesla", model="Model S")
+        rebuild_index()
+        self.client.force_login(self.user)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dreamcar-list'), {'search': 'cooled'})
+        self.assertEqual(response.context['total_cars'], 1200)
+        self.assertFalse(any('snippet(' in q['sql'] or 'bm25(' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(DreamCar.objects.filter(pk__in=search_pks(self.user, '   ', 'dreamcars')).count(), 0)
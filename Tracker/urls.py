@@ -10,6 +10,8 @@ urlpatterns = [
 
     # IncomeSource URLs
     path('incomesource/', views.IncomeSourceListView.as_view(), name='incomesource-list'),
+    path('incomesource/aging/', views.ReceivablesAgingView.as_view(), name='receivables-aging'),
+    path('incomesource/aging.csv', views.ReceivablesAgingView.as_view(export=True), name='receivables-aging-export'),
     path('incomesource/new/', views.IncomeSourceCreateView.as_view(), name='incomesource-create'),
     path('incomesource/<int:pk>/edit/', views.IncomeSourceUpdateView.as_view(), name='incomesource-update'),
     path('incomesource/<int:pk>/delete/', views.IncomeSourceDeleteView.as_view(), name='incomesource-delete'),
@@ -17,15 +19,33 @@ urlpatterns = [
     # Income URLs
     path('income/', views.IncomeListView.as_view(), name='income-list'),
     path('income/new/', views.IncomeCreateView.as_view(), name='income-create'),
+    path('income/stats/', views.IncomeFormStatsView.as_view(), name='income-form-stats'),
     path('income/<int:pk>/edit/', views.IncomeUpdateView.as_view(), name='income-update'),
     path('income/<int:pk>/delete/', views.IncomeDeleteView.as_view(), name='income-delete'),
 
     # Expenses URLs
     path('expenses/', views.ExpensesListView.as_view(), name='expenses-list'),
     path('expenses/new/', views.ExpensesCreateView.as_view(), name='expenses-create'),
+    path('expenses/stats/', views.ExpensesFormStatsView.as_view(), name='expenses-form-stats'),
+    path('expenses/budget/', views.BudgetUpdateView.as_view(), name='budget-update'),
+    path('expenses/suggest-category/', views.ExpenseCategorySuggestView.as_view(), name='expenses-suggest-category'),
     path('expenses/<int:pk>/edit/', views.ExpensesUpdateView.as_view(), name='expenses-update'),
     path('expenses/<int:pk>/delete/', views.ExpensesDeleteView.as_view(), name='expenses-delete'),
 
+    # Wallets
+    path('wallets/', views.WalletBalanceView.as_view(), name='wallet-balances'),
+
+    # Import / Export
+    path('import/', views.LedgerImportView.as_view(), name='ledger-import'),
+    path('export/<slug:kind>.<slug:fmt>', views.LedgerExportView.as_view(), name='ledger-export'),
+
+    # Bulk actions
+    path('bulk/<slug:kind>/', views.BulkActionView.as_view(), name='bulk-action'),
+    path('bulk/<slug:kind>/edit/', views.BulkEditView.as_view(), name='bulk-edit'),
+
+    # Search
+    path('search/', views.SearchView.as_view(), name='search'),
+
     # NowNext URLs
     path('nownext/', views.NowNextListView.as_view(), name='nownext-list'),
     path('nownext/new/', views.NowNextCreateView.as_view(), name='nownext-create'),
@@ -46,9 +66,14 @@ urlpatterns = [
 
     # Event URLs
     path('events/', views.EventListView.as_view(), name='event-list'),
+    path('events/calendar/', views.EventCalendarView.as_view(), name='event-calendar'),
+    path('calendar/<str:token>/<slug:kind>.ics', views.CalendarFeedView.as_view(), name='calendar-feed'),
+    path('calendar/reset/', views.CalendarFeedResetView.as_view(), name='calendar-feed-reset'),
+    path('events/conflicts/', views.ScheduleConflictsView.as_view(), name='schedule-conflicts'),
     path('events/new/', views.EventCreateView.as_view(), name='event-create'),
     path('events/<int:pk>/edit/', views.EventUpdateView.as_view(), name='event-update'),
     path('events/<int:pk>/delete/', views.EventDeleteView.as_view(), name='event-delete'),
+    path('event/<int:pk>/mark-attended/', views.MarkEventAttendedView.as_view(), name='event-mark-attended'),
 
     # DreamCar URLs
     path('dreamcars/', views.DreamCarListView.as_view(), name='dreamcar-list'),
@@ -2,23 +2,43 @@ from django.shortcuts import render
 
 # Create your views here.
 from django.shortcuts import render, redirect, get_object_or_404
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView, TemplateView
+from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView, TemplateView, FormView
 from django.db.models.functions import TruncDate
 from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from django.utils.decorators import method_decorator
-from django.urls import reverse_lazy
-from django.db.models import Sum, Count
-from datetime import datetime
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.template.loader import render_to_string
+from django.urls import reverse, reverse_lazy
+from django.db.models import Avg, Count, Prefetch, Sum, prefetch_related_objects
+from datetime import datetime, timezone as dt_timezone
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import timedelta
+from decimal import Decimal
 from .models import *
 from .forms import *
+from .budgets import budget_month, get_budget
+from .caching import cached_stats, get_calendar_changed, get_ledger_versions
+from .categorizer import suggest_category
+from .exporters import EXPORTS, STREAMERS, export_rows, gzip_stream
+from .importers import import_ledger
+from .pagination import KeysetPaginationMixin
+from . import bulk, calendars, receivables, search
+from .columnar import get_snapshot
+from .fields import MoneyField
+from .forecasting import get_goal_forecast
+from .recurring import monthly_total
+from .stats import (
+    get_dashboard_stats, get_expenses_by_category, get_ledger_totals, get_monthly_average, get_monthly_totals,
+)
+from .wallets import balance_history, get_balances
 from django.db.models import Q
 from django.contrib import messages
+import csv
 import json
 
 # Dashboard View
@@ -28,84 +48,165 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
+        now = timezone.now()
 
-        # Calculate totals
-        total_income = Income.objects.filter(user=user).aggregate(Sum('amount'))['amount__sum'] or 0
-        total_expenses = Expenses.objects.filter(user=user).aggregate(Sum('worth'))['worth__sum'] or 0
-        total_worth = IncomeSource.objects.filter(user=user).aggregate(Sum('worth'))['worth__sum'] or 0
-        active_projects = Projects.objects.filter(user=user, status='In Progress').count()
-        upcoming_events = Event.objects.filter(user=user, start_date__gte=timezone.now()).count()
+        # Quick stats and category breakdown come from aggregate queries
+        # whose count does not depend on how many rows the user has, and are
+        # cached until the user's next write.
+        stats = cached_stats(user, 'dashboard', lambda: get_dashboard_stats(user, now=now))
+        context['quick_stats'] = stats['quick_stats']
+        context['chart_data'] = stats['chart_data']
 
-        # Quick stats data
-        context['quick_stats'] = {
-            'total_income': total_income,
-            'total_expenses': total_expenses,
-            'net_worth': total_worth,
-            'active_projects': active_projects,
-            'upcoming_events': upcoming_events,
-            'balance': total_income - total_expenses,
-        }
+        # Recent activities
+        context['recent_incomes'] = Income.objects.filter(user=user).select_related('source').order_by('-date')[:5]
+        context['recent_expenses'] = Expenses.objects.filter(user=user).order_by('-date')[:5]
+        context['upcoming_events_list'] = Event.objects.filter(
+            user=user,
+            start_date__gte=now
+        ).order_by('start_date')[:5]
 
-        # Chart data - Last 30 days income
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        daily_income = (
-            Income.objects
-            .filter(user=user, date__gte=thirty_days_ago)
-            .annotate(day=TruncDate('date'))
-            .values('day')
-            .annotate(total=Sum('amount'))
-            .order_by('day')
-        )
+        return context
 
-        income_labels = [item['day'].strftime('%Y-%m-%d') for item in daily_income]
-        income_data = [item['total'] for item in daily_income]
+# Deferred form statistics
+class FormStatsView(LoginRequiredMixin, View):
+    """Sidebar statistics for a ledger form, fetched by the page after it renders.
 
-        # Expenses by category (simulated - you'd need categories in your model)
-        expenses_by_category = {
-            'Business': Expenses.objects.filter(user=user, name__icontains='business').aggregate(Sum('worth'))['worth__sum'] or 0,
-            'Personal': Expenses.objects.filter(user=user, name__icontains='personal').aggregate(Sum('worth'))['worth__sum'] or 0,
-            'Investment': Expenses.objects.filter(user=user, name__icontains='investment').aggregate(Sum('worth'))['worth__sum'] or 0,
-        }
+    Returns ``{"panels": {name: html}, "values": {...}}``. The ETag depends
+    only on the user's ledger versions (kept in the cache) and the date, so
+    a repeat request with ``If-None-Match`` is answered with a 304 before
+    any statistics are read.
+    """
+    cache_name = None
+    panels = {}
+
+    def get_stats(self):
+        raise NotImplementedError
+
+    def get_values(self, stats):
+        return {}
+
+    def get_etag(self):
+        global_version, version = get_ledger_versions(self.request.user.pk)
+        return quote_etag(f"{self.cache_name}-{self.request.user.pk}-{global_version}-{version}-{timezone.localdate()}")
 
-        context['chart_data'] = {
-            'income_labels': json.dumps(income_labels),
-            'income_data': json.dumps(income_data),
-            'expense_labels': json.dumps(list(expenses_by_category.keys())),
-            'expense_data': json.dumps(list(expenses_by_category.values())),
+    def render_payload(self):
+        stats = self.get_stats()
+        return {
+            'panels': {name: render_to_string(template, stats) for name, template in self.panels.items()},
+            'values': self.get_values(stats),
         }
 
-        # Recent activities
-        context['recent_incomes'] = Income.objects.filter(user=user).order_by('-date')[:5]
-        context['recent_expenses'] = Expenses.objects.filter(user=user).order_by('-date')[:5]
-        context['upcoming_events_list'] = Event.objects.filter(
-            user=user,
-            start_date__gte=timezone.now()
-        ).order_by('start_date')[:5]
+    def get(self, request):
+        etag = self.get_etag()
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = JsonResponse(cached_stats(request.user, self.cache_name, self.render_payload))
+            # Computing the stats can itself write (e.g. this month's Budget row).
+            etag = self.get_etag()
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
+# Bulk actions
+class BulkActionsMixin:
+    """Give a list view's template what ``_bulk_toolbar.html`` needs."""
+    bulk_kind = None
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['bulk_kind'] = self.bulk_kind
+        context['bulk_actions'] = bulk.action_choices(self.bulk_kind)
         return context
 
+# Schedule conflicts
+class ScheduleConflictMixin:
+    """After saving an event or project, warn about the entries it overlaps."""
+    schedule_kind = 'event'
+
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        model, start_field, end_field, title_field = calendars.SCHEDULES[self.schedule_kind]
+        conflicts = calendars.conflicts_with(
+            self.request.user, getattr(self.object, start_field), getattr(self.object, end_field), exclude=self.object,
+        )
+        if conflicts:
+            titles = ', '.join(f'"{title}"' for start, end, kind, pk, title in conflicts[:3])
+            more = f' and {len(conflicts) - 3} more' if len(conflicts) > 3 else ''
+            messages.warning(self.request, f'"{self.object}" overlaps {titles}{more}.')
+        return response
+
 # IncomeSource Views
-class IncomeSourceListView(LoginRequiredMixin, ListView):
+class IncomeSourceListView(LoginRequiredMixin, BulkActionsMixin, ListView):
     model = IncomeSource
     template_name = 'tracker/incomesource_list.html'
     context_object_name = 'incomesources'
+    bulk_kind = 'incomesources'
 
     def get_queryset(self):
         return IncomeSource.objects.filter(user=self.request.user)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        total_worth = self.get_queryset().aggregate(Sum('worth'))['worth__sum'] or 0
-        salary = IncomeSource.objects.filter(user=self.request.user, client="Monopoly").aggregate(Sum('worth'))['worth__sum'] or 0
-        unique_clients = IncomeSource.objects.filter(user=self.request.user).values('client').distinct().count()
-        print("------------------------->", total_worth)
+        totals = self.get_queryset().aggregate(
+            total_worth=Sum('worth'), avg_worth=Avg('worth', output_field=MoneyField()), clients=Count('client', distinct=True),
+            outstanding=Sum('worth', filter=Q(got=False)),
+        )
+        salary = monthly_total(RecurringRule.objects.filter(
+            user=self.request.user, kind=RecurringRule.INCOME, active=True,
+        ))
         context.update({
             'salary': salary,
-            'clients': unique_clients,
-            'total_worth': total_worth,
+            'clients': totals['clients'],
+            'total_worth': totals['total_worth'] or 0,
+            'avg_worth': totals['avg_worth'] or 0,
+            'outstanding': totals['outstanding'] or 0,
         })
         return context
 
+class ReceivablesAgingView(LoginRequiredMixin, TemplateView):
+    """Unpaid income sources by client and days past due, or the same as CSV.
+
+    ``?client=`` narrows the report to one client and lists its sources.
+    """
+    template_name = 'tracker/receivables_aging.html'
+    export = False
+
+    def get(self, request, *args, **kwargs):
+        if self.export:
+            return self.export_csv()
+        return super().get(request, *args, **kwargs)
+
+    def get_client(self):
+        return self.request.GET.get('client') or None
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        now = timezone.now()
+        client = self.get_client()
+        rows = receivables.aging_report(self.request.user, now=now, client=client)
+        context.update({
+            'buckets': receivables.BUCKETS,
+            'rows': [
+                dict(row, amounts=[row[key] for key, label, low, high in receivables.BUCKETS]) for row in rows
+            ],
+            'totals': {
+                currency: dict(total, amounts=[total[key] for key, label, low, high in receivables.BUCKETS])
+                for currency, total in receivables.report_totals(rows).items()
+            },
+            'client': client,
+            'sources': receivables.client_sources(self.request.user, client, now=now) if client else None,
+        })
+        return context
+
+    def export_csv(self):
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="receivables-aging.csv"'
+        writer = csv.writer(response)
+        writer.writerow(['client', 'currency'] + receivables.COLUMNS)
+        for row in receivables.aging_report(self.request.user, client=self.get_client()):
+            writer.writerow([row['client'], row['currency']] + [row[key] for key in receivables.COLUMNS])
+        return response
+
 class IncomeSourceCreateView(LoginRequiredMixin, CreateView):
     model = IncomeSource
     form_class = IncomeSourceForm
@@ -134,16 +235,19 @@ class IncomeSourceDeleteView(LoginRequiredMixin, DeleteView):
         return IncomeSource.objects.filter(user=self.request.user)
 
 # Income Views
-class IncomeListView(LoginRequiredMixin, ListView):
+class IncomeListView(LoginRequiredMixin, BulkActionsMixin, KeysetPaginationMixin, ListView):
     model = Income
     template_name = 'tracker/income_list.html'
     context_object_name = 'incomes'
+    bulk_kind = 'income'
 
     def get_queryset(self):
-        return Income.objects.filter(user=self.request.user)
+        return Income.objects.filter(user=self.request.user).select_related('source')
 
     def get_context_data(self, **kwargs):
-        total_income = Income.objects.filter(user=self.request.user).aggregate(Sum('amount'))['amount__sum'] or 0
+        total_income = cached_stats(
+            self.request.user, 'income-total', lambda: get_ledger_totals(self.request.user)['income']
+        )
         context = super().get_context_data(**kwargs)
         context['total_income'] = total_income
         return context
@@ -158,42 +262,6 @@ class IncomeCreateView(LoginRequiredMixin, CreateView):
         form.instance.user = self.request.user
         return super().form_valid(form)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        user = self.request.user
-
-        # Calculate stats
-        from django.db.models import Avg, Sum
-        from django.utils import timezone
-        from datetime import timedelta
-
-        # Monthly average income
-        monthly_avg = Income.objects.filter(user=user).aggregate(
-            avg=Avg('amount')
-        )['avg'] or 0
-
-        # Current month total
-        start_of_month = timezone.now().replace(
-            day=1, hour=0, minute=0, second=0, microsecond=0
-        )
-        month_total = Income.objects.filter(
-            user=user,
-            date__gte=start_of_month
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-
-        # Recent incomes
-        recent_incomes = Income.objects.filter(user=user).order_by('-date')[:5]
-
-        context.update({
-            'monthly_avg': monthly_avg,
-            'month_total': month_total,
-            'income_goal': 5000,  # You can make this dynamic from user settings
-            'recent_incomes': recent_incomes,
-            'recent_count': Income.objects.filter(user=user).count(),
-        })
-
-        return context
-
 class IncomeUpdateView(LoginRequiredMixin, UpdateView):
     model = Income
     form_class = IncomeForm
@@ -203,41 +271,24 @@ class IncomeUpdateView(LoginRequiredMixin, UpdateView):
     def get_queryset(self):
         return Income.objects.filter(user=self.request.user)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        user = self.request.user
-
-        # Calculate stats
-        from django.db.models import Avg, Sum
-        from django.utils import timezone
-        from datetime import timedelta
+class IncomeFormStatsView(FormStatsView):
+    cache_name = 'income-form'
+    panels = {
+        'banner': 'tracker/_income_stats_banner.html',
+        'recent': 'tracker/_income_recent.html',
+    }
 
-        # Monthly average income
-        monthly_avg = Income.objects.filter(user=user).aggregate(
-            avg=Avg('amount')
-        )['avg'] or 0
-
-        # Current month total
-        start_of_month = timezone.now().replace(
-            day=1, hour=0, minute=0, second=0, microsecond=0
-        )
-        month_total = Income.objects.filter(
-            user=user,
-            date__gte=start_of_month
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-
-        # Recent incomes
-        recent_incomes = Income.objects.filter(user=user).order_by('-date')[:5]
-
-        context.update({
-            'monthly_avg': monthly_avg,
-            'month_total': month_total,
-            'income_goal': 5000,  # You can make this dynamic from user settings
-            'recent_incomes': recent_incomes,
-            'recent_count': Income.objects.filter(user=user).count(),
-        })
-
-        return context
+    def get_stats(self):
+        user = self.request.user
+        today = timezone.localdate()
+        incomes = Income.objects.filter(user=user)
+        return {
+            'monthly_avg': incomes.aggregate(avg=Avg('amount', output_field=MoneyField()))['avg'] or 0,
+            'month_total': get_ledger_totals(user, since=today.replace(day=1))['income'],
+            'income_goal': get_goal_forecast(user),
+            'recent_incomes': incomes.select_related('source').order_by('-date')[:3],
+            'recent_count': incomes.count(),
+        }
 
 class IncomeDeleteView(LoginRequiredMixin, DeleteView):
     model = Income
@@ -248,167 +299,67 @@ class IncomeDeleteView(LoginRequiredMixin, DeleteView):
         return Income.objects.filter(user=self.request.user)
 
 # Expenses Views
-class ExpensesListView(LoginRequiredMixin, ListView):
+class ExpensesListView(LoginRequiredMixin, BulkActionsMixin, KeysetPaginationMixin, ListView):
     model = Expenses
     template_name = 'tracker/expenses_list.html'
     context_object_name = 'expenses'
+    bulk_kind = 'expenses'
 
     def get_queryset(self):
-        return Expenses.objects.filter(user=self.request.user)
+        # The anomaly flag comes along as a LEFT JOIN on its one-to-one key.
+        return Expenses.objects.filter(user=self.request.user).select_related('anomaly')
 
     def get_context_data(self, **kwargs):
-        import datetime
-        from django.db.models import Sum
-        from django.utils import timezone
-
         context = super().get_context_data(**kwargs)
+        context.update(cached_stats(self.request.user, 'expenses-list', self.get_expense_stats))
+        budget = get_budget(self.request.user)
+        context.update({'budget': budget.amount, 'monthly_expenses': budget.spent})
+        return context
 
-        # Total expenses
-        total_expenses = Expenses.objects.filter(user=self.request.user).aggregate(Sum('worth'))['worth__sum'] or 0
-
-        # Monthly expenses
-        this_month = timezone.now().month
-        this_year = timezone.now().year
-        monthly_expenses = Expenses.objects.filter(
-            user=self.request.user,
-            date__year=this_year,
-            date__month=this_month
-        ).aggregate(Sum('worth'))['worth__sum'] or 0
-
-        # Average monthly expenses
-        # First, get all months where there are expenses
-        expenses_by_month = Expenses.objects.filter(user=self.request.user).annotate(
-            month=models.functions.TruncMonth('date')
-        ).values('month').annotate(
-            monthly_total=Sum('worth')
-        ).order_by('month')
-
-        if expenses_by_month:
-            avg_expenses = sum(item['monthly_total'] for item in expenses_by_month) / len(expenses_by_month)
+    def get_expense_stats(self):
+        user = self.request.user
+        now = timezone.now()
+
+        # All figures below come from the DailyRollup table, so their cost
+        # depends on the number of active days rather than transactions.
+        total_expenses = get_ledger_totals(user)['expenses']
+
+        # Average monthly expenses over the months that have any expenses,
+        # and the Expense Trends Chart (last 6 months), from the columnar
+        # snapshot; without NumPy the same figures come from the rollups.
+        six_months_ago = timezone.localdate(now - timedelta(days=180))
+        snapshot = get_snapshot(user)
+        if snapshot is not None:
+            avg_expenses = snapshot.expense.bucket_average('month')
+            recent_months = snapshot.expense.bucket_totals('month', since=six_months_ago)
         else:
-            avg_expenses = 0
-
-        # Data for Expense Trends Chart (Last 6 months)
-        six_months_ago = timezone.now() - datetime.timedelta(days=180)
-        recent_expenses = Expenses.objects.filter(
-            user=self.request.user,
-            date__gte=six_months_ago
-        ).annotate(
-            month=models.functions.TruncMonth('date')
-        ).values('month').annotate(
-            total=Sum('worth')
-        ).order_by('month')
-
-        # Prepare chart data
-        months = []
-        monthly_totals = []
-        for expense in recent_expenses:
-            months.append(expense['month'].strftime('%b %Y'))
-            monthly_totals.append(float(expense['total']))
-
-        # Data for Category Distribution (simple categorization based on name keywords)
-        categories = ['Business', 'Personal', 'Investment', 'Food']
-        category_data = []
-
-        # Simple categorization logic (you might want to improve this)
-        business_keywords = ['business', 'office', 'work', 'company', 'client']
-        personal_keywords = ['personal', 'home', 'family', 'shopping', 'food']
-        investment_keywords = ['investment', 'stock', 'crypto', 'property', 'asset']
-
-        business_total = Expenses.objects.filter(
-            user=self.request.user,
-            category='BUSINESS'
-        ).aggregate(Sum('worth'))['worth__sum'] or 0
-
-        personal_total = Expenses.objects.filter(
-            user=self.request.user,
-            category='PERSONAL'
-        ).aggregate(Sum('worth'))['worth__sum'] or 0
-
-        investment_total = Expenses.objects.filter(
-            user=self.request.user,
-            category='INVESTMENT'
-        ).aggregate(Sum('worth'))['worth__sum'] or 0
-        food_total = Expenses.objects.filter(
-            user=self.request.user,
-            category='FOOD'
-        ).aggregate(Sum('worth'))['worth__sum'] or 0
-
-        category_data = [
-            float(business_total),
-            float(personal_total),
-            float(investment_total),
-            float(food_total)
-        ]
+            avg_expenses = get_monthly_average(user, 'expense')
+            recent_months = [
+                (row['month'], row['total'])
+                for row in get_monthly_totals(user, 'expense', since=six_months_ago)
+            ]
+        months = [month.strftime('%b %Y') for month, total in recent_months]
+        monthly_totals = [float(total) for month, total in recent_months]
+
+        # Data for Category Distribution
+        category_totals = get_expenses_by_category(user)
+        categories = list(category_totals.keys())
+        category_data = [float(total) for total in category_totals.values()]
 
-        context.update({
+        return {
             'total_expenses': total_expenses,
-            'monthly_expenses': monthly_expenses,
             'avg_expenses': avg_expenses,
-            'budget': 85.94,
             'chart_months': months,
             'chart_monthly_totals': monthly_totals,
             'chart_categories': categories,
             'chart_category_data': category_data,
-            'business_total': business_total,
-            'personal_total': personal_total,
-            'investment_total': investment_total,
-            'food_total': food_total,
-        })
-
-        return context
-
-class ExpenseContextMixin:
-    """Mixin to add expense context data to views."""
-
-    def get_expense_context(self):
-        """Get shared expense context data."""
-        now = timezone.now()
-        month_expenses = Expenses.objects.filter(
-            user=self.request.user,
-            date__year=now.year,
-            date__month=now.month
-        ).aggregate(Sum('worth'))['worth__sum'] or 0
-
-        days_in_month = datetime.now().day
-        daily_avg = month_expenses / days_in_month if days_in_month > 0 else 0
-
-        budget = 85.27  # configurable per user
-        budget_remaining = budget - month_expenses
-        budget_percentage = (month_expenses / budget * 100) if budget > 0 else 0
-
-        recent_expenses = Expenses.objects.filter(
-            user=self.request.user
-        ).order_by('-date')[:5]
-
-        categories = ['BUSINESS', 'PERSONAL', 'INVESTMENT', 'FOOD']
-        category_stats = {}
-        for category in categories:
-            total = Expenses.objects.filter(
-                user=self.request.user,
-                category=category
-            ).aggregate(Sum('worth'))['worth__sum'] or 0
-            category_stats[category] = total
-
-        total_all = sum(category_stats.values())
-        category_percentages = {}
-        for category, total in category_stats.items():
-            category_percentages[category] = (total / total_all * 100) if total_all > 0 else 0
-
-        return {
-            'month_expenses': month_expenses,
-            'daily_avg': daily_avg,
-            'budget': budget,
-            'budget_remaining': budget_remaining,
-            'budget_percentage': min(budget_percentage, 100),
-            'recent_expenses': recent_expenses,
-            'recent_count': recent_expenses.count(),
-            'category_stats': category_stats,
-            'category_percentages': category_percentages,
-            'total_expenses': total_all,
+            'business_total': category_totals['Business'],
+            'personal_total': category_totals['Personal'],
+            'investment_total': category_totals['Investment'],
+            'food_total': category_totals['Food'],
         }
 
-class ExpensesCreateView(LoginRequiredMixin, ExpenseContextMixin, CreateView):
+class ExpensesCreateView(LoginRequiredMixin, CreateView):
     model = Expenses
     form_class = ExpensesForm
     template_name = 'tracker/expenses_form.html'
@@ -423,17 +374,17 @@ class ExpensesCreateView(LoginRequiredMixin, ExpenseContextMixin, CreateView):
         return initial
 
     def form_valid(self, form):
-        """Set the user before saving."""
+        """Set the user, and a suggested category if none was picked, before saving."""
         form.instance.user = self.request.user
+        if not form.cleaned_data.get('category'):
+            form.instance.category = (
+                suggest_category(self.request.user, form.instance.name, form.instance.description)
+                or Expenses._meta.get_field('category').default
+            )
         return super().form_valid(form)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context.update(self.get_expense_context())
-        return context
-
 
-class ExpensesUpdateView(LoginRequiredMixin, ExpenseContextMixin, UpdateView):
+class ExpensesUpdateView(LoginRequiredMixin, UpdateView):
     model = Expenses
     form_class = ExpensesForm
     template_name = 'tracker/expenses_form.html'
@@ -442,11 +393,84 @@ class ExpensesUpdateView(LoginRequiredMixin, ExpenseContextMixin, UpdateView):
     def get_queryset(self):
         return Expenses.objects.filter(user=self.request.user)
 
+
+class ExpensesFormStatsView(FormStatsView):
+    cache_name = 'expense-form'
+    panels = {
+        'banner': 'tracker/_expenses_stats_banner.html',
+        'budget': 'tracker/_expenses_budget.html',
+        'categories': 'tracker/_expenses_categories.html',
+        'recent': 'tracker/_expenses_recent.html',
+    }
+
+    def get_stats(self):
+        user = self.request.user
+        budget = get_budget(user)
+        month_expenses = budget.spent
+        days_in_month = timezone.localdate().day
+
+        category_totals = get_expenses_by_category(user)
+        category_stats = {
+            code: category_totals[label]
+            for code, label in Expenses.CATEGORY_CHOICES
+        }
+        total_all = sum(category_stats.values())
+        category_percentages = {}
+        for category, total in category_stats.items():
+            category_percentages[category] = (total / total_all * 100) if total_all > 0 else 0
+
+        recent_expenses = list(Expenses.objects.filter(user=user).order_by('-date')[:5])
+        return {
+            'month_expenses': month_expenses,
+            'daily_avg': month_expenses / days_in_month if days_in_month > 0 else 0,
+            'budget': budget.amount,
+            'budget_remaining': budget.remaining,
+            'budget_percentage': min(budget.percentage, 100),
+            'category_stats': category_stats,
+            'category_percentages': category_percentages,
+            'total_expenses': total_all,
+            'recent_expenses': recent_expenses,
+            'recent_count': len(recent_expenses),
+        }
+
+    def get_values(self, stats):
+        # Used by the form to show the budget left after the entered amount.
+        return {'budget': stats['budget'], 'month_expenses': stats['month_expenses']}
+
+
+class ExpenseCategorySuggestView(LoginRequiredMixin, View):
+    def get(self, request):
+        category = suggest_category(
+            request.user, request.GET.get('name', ''), request.GET.get('description', '')
+        )
+        return JsonResponse({'category': category})
+
+
+class BudgetUpdateView(LoginRequiredMixin, FormView):
+    """Set this month's budget; later months start from the amount set here."""
+    form_class = BudgetForm
+    template_name = 'tracker/budget_form.html'
+    success_url = reverse_lazy('expenses-list')
+
+    def get_initial(self):
+        category = self.request.GET.get('category', Budget.ALL)
+        if category not in dict(Budget.CATEGORY_CHOICES):
+            category = Budget.ALL
+        return {'category': category, 'amount': get_budget(self.request.user, category).amount}
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context.update(self.get_expense_context())
+        context['budgets'] = Budget.objects.filter(
+            user=self.request.user, month=budget_month(timezone.localdate()),
+        ).order_by('category')
         return context
 
+    def form_valid(self, form):
+        budget = get_budget(self.request.user, form.cleaned_data['category'])
+        budget.amount = form.cleaned_data['amount']
+        budget.save(update_fields=['amount'])
+        messages.success(self.request, f'Budget for {budget.get_category_display().lower()} set to {budget.amount}.')
+        return super().form_valid(form)
 
 class ExpensesDeleteView(LoginRequiredMixin, DeleteView):
     model = Expenses
@@ -464,11 +488,110 @@ class ExpensesDeleteView(LoginRequiredMixin, DeleteView):
     def get_queryset(self):
         return Expenses.objects.filter(user=self.request.user)
 
+class LedgerImportView(LoginRequiredMixin, FormView):
+    form_class = LedgerImportForm
+    template_name = 'tracker/ledger_import.html'
+
+    def form_valid(self, form):
+        kind = form.cleaned_data['kind']
+        result = import_ledger(self.request.user, kind, form.cleaned_data['file'])
+        if result.invalid:
+            messages.error(self.request, f'Import finished with errors: {result}.')
+            return self.render_to_response(self.get_context_data(form=form, import_errors=result.errors))
+        messages.success(self.request, f'Import complete: {result}.')
+        return redirect('income-list' if kind == 'income' else 'expenses-list')
+
+class LedgerExportView(LoginRequiredMixin, View):
+    """Stream one kind of record as CSV or JSON, optionally gzipped.
+
+    Query parameters: ``start`` / ``end`` (YYYY-MM-DD) and ``gzip=1``.
+    """
+
+    def get(self, request, kind, fmt):
+        if kind not in EXPORTS or fmt not in STREAMERS:
+            raise Http404("Unknown export")
+
+        try:
+            start = self.parse_day(request.GET.get('start'))
+            end = self.parse_day(request.GET.get('end'))
+        except ValueError:
+            return HttpResponseBadRequest("start and end must be dates in YYYY-MM-DD format")
+
+        stream, content_type = STREAMERS[fmt]
+        chunks = stream(kind, export_rows(request.user, kind, start=start, end=end))
+        filename = f'{kind}.{fmt}'
+        if request.GET.get('gzip') == '1':
+            chunks = gzip_stream(chunks)
+            content_type = 'application/gzip'
+            filename += '.gz'
+
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @staticmethod
+    def parse_day(value):
+        if not value:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        return day
+
+# Wallet balances
+class WalletBalanceView(LoginRequiredMixin, TemplateView):
+    template_name = 'tracker/wallet_balances.html'
+    history_days = 90
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        user = self.request.user
+        since = timezone.localdate() - timedelta(days=self.history_days)
+        history = cached_stats(user, f'wallet-history:{since}', lambda: balance_history(user, since=since))
+
+        # One point per day with a move in any wallet; the chart spans the
+        # days a wallet did not move.
+        labels = sorted({day for points in history.values() for day, balance in points})
+        index = {day: position for position, day in enumerate(labels)}
+        datasets = []
+        for (wallet, currency), points in history.items():
+            data = [None] * len(labels)
+            for day, balance in points:
+                data[index[day]] = float(balance)
+            datasets.append({'label': f"{wallet} ({currency})", 'data': data})
+
+        context.update({
+            'balances': get_balances(user),
+            'history_days': self.history_days,
+            'chart_labels': json.dumps([day.isoformat() for day in labels]),
+            'chart_datasets': json.dumps(datasets),
+        })
+        return context
+
+class SearchView(LoginRequiredMixin, TemplateView):
+    """Ranked full-text search across the user's records (``?q=`` and optional ``?kind=``)."""
+    template_name = 'tracker/search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '')
+        kind = self.request.GET.get('kind')
+        if kind not in search.SOURCES:
+            kind = None
+
+        context['search_query'] = query
+        context['search_kind'] = kind
+        context['search_kinds'] = search.KIND_LABELS.items()
+        context['results'] = search.search(self.request.user, query, kind=kind)
+        return context
+
+
 # NowNext Views
-class NowNextListView(LoginRequiredMixin, ListView):
+class NowNextListView(LoginRequiredMixin, BulkActionsMixin, KeysetPaginationMixin, ListView):
     model = NowNext
     template_name = 'tracker/nownext_list.html'
     context_object_name = 'nownexts'
+    bulk_kind = 'nownext'
 
     def get_queryset(self):
         return NowNext.objects.filter(user=self.request.user).order_by('-date')
@@ -501,16 +624,19 @@ class NowNextDeleteView(LoginRequiredMixin, DeleteView):
         return NowNext.objects.filter(user=self.request.user)
 
 # Projects Views
-class ProjectsListView(LoginRequiredMixin, ListView):
+class ProjectsListView(LoginRequiredMixin, BulkActionsMixin, KeysetPaginationMixin, ListView):
     model = Projects
     template_name = 'tracker/projects_list.html'
     context_object_name = 'projects'
+    bulk_kind = 'projects'
+    keyset_field = 'date_set'
 
     def get_queryset(self):
-        return Projects.objects.filter(user=self.request.user)
+        return Projects.objects.filter(user=self.request.user).select_related('what_next')
 
-class ProjectsCreateView(LoginRequiredMixin, CreateView):
+class ProjectsCreateView(LoginRequiredMixin, ScheduleConflictMixin, CreateView):
     model = Projects
+    schedule_kind = 'project'
     form_class = ProjectsForm
     template_name = 'tracker/projects_form.html'
     success_url = reverse_lazy('projects-list')
@@ -519,8 +645,9 @@ class ProjectsCreateView(LoginRequiredMixin, CreateView):
         form.instance.user = self.request.user
         return super().form_valid(form)
 
-class ProjectsUpdateView(LoginRequiredMixin, UpdateView):
+class ProjectsUpdateView(LoginRequiredMixin, ScheduleConflictMixin, UpdateView):
     model = Projects
+    schedule_kind = 'project'
     form_class = ProjectsForm
     template_name = 'tracker/projects_form.html'
     success_url = reverse_lazy('projects-list')
@@ -537,14 +664,35 @@ class ProjectsDeleteView(LoginRequiredMixin, DeleteView):
         return Projects.objects.filter(user=self.request.user)
 
 # Goals Views
-class GoalsListView(LoginRequiredMixin, ListView):
+class GoalsListView(LoginRequiredMixin, BulkActionsMixin, KeysetPaginationMixin, ListView):
     model = Goals
     template_name = 'tracker/goals_list.html'
     context_object_name = 'goals'
+    bulk_kind = 'goals'
+    keyset_field = 'date_set'
 
     def get_queryset(self):
         return Goals.objects.filter(user=self.request.user)
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # The page holds one keyset page of goals, so totals come from the
+        # cached stats rather than from the list.
+        context.update(cached_stats(self.request.user, 'goals-list', self.get_goal_stats))
+        return context
+
+    def get_goal_stats(self):
+        counts = self.get_queryset().aggregate(
+            total_goals=Count('pk'), achieved_count=Count('pk', filter=Q(achieved=True)),
+        )
+        total, achieved = counts['total_goals'], counts['achieved_count']
+        return {
+            'total_goals': total,
+            'achieved_count': achieved,
+            'in_progress_count': total - achieved,
+            'success_rate': round(achieved * 100 / total) if total else 0,
+        }
+
 class GoalsCreateView(LoginRequiredMixin, CreateView):
     model = Goals
     form_class = GoalsForm
@@ -573,30 +721,33 @@ class GoalsDeleteView(LoginRequiredMixin, DeleteView):
         return Goals.objects.filter(user=self.request.user)
 
 # Event Views
-class EventListView(LoginRequiredMixin, ListView):
+class EventListView(LoginRequiredMixin, BulkActionsMixin, KeysetPaginationMixin, ListView):
     model = Event
     template_name = 'tracker/event_list.html'
     context_object_name = 'events'
+    bulk_kind = 'events'
+    keyset_field = 'start_date'
+    keyset_descending = False
 
     def get_queryset(self):
         return Event.objects.filter(user=self.request.user).order_by('start_date')
 
+    past_cursor_param = 'past_cursor'
+    past_page_size = 10
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
         now = timezone.now()
-
-        # Get all events for the current user
         events = Event.objects.filter(user=user)
 
-        # Calculate stats
-        context['upcoming_count'] = events.filter(start_date__gte=now).count()
-        context['attended_count'] = events.filter(attended=True).count()
-        context['month_count'] = events.filter(
-            start_date__year=now.year,
-            start_date__month=now.month
-        ).count()
-        context['hackathon_count'] = events.filter(category='Hackathon').count()
+        # All four counters come from one aggregate over the user's events.
+        context.update(cached_stats(user, 'event-counts', lambda: events.aggregate(
+            upcoming_count=Count('pk', filter=Q(start_date__gte=now)),
+            attended_count=Count('pk', filter=Q(attended=True)),
+            month_count=Count('pk', filter=Q(start_date__year=now.year, start_date__month=now.month)),
+            hackathon_count=Count('pk', filter=Q(category='Hackathon')),
+        )))
 
         # Get upcoming events (next 30 days)
         thirty_days_later = now + timedelta(days=30)
@@ -604,10 +755,21 @@ class EventListView(LoginRequiredMixin, ListView):
             start_date__range=[now, thirty_days_later]
         ).order_by('start_date')
 
-        # Get past events
-        context['past_events'] = events.filter(
-            start_date__lt=now
-        ).order_by('-start_date')
+        # Past events are paged with their own cursor; the calendar fetches
+        # its month from EventCalendarView.
+        past_events, past_cursor = self.paginate_keyset(
+            events.filter(start_date__lt=now), descending=True,
+            cursor_param=self.past_cursor_param, page_size=self.past_page_size,
+        )
+        context['past_events'] = past_events
+        context['past_cursor'] = past_cursor
+        context['past_cursor_param'] = self.past_cursor_param
+
+        token = calendars.feed_token(user)
+        context['calendar_feeds'] = [
+            (name, self.request.build_absolute_uri(reverse('calendar-feed', args=[token, kind])))
+            for kind, (model, columns, name) in calendars.FEEDS.items()
+        ]
 
         # Add current date for calendar
         context['current_date'] = now
@@ -615,7 +777,93 @@ class EventListView(LoginRequiredMixin, ListView):
 
         return context
 
-class EventCreateView(LoginRequiredMixin, CreateView):
+class EventCalendarView(LoginRequiredMixin, View):
+    """Events overlapping ``start`` to ``end`` (YYYY-MM-DD, inclusive) as JSON.
+
+    The calendar asks for the range it shows, so the response size depends
+    on the range, not on the user's event history. Event writes bump the
+    ledger version, which keys the ETag.
+    """
+
+    def get(self, request):
+        try:
+            start = parse_date(request.GET.get('start') or '')
+            end = parse_date(request.GET.get('end') or '')
+        except ValueError:
+            start = end = None
+        if start is None or end is None or end < start or (end - start).days > calendars.MAX_RANGE_DAYS:
+            return HttpResponseBadRequest(
+                f"start and end must be YYYY-MM-DD dates at most {calendars.MAX_RANGE_DAYS} days apart"
+            )
+
+        global_version, version = get_ledger_versions(request.user.pk)
+        etag = quote_etag(f"calendar-{request.user.pk}-{global_version}-{version}-{start}-{end}")
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = JsonResponse({
+                'start': start.isoformat(),
+                'end': end.isoformat(),
+                'events': calendars.calendar_events(request.user, start, end),
+            })
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+class ScheduleConflictsView(LoginRequiredMixin, TemplateView):
+    """Every pair of overlapping events and projects in a year (``?year=``)."""
+    template_name = 'tracker/schedule_conflicts.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        try:
+            year = int(self.request.GET.get('year', ''))
+        except ValueError:
+            year = timezone.localdate().year
+        year = min(max(year, 1), 9998)
+        context['year'] = year
+        context['conflicts'] = cached_stats(
+            self.request.user, f'conflicts:{year}', lambda: calendars.year_conflicts(self.request.user, year),
+        )
+        return context
+
+class CalendarFeedView(View):
+    """A user's events, goal deadlines or project end dates as an iCalendar feed.
+
+    Calendar apps poll without a session, so the URL carries a signed token
+    for the user and their feed key; tokens of reset keys and inactive
+    users are refused. ETag and Last-Modified come from the time of the user's
+    last change to the feed, kept in the cache, so an unchanged feed is
+    answered with a 304 without reading the feed's table.
+    """
+
+    def get(self, request, token, kind):
+        user_id = calendars.feed_user_id(token)
+        if user_id is None or kind not in calendars.FEEDS:
+            raise Http404("Unknown calendar feed")
+
+        changed = get_calendar_changed(user_id, kind)
+        etag = quote_etag(f"{kind}-{user_id}-{changed}")
+        response = get_conditional_response(request, etag=etag, last_modified=int(changed))
+        if response is None:
+            stamp = datetime.fromtimestamp(changed, tz=dt_timezone.utc)
+            response = StreamingHttpResponse(
+                calendars.stream_ical(kind, user_id, stamp), content_type='text/calendar; charset=utf-8',
+            )
+            response['Content-Disposition'] = f'inline; filename="{kind}.ics"'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(changed)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+class CalendarFeedResetView(LoginRequiredMixin, View):
+    """Replace the user's feed key, so every feed URL issued so far stops working."""
+
+    def post(self, request):
+        calendars.feed_key(request.user, reset=True)
+        messages.success(request, 'Your calendar feed links were reset. Subscribe again with the new links.')
+        return redirect('event-list')
+
+class EventCreateView(LoginRequiredMixin, ScheduleConflictMixin, CreateView):
     model = Event
     form_class = EventForm
     template_name = 'tracker/event_form.html'
@@ -625,7 +873,7 @@ class EventCreateView(LoginRequiredMixin, CreateView):
         form.instance.user = self.request.user
         return super().form_valid(form)
 
-class EventUpdateView(LoginRequiredMixin, UpdateView):
+class EventUpdateView(LoginRequiredMixin, ScheduleConflictMixin, UpdateView):
     model = Event
     form_class = EventForm
     template_name = 'tracker/event_form.html'
@@ -643,16 +891,51 @@ class EventDeleteView(LoginRequiredMixin, DeleteView):
         return Event.objects.filter(user=self.request.user)
 
 
-@method_decorator(csrf_exempt, name='dispatch')
 class MarkEventAttendedView(LoginRequiredMixin, View):
     def post(self, request, pk):
-        try:
-            event = Event.objects.get(pk=pk, user=request.user)
-            event.attended = True
-            event.save()
-            return JsonResponse({'success': True})
-        except Event.DoesNotExist:
+        summary = bulk.apply_action(request.user, 'events', 'mark-attended', [pk])
+        if not summary['updated']:
             return JsonResponse({'success': False, 'error': 'Event not found'})
+        return JsonResponse({'success': True})
+
+class BulkActionView(LoginRequiredMixin, View):
+    """Apply one action to many rows of a list: ``{"action": ..., "ids": [...]}``.
+
+    Accepts a JSON body or form fields (``action`` and repeated ``ids``) and
+    answers with a JSON summary of what was updated or deleted.
+    """
+
+    def parse(self, request):
+        if request.content_type == 'application/json':
+            try:
+                return json.loads(request.body)
+            except ValueError:
+                raise ValidationError("Malformed JSON body.")
+        return {'action': request.POST.get('action'), 'ids': request.POST.getlist('ids'), 'rows': None}
+
+    def post(self, request, kind):
+        if kind not in bulk.KINDS:
+            raise Http404("Unknown kind")
+        try:
+            data = self.parse(request)
+            if not isinstance(data, dict):
+                raise ValidationError("Expected a JSON object.")
+            summary = self.apply(request.user, kind, data)
+        except ValidationError as e:
+            return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+        return JsonResponse(summary, status=400 if summary.get('errors') else 200)
+
+    def apply(self, user, kind, data):
+        return bulk.apply_action(user, kind, data.get('action'), data.get('ids'))
+
+class BulkEditView(BulkActionView):
+    """Save inline edits ``{"rows": [{"id": ..., field: value}, ...]}`` in one bulk_update.
+
+    Invalid rows are answered with a 400 whose ``errors`` are keyed by id.
+    """
+
+    def apply(self, user, kind, data):
+        return bulk.apply_edits(user, kind, data.get('rows'))
 
 class DreamCarListView(LoginRequiredMixin, ListView):
     model = DreamCar
@@ -661,7 +944,10 @@ class DreamCarListView(LoginRequiredMixin, ListView):
     paginate_by = 12
 
     def get_queryset(self):
-        queryset = DreamCar.objects.filter(user=self.request.user).order_by('-date_added')
+        queryset = (
+            DreamCar.objects.filter(user=self.request.user)
+            .select_related('cover_picture').order_by('-date_added')
+        )
 
         # Filter by status
         status = self.request.GET.get('status')
@@ -672,7 +958,9 @@ class DreamCarListView(LoginRequiredMixin, ListView):
 
         # Search functionality
         search_query = self.request.GET.get('search')
-        if search_query:
+        if search_query and search.is_available():
+            queryset = queryset.filter(pk__in=search.search_pks(self.request.user, search_query, 'dreamcars'))
+        elif search_query:
             queryset = queryset.filter(
                 Q(brand__icontains=search_query) |
                 Q(model__icontains=search_query) |
@@ -683,24 +971,31 @@ class DreamCarListView(LoginRequiredMixin, ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-
-        # Get the first picture for each car
-        cars_with_first_picture = []
-        for car in context['cars']:
-            first_picture = car.pictures.first()  # Get first picture from ManyToMany
-            cars_with_first_picture.append({
+        cars = list(context['cars'])
+
+        # The cover is joined in; cars without one (no pictures, or links
+        # written without signals) fall back to one prefetch for the page.
+        uncovered = [car for car in cars if car.cover_picture_id is None]
+        if uncovered:
+            prefetch_related_objects(
+                uncovered, Prefetch('pictures', queryset=Pictures.objects.order_by('pk'), to_attr='ordered_pictures'),
+            )
+        context['cars_with_images'] = [
+            {
                 'car': car,
-                'first_picture': first_picture
-            })
-
-        context['cars_with_images'] = cars_with_first_picture
-        context['total_cars'] = self.get_queryset().count()
-        context['bought_cars'] = self.get_queryset().filter(bought=True).count()
-        context['dream_cars'] = self.get_queryset().filter(bought=False).count()
+                'first_picture': car.cover_picture if car.cover_picture_id else next(iter(car.ordered_pictures), None),
+            }
+            for car in cars
+        ]
 
-        # Calculate total value
-        total_value = sum(car.price for car in self.get_queryset().filter(bought=True))
-        context['total_value'] = total_value
+        totals = self.object_list.order_by().aggregate(
+            total_cars=Count('pk'),
+            bought_cars=Count('pk', filter=Q(bought=True)),
+            dream_cars=Count('pk', filter=Q(bought=False)),
+            total_value=Sum('price', filter=Q(bought=True)),
+        )
+        totals['total_value'] = totals['total_value'] or 0
+        context.update(totals)
 
         return context
 
@@ -777,7 +1072,7 @@ class DreamCarDetailView(LoginRequiredMixin, DetailView):
         ).exclude(
             pk=car.pk
         ).filter(
-            Q(brand=car.brand) | Q(price__range=(car.price * 0.8, car.price * 1.2))
+            Q(brand=car.brand) | Q(price__range=(car.price * Decimal('0.8'), car.price * Decimal('1.2')))
         )[:4]
 
         context['similar_cars'] = similar_cars
@@ -0,0 +1,181 @@
+"""Per-wallet balances maintained on every write.
+
+Income adds to its wallet; Expenses and EmergencyFunds moves take from
+theirs. Balances are kept per (user, wallet, currency) in the moves' own
+currency, so they are exact and do not depend on FX rates. Each write
+adjusts one WalletBalance row with ``UPDATE ... SET balance = balance + delta``
+inside the writer's transaction; bulk writers (imports, recurring rules)
+call ``add_moves`` themselves. ``check_balances`` compares the stored rows
+with a full recomputation.
+
+``balance_history`` computes the balance at the end of each day with a
+``SUM(...) OVER (PARTITION BY wallet, currency ORDER BY day)`` window over
+the union of the three ledgers.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import TruncDate
+from django.utils.dateparse import parse_date
+
+from .caching import bump_ledger_version
+from .fields import MoneyField
+from .models import EmergencyFunds, Expenses, Income, WalletBalance
+
+# Model -> (amount field, date field, sign of its effect on the balance)
+MOVES = {
+    Income: ('amount', 'date', 1),
+    Expenses: ('worth', 'date', -1),
+    EmergencyFunds: ('amount', 'date_added', -1),
+}
+
+
+def move(obj):
+    """``((user_id, wallet, currency), signed amount)`` of a ledger row."""
+    amount_field, date_field, sign = MOVES[type(obj)]
+    # Amounts assigned as strings or floats are only normalised on reload.
+    amount = obj._meta.get_field(amount_field).to_python(getattr(obj, amount_field))
+    return (obj.user_id, obj.wallet, obj.currency), sign * amount
+
+
+def add_to_balance(user_id, wallet, currency, delta, moves):
+    """Add ``delta`` (and ``moves`` rows) to a wallet's balance."""
+    if user_id is None:
+        return
+    with transaction.atomic():
+        updated = WalletBalance.objects.filter(user_id=user_id, wallet=wallet, currency=currency).update(
+            balance=F('balance') + Value(delta, output_field=MoneyField()),
+            moves=F('moves') + moves,
+        )
+        # As with the rollups, a missing row with a removal means it has
+        # already been deleted along with its user.
+        if not updated and moves > 0:
+            WalletBalance.objects.create(
+                user_id=user_id, wallet=wallet, currency=currency, balance=delta, moves=moves,
+            )
+
+
+def add_moves(objs, sign=1):
+    """Apply the moves of many rows at once; ``sign=-1`` removes them."""
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for obj in objs:
+        key, amount = move(obj)
+        deltas[key][0] += sign * amount
+        deltas[key][1] += sign
+    for (user_id, wallet, currency), (delta, moves) in deltas.items():
+        add_to_balance(user_id, wallet, currency, delta, moves)
+
+
+def compute_balances(user=None):
+    """``{(user_id, wallet, currency): (balance, moves)}`` from the ledgers."""
+    balances = defaultdict(lambda: [Decimal(0), 0])
+    for model, (amount_field, date_field, sign) in MOVES.items():
+        rows = model.objects.filter(user__isnull=False)
+        if user is not None:
+            rows = rows.filter(user=user)
+        for row in (
+            rows
+            .values('user_id', 'wallet', 'currency')
+            .annotate(total=Sum(amount_field), count=Count('pk'))
+            .order_by()
+        ):
+            balance = balances[(row['user_id'], row['wallet'], row['currency'])]
+            balance[0] += sign * (row['total'] or 0)
+            balance[1] += row['count']
+    return {key: tuple(value) for key, value in balances.items()}
+
+
+def check_balances(user=None, fix=False):
+    """Compare stored balances with ``compute_balances``.
+
+    Returns ``[(key, stored (balance, moves) or None, expected or None)]``
+    for every wallet that differs, and rewrites them when ``fix`` is set.
+    """
+    stored = WalletBalance.objects.all()
+    if user is not None:
+        stored = stored.filter(user=user)
+
+    with transaction.atomic():
+        rows = {(row.user_id, row.wallet, row.currency): row for row in stored.select_for_update()}
+        expected = compute_balances(user)
+        mismatches = []
+        for key in sorted(rows.keys() | expected.keys(), key=str):
+            row = rows.get(key)
+            # A row emptied by deletes counts as no row.
+            current = (row.balance, row.moves) if row is not None and (row.balance or row.moves) else None
+            if current != expected.get(key):
+                mismatches.append((key, current, expected.get(key)))
+        if not fix or not mismatches:
+            return mismatches
+
+        stale, changed, created = [], [], []
+        for key, current, wanted in mismatches:
+            if wanted is None:
+                stale.append(rows[key].pk)
+            elif key not in rows:
+                created.append(WalletBalance(user_id=key[0], wallet=key[1], currency=key[2],
+                                             balance=wanted[0], moves=wanted[1]))
+            else:
+                rows[key].balance, rows[key].moves = wanted
+                changed.append(rows[key])
+        WalletBalance.objects.filter(pk__in=stale).delete()
+        WalletBalance.objects.bulk_update(changed, ['balance', 'moves'], batch_size=1000)
+        WalletBalance.objects.bulk_create(created, batch_size=1000)
+    bump_ledger_version(user.pk if user is not None else None)
+    return mismatches
+
+
+def get_balances(user):
+    """The user's non-empty WalletBalance rows, in WALLETS order."""
+    rows = WalletBalance.objects.filter(user=user, moves__gt=0)
+    order = {code: index for index, (code, label) in enumerate(WalletBalance._meta.get_field('wallet').choices)}
+    return sorted(rows, key=lambda row: (order.get(row.wallet, len(order)), row.currency))
+
+
+def _moves(user):
+    querysets = [
+        model.objects.filter(user=user)
+        .annotate(
+            account=F('wallet'),
+            code=F('currency'),
+            day=TruncDate(date_field),
+            delta=ExpressionWrapper(F(amount_field) * sign, output_field=MoneyField()),
+        )
+        # Annotations only, so the union's columns keep these names.
+        .values_list('account', 'code', 'day', 'delta')
+        for model, (amount_field, date_field, sign) in MOVES.items()
+    ]
+    return querysets[0].union(*querysets[1:], all=True)
+
+
+def balance_history(user, since=None):
+    """``{(wallet, currency): [(day, balance at the end of day)]}`` for days with moves.
+
+    The running balance covers the whole history; only days from ``since``
+    on are returned.
+    """
+    moves_sql, params = _moves(user).query.sql_with_params()
+    sql = (
+        "SELECT account, code, day, balance FROM ("
+        "SELECT account, code, day, "
+        "SUM(SUM(delta)) OVER (PARTITION BY account, code ORDER BY day) AS balance "
+        f"FROM ({moves_sql}) moves GROUP BY account, code, day"
+        ") history"
+    )
+    if since is not None:
+        sql += " WHERE day >= %s"
+        params += (connection.ops.adapt_datefield_value(since),)
+    sql += " ORDER BY account, code, day"
+
+    money = MoneyField()
+    history = defaultdict(list)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for wallet, currency, day, balance in cursor.fetchall():
+            if not isinstance(day, date):
+                day = parse_date(day)
+            history[(wallet, currency)].append((day, money.from_db_value(balance, None, connection)))
+    return dict(history)
@@ -4,6 +4,8 @@ from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 
+from Tracker.forms import CurrencyField
+
 class CustomUserCreationForm(UserCreationForm):
     email = forms.EmailField(
         required=True,
@@ -71,9 +73,16 @@ class CustomAuthenticationForm(AuthenticationForm):
     )
 
 class UserProfileForm(forms.ModelForm):
+    # Only currencies with loaded FX rates; an unknown code would convert
+    # every total at par.
+    base_currency = CurrencyField(
+        help_text=UserProfile._meta.get_field('base_currency').help_text,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+
     class Meta:
         model = UserProfile
-        fields = ['phone', 'company', 'bio', 'profile_picture', 'date_of_birth']
+        fields = ['phone', 'company', 'bio', 'profile_picture', 'date_of_birth', 'base_currency']
         widgets = {
             'phone': forms.TextInput(attrs={'class': 'form-control'}),
             'company': forms.TextInput(attrs={'class': 'form-control'}),
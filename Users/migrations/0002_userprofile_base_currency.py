@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='base_currency',
+            field=models.CharField(default='USD', help_text='Currency totals are converted to', max_length=3),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Users', '0002_userprofile_base_currency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='calendar_key',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
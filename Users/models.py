@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser, User
 from django.conf import settings
 
+from Tracker.fields import DEFAULT_CURRENCY
+
 # Create your models here.
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -10,6 +12,10 @@ class UserProfile(models.Model):
     bio = models.TextField(blank=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
     date_of_birth = models.DateField(null=True, blank=True)
+    base_currency = models.CharField(max_length=3, default=DEFAULT_CURRENCY,
+                                     help_text="Currency totals are converted to")
+    # Signed into calendar feed URLs; replacing it revokes every issued URL.
+    calendar_key = models.CharField(max_length=32, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 